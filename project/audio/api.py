@@ -15,21 +15,9 @@ class AlbumViewSet(core_viewsets.CustomModelViewSet):
         "date_created",
     )
     serializer_class = serializers.AlbumSerializer
-
-    def create(self, request, *args, **kwargs):
-        permissions.is_authenticated(request)
-        return super().create(request, *args, **kwargs)
-
-    def update(self, request, *args, **kwargs):
-        permissions.is_owner(request, self.get_object())
-        return super().update(request, *args, **kwargs)
-
-    def partial_update(self, request, *args, **kwargs):
-        permissions.is_owner(request, self.get_object())
-        return super().partial_update(request, *args, **kwargs)
+    permission_classes = (permissions.IsOwnerOrReadOnly,)
 
     def destroy(self, request, *args, **kwargs):
-        permissions.is_owner(request, self.get_object())
         instance = self.get_object()
         if instance.is_default:
             return Response(
@@ -59,21 +47,9 @@ class AudioViewSet(core_viewsets.CustomModelViewSet):
         "date_created",
     )
     serializer_class = serializers.AudioSerializer
-
-    def create(self, request, *args, **kwargs):
-        permissions.is_authenticated(request)
-        return super().create(request, *args, **kwargs)
-
-    def update(self, request, *args, **kwargs):
-        permissions.is_owner(request, self.get_object())
-        return super().update(request, *args, **kwargs)
-
-    def partial_update(self, request, *args, **kwargs):
-        permissions.is_owner(request, self.get_object())
-        return super().partial_update(request, *args, **kwargs)
+    permission_classes = (permissions.IsOwnerOrReadOnly,)
 
     def destroy(self, request, *args, **kwargs):
-        permissions.is_owner(request, self.get_object())
         audio = self.get_object()
         self.perform_destroy(audio)
         serializers.AudioSerializer.reinitialize_track_positions(audio.album)
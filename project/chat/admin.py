@@ -36,5 +36,15 @@ class MessageAdmin(admin.ModelAdmin):
     )
 
 
+class MessageArchiveAdmin(admin.ModelAdmin):
+    ordering = ("-month",)
+    list_display = (
+        "month",
+        "file",
+        "message_count",
+    )
+
+
 admin.site.register(models.Room, RoomAdmin)
 admin.site.register(models.Message, MessageAdmin)
+admin.site.register(models.MessageArchive, MessageArchiveAdmin)
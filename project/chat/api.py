@@ -1,23 +1,40 @@
-from django.db.models import Max
-from rest_framework import exceptions, mixins
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from rest_framework import exceptions, mixins, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from project.chat import models, serializers
+from project.chat import models, presence, serializers
 from project.core import permissions, search
 from project.core.api import mixins as core_mixins
+from project.core.drf import pagination
 
 
-class MessageViewSet(mixins.ListModelMixin, GenericViewSet):
+class MessageViewSet(
+    core_mixins.CursorPaginationMixin,
+    mixins.ListModelMixin,
+    GenericViewSet,
+):
     """
-    Returns messages for a Room.
+    Returns messages for a Room, newest first.
+
+    Use the `before` message id to scroll back through history
+    and the `after` message id to fetch messages since a message.
     """
 
     queryset = models.Message.objects.filter(active=True).order_by(
         "date_created",
     )
     serializer_class = serializers.MessageSerializer
+    cursor_pagination_class = pagination.MessageCursorPagination
+
+    def use_cursor_pagination(self):
+        return (
+            super().use_cursor_pagination()
+            or "before" in self.request.query_params
+            or "after" in self.request.query_params
+        )
 
     def get_queryset(self):
         if not self.request.user.is_authenticated:
@@ -35,10 +52,47 @@ class MessageViewSet(mixins.ListModelMixin, GenericViewSet):
         if self.request.user not in room.members.filter(is_active=True):
             raise exceptions.PermissionDenied
 
-        return self.queryset.filter(room=room).reverse()
+        return self.queryset.filter(room=room).order_by(
+            "-date_created",
+            "-id",
+        )
+
+    @action(detail=False, methods=["GET"])
+    def search(self, request):
+        """
+        Searches messages in the room given by `room_id`.
+
+        `q` is parsed as a web search query and results are ordered
+        by relevance. Each result has `before` and `after` URLs of
+        the messages around it.
+        """
+        query = request.query_params.get("q")
+        if not query:
+            raise exceptions.ParseError("q is required.")
+        queryset = (
+            search.search_queryset(self.get_queryset(), query)
+            .select_related("user")
+            .order_by("-search_rank", "-date_created", "-id")
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = serializers.MessageSearchSerializer(
+                page,
+                many=True,
+                context=self.get_serializer_context(),
+            )
+            return self.get_paginated_response(serializer.data)
+
+        serializer = serializers.MessageSearchSerializer(
+            queryset,
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
 
 
 class RoomViewSet(
+    core_mixins.CursorPaginationMixin,
     core_mixins.ListModelMixinWithSerializerContext,
     mixins.UpdateModelMixin,
     mixins.RetrieveModelMixin,
@@ -46,21 +100,24 @@ class RoomViewSet(
 ):
     """
     Returns active Rooms for a user.
+
+    Lists can be paginated by a cursor using `pagination=cursor`.
     """
 
-    queryset = (
-        models.Room.objects.filter(active=True)
-        .annotate(last_message_date=Max("messages__date_created"))
-        .order_by("-last_message_date")
-        .exclude(messages__isnull=True)
-    )
+    queryset = models.Room.objects.filter(
+        active=True,
+        last_message_date__isnull=False,
+    ).order_by("-last_message_date")
     serializer_class = serializers.RoomSerializer
+    cursor_pagination_class = pagination.RoomCursorPagination
 
     def get_queryset(self):
         if not self.request.user.is_authenticated:
             return self.queryset.none()
 
-        queryset = self.queryset.filter(members=self.request.user)
+        queryset = self.queryset.filter(
+            members=self.request.user,
+        ).with_serializer_data(self.request.user)
 
         gig_id = self.request.query_params.get("gig_id")  # noqa
         if gig_id:
@@ -80,23 +137,19 @@ class RoomViewSet(
 
     @action(detail=False, methods=["GET"])
     def search(self, request):
-        params = {}
-        query = request.query_params.get("q", "")
-        search.update_params_with_search_vectors(query, params)
-        subquery = (
-            models.Room.objects.filter(
-                members=self.request.user,
-                **params,
+        queryset = models.Room.objects.filter(
+            active=True,
+            members=self.request.user,
+            last_message_date__isnull=False,
+        ).with_serializer_data(request.user)
+        query = request.query_params.get("q")
+        if query:
+            queryset = search.search_queryset(queryset, query).order_by(
+                "-search_rank",
+                "-last_message_date",
             )
-            .distinct("id")
-            .values_list("id", flat=True)
-        )
-        queryset = (
-            models.Room.objects.filter(active=True, id__in=subquery)
-            .annotate(last_message_date=Max("messages__date_created"))
-            .order_by("-last_message_date")
-            .exclude(messages__isnull=True)
-        )
+        else:
+            queryset = queryset.order_by("-last_message_date")
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -111,18 +164,72 @@ class RoomViewSet(
     @action(detail=False, methods=["GET"])
     def rooms_with_unread_messages(self, request):
         """
-        Returns rooms with unread messages.
-        Sets unread messages to read.
+        Returns ids of rooms with unread messages.
+        Rooms are marked as read using the `read` action
+        or by connecting to the room's websocket.
         """
         user = request.user
         if not user.is_authenticated:
             raise exceptions.PermissionDenied
 
-        room_ids = user.room_ids_with_unread_messages
+        room_ids = (
+            models.Room.objects.filter(members=user, active=True)
+            .with_unread_messages(user)
+            .values_list("id", flat=True)
+        )
+        return Response({"rooms": [str(room_id) for room_id in room_ids]})
 
-        # Clearing rooms here as is assumed
-        # messages have now been read client side.
-        user.room_ids_with_unread_messages = []
-        user.save()
+    @action(detail=False, methods=["GET"])
+    def online(self, request):
+        """
+        Returns the ids of members online in each room of the
+        comma separated `room_ids`. Rooms the requesting user
+        isn't a member of are left out.
+        """
+        user = request.user
+        if not user.is_authenticated:
+            raise exceptions.PermissionDenied
+        if not settings.CHAT_PRESENCE_ENABLED:
+            raise exceptions.NotFound("Presence is not enabled.")
+
+        room_ids = [
+            room_id
+            for room_id in request.query_params.get("room_ids", "").split(",")
+            if room_id
+        ]
+        try:
+            room_ids = list(
+                models.Room.objects.filter(
+                    id__in=room_ids,
+                    members=user,
+                    active=True,
+                ).values_list("id", flat=True)
+            )
+        except ValidationError:
+            raise exceptions.ParseError("room_ids must be room ids.")
+        return Response({"rooms": presence.get_online_user_ids(room_ids)})
 
-        return Response({"rooms": room_ids})
+    @action(detail=True, methods=["POST"])
+    def read(self, request, pk=None):
+        """
+        Marks messages in a room as read, up to `message_id` if given.
+        """
+        room = self.get_object()
+        permissions.is_member(request, room)
+        message_id = request.data.get("message_id")
+        last_read_date = None
+        if message_id:
+            message = models.Message.objects.filter(
+                room=room,
+                id=message_id,
+            ).first()
+            if not message:
+                raise exceptions.NotFound("Message not found.")
+            last_read_date = message.date_created
+        models.ReadCursor.mark_read(
+            request.user,
+            room.id,
+            message_id=message_id,
+            last_read_date=last_read_date,
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,188 @@
+"""
+Archiving of old messages, keeping the message table, its indexes
+and vacuuming to recent history.
+
+Each month of messages older than CHAT_MESSAGE_ARCHIVE_AFTER_DAYS is
+written to a gzipped JSON lines file in default storage, recorded as
+a MessageArchive, and deleted from the message table. Archived months
+can be restored, for all rooms or one.
+"""
+import gzip
+import json
+import tempfile
+import uuid
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+from django.utils import dateparse, timezone
+
+from project.chat import models
+
+FIELDS = (
+    "id",
+    "room_id",
+    "user_id",
+    "message",
+    "date_created",
+    "date_updated",
+    "active",
+)
+BATCH_SIZE = 1000
+
+User = get_user_model()
+
+
+def get_month_range(month):
+    """
+    Returns the first days of the month and the month after.
+    """
+    start = month.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def get_start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def get_month_messages(month):
+    start, end = get_month_range(month)
+    return models.Message.objects.filter(
+        date_created__gte=get_start_of_day(start),
+        date_created__lt=get_start_of_day(end),
+    )
+
+
+def get_months_to_archive(days):
+    """
+    Returns the months with messages, all of which
+    are older than the given number of days.
+    """
+    cutoff = (timezone.now() - timedelta(days=days)).date()
+    before, _ = get_month_range(cutoff)
+    months = (
+        models.Message.objects.filter(
+            date_created__lt=get_start_of_day(before),
+        )
+        .annotate(month=TruncMonth("date_created"))
+        .values_list("month", flat=True)
+        .distinct()
+        .order_by("month")
+    )
+    return [month.date() for month in months]
+
+
+def archive_month(month):
+    """
+    Moves a month of messages to an archive and returns the archive.
+
+    If the month is already archived its messages can only have been
+    restored from the archive, so they're deleted without writing.
+    """
+    start, _ = get_month_range(month)
+    messages = get_month_messages(start)
+    archive = models.MessageArchive.objects.filter(month=start).first()
+    if archive:
+        messages.delete()
+        return archive
+
+    message_count = 0
+    with tempfile.TemporaryFile() as archive_file:
+        with gzip.GzipFile(fileobj=archive_file, mode="wb") as gzip_file:
+            rows = messages.order_by("date_created", "id").values(*FIELDS)
+            for row in rows.iterator(chunk_size=BATCH_SIZE):
+                line = json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+                gzip_file.write(line.encode())
+                message_count += 1
+        archive_file.seek(0)
+        with transaction.atomic():
+            archive = models.MessageArchive(
+                month=start,
+                message_count=message_count,
+            )
+            archive.file.save(
+                f"messages_{start:%Y_%m}.jsonl.gz",
+                File(archive_file),
+                save=False,
+            )
+            archive.save()
+            messages.delete()
+    return archive
+
+
+def read_archive(archive):
+    with archive.file.open("rb") as archive_file:
+        with gzip.GzipFile(fileobj=archive_file, mode="rb") as gzip_file:
+            for line in gzip_file:
+                row = json.loads(line)
+                row["date_created"] = dateparse.parse_datetime(
+                    row["date_created"]
+                )
+                row["date_updated"] = dateparse.parse_datetime(
+                    row["date_updated"]
+                )
+                yield row
+
+
+def restore_rows(rows):
+    """
+    Creates messages from archived rows, skipping messages already
+    there and those whose room or user has since been deleted.
+    Returns the number created.
+    """
+    room_ids = set(
+        models.Room.objects.filter(
+            id__in={row["room_id"] for row in rows},
+        ).values_list("id", flat=True)
+    )
+    user_ids = set(
+        User.objects.filter(
+            id__in={row["user_id"] for row in rows},
+        ).values_list("id", flat=True)
+    )
+    message_ids = set(
+        models.Message.objects.filter(
+            id__in=[row["id"] for row in rows],
+        ).values_list("id", flat=True)
+    )
+    messages = [
+        models.Message(**row)
+        for row in rows
+        if uuid.UUID(row["room_id"]) in room_ids
+        and uuid.UUID(row["user_id"]) in user_ids
+        and uuid.UUID(row["id"]) not in message_ids
+    ]
+    models.Message.objects.bulk_create(messages, ignore_conflicts=True)
+    return len(messages)
+
+
+def restore_archive(archive, room_id=None):
+    """
+    Copies an archive's messages, or only those of
+    one room, back into the message table.
+    Returns the number of messages restored.
+    """
+    restored_count = 0
+    rows = []
+    for row in read_archive(archive):
+        if room_id and row["room_id"] != str(room_id):
+            continue
+        rows.append(row)
+        if len(rows) >= BATCH_SIZE:
+            restored_count += restore_rows(rows)
+            rows = []
+    if rows:
+        restored_count += restore_rows(rows)
+    return restored_count
+
+
+def parse_month(value):
+    """
+    Parses a month given as YYYY-MM.
+    """
+    year, month = value.split("-")
+    return date(int(year), int(month), 1)
@@ -0,0 +1,270 @@
+"""
+Benchmarks of the chat consumers, run with the benchmark_chat
+management command.
+
+Simulated clients connect to the ASGI application with channels'
+WebsocketCommunicator, so everything from token authentication to
+the channel layer and database is included, without a server.
+"""
+import asyncio
+import math
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connections
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from project.chat import models
+from project.core import db
+
+User = get_user_model()
+
+USERNAME_PREFIX = "benchmark_"
+TIMEOUT = 30
+
+
+def get_percentile(values, percentile):
+    """
+    Returns the nearest rank percentile of values.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(math.ceil(percentile / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def get_latency_stats(latencies):
+    """
+    Returns p50, p95 and p99 of latencies, in milliseconds.
+    """
+    return {
+        f"p{percentile}_ms": round(
+            get_percentile(latencies, percentile) * 1000, 2
+        )
+        for percentile in (50, 95, 99)
+        if latencies
+    }
+
+
+class QueryCounter:
+    """
+    Counts queries run by every thread of the database thread pool.
+    Used as a wrapper of each thread's connection, see
+    https://docs.djangoproject.com/en/4.1/topics/db/instrumentation/
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def run_in_each_thread(self, func):
+        """
+        Runs func once in each thread of the pool, by blocking every
+        thread until all of them are running it.
+        """
+        size = db.get_executor()._max_workers
+        barrier = threading.Barrier(size)
+
+        def wait_and_run():
+            barrier.wait(timeout=TIMEOUT)
+            func()
+
+        futures = [db.get_executor().submit(wait_and_run) for _ in range(size)]
+        for future in futures:
+            future.result()
+
+    def install(self):
+        self.run_in_each_thread(
+            lambda: connections["default"].execute_wrappers.append(self)
+        )
+
+    def uninstall(self):
+        self.run_in_each_thread(
+            lambda: connections["default"].execute_wrappers.remove(self)
+        )
+
+
+def create_users(number_of_users):
+    """
+    Returns new users and access tokens for them.
+    """
+    users = []
+    tokens = []
+    for _ in range(number_of_users):
+        username = f"{USERNAME_PREFIX}{uuid.uuid4().hex[:12]}"
+        user = User.objects.create_user(
+            username,
+            f"{username}@example.com",
+            uuid.uuid4().hex,
+        )
+        users.append(user)
+        tokens.append(str(RefreshToken.for_user(user).access_token))
+    return users, tokens
+
+
+def create_room(users):
+    room = models.Room.objects.create(user=users[0], type=models.DIRECT)
+    room.members.add(*users)
+    return room
+
+
+def delete_users(users):
+    # Rooms and messages are deleted with their users.
+    User.objects.filter(id__in=[user.id for user in users]).delete()
+
+
+async def connect(path):
+    communicator = WebsocketCommunicator(
+        application=get_application(), path=path
+    )
+    start = time.perf_counter()
+    connected, _ = await communicator.connect(timeout=TIMEOUT)
+    if not connected:
+        raise RuntimeError(f"Connecting to {path} failed.")
+    return communicator, time.perf_counter() - start
+
+
+def get_application():
+    # Imported here as importing it sets up Django.
+    from project.core.asgi import application
+
+    return application
+
+
+async def receive_messages(communicator, number_of_messages, sent_times):
+    """
+    Returns the latency of each message received, from when
+    it was sent to when this client received it.
+    """
+    latencies = []
+    while len(latencies) < number_of_messages:
+        message = await communicator.receive_json_from(timeout=TIMEOUT)
+        if "type" in message:
+            # Presence and typing events.
+            continue
+        latencies.append(time.perf_counter() - sent_times[message["message"]])
+    return latencies
+
+
+async def send_messages(communicator, client, number_of_messages, sent_times):
+    for n in range(number_of_messages):
+        text = f"{client}:{n}"
+        sent_times[text] = time.perf_counter()
+        await communicator.send_json_to({"message": text})
+
+
+async def benchmark_existing_room(room, tokens, messages_per_client):
+    """
+    Connects a client per token to the room, and each sends
+    messages_per_client messages, received by every client.
+    """
+    connections_and_times = await asyncio.gather(
+        *(connect(f"ws/chat/{room.id}/?token={token}") for token in tokens)
+    )
+    communicators = [communicator for communicator, _ in connections_and_times]
+    number_of_messages = len(tokens) * messages_per_client
+    sent_times = {}
+    query_counter = QueryCounter()
+    await sync_to_async(query_counter.install)()
+    start = time.perf_counter()
+    try:
+        receivers = asyncio.gather(
+            *(
+                receive_messages(communicator, number_of_messages, sent_times)
+                for communicator in communicators
+            )
+        )
+        await asyncio.gather(
+            *(
+                send_messages(
+                    communicator,
+                    client,
+                    messages_per_client,
+                    sent_times,
+                )
+                for client, communicator in enumerate(communicators)
+            )
+        )
+        latencies = [
+            latency
+            for client_latencies in await receivers
+            for latency in client_latencies
+        ]
+        duration = time.perf_counter() - start
+    finally:
+        await sync_to_async(query_counter.uninstall)()
+        for communicator in communicators:
+            await communicator.disconnect()
+
+    return {
+        "clients": len(tokens),
+        "messages": number_of_messages,
+        "messages_per_second": round(number_of_messages / duration, 2),
+        "queries_per_message": round(
+            query_counter.count / number_of_messages, 2
+        ),
+        "connect": get_latency_stats(
+            [connect_time for _, connect_time in connections_and_times]
+        ),
+        "broadcast": get_latency_stats(latencies),
+    }
+
+
+async def benchmark_new_room(tokens, to_user):
+    """
+    Connects a client per token to start a direct room with to_user,
+    timing each until it's sent the room.
+    """
+    query_counter = QueryCounter()
+    await sync_to_async(query_counter.install)()
+
+    async def create_room(token):
+        path = (
+            f"ws/new_chat/?token={token}&type=direct&to_user_id={to_user.id}"
+        )
+        start = time.perf_counter()
+        communicator, _ = await connect(path)
+        await communicator.receive_json_from(timeout=TIMEOUT)
+        latency = time.perf_counter() - start
+        await communicator.disconnect()
+        return latency
+
+    try:
+        latencies = await asyncio.gather(
+            *(create_room(token) for token in tokens)
+        )
+    finally:
+        await sync_to_async(query_counter.uninstall)()
+
+    return {
+        "clients": len(tokens),
+        "queries_per_room": round(query_counter.count / len(tokens), 2),
+        "room": get_latency_stats(latencies),
+    }
+
+
+def run(number_of_clients, messages_per_client):
+    """
+    Runs the benchmarks with new users, deleting them afterwards.
+    Returns a dict of results for each consumer.
+    """
+    users, tokens = create_users(number_of_clients + 1)
+    try:
+        room = create_room(users[:-1])
+        existing_room = asyncio.run(
+            benchmark_existing_room(room, tokens[:-1], messages_per_client)
+        )
+        new_room = asyncio.run(benchmark_new_room(tokens[:-1], users[-1]))
+    finally:
+        delete_users(users)
+    return {"existing_room": existing_room, "new_room": new_room}
@@ -1,3 +1,4 @@
 # flake8: noqa
 from project.chat.consumers.existing_room import ExistingRoomConsumer
 from project.chat.consumers.new_room import NewRoomConsumer
+from project.chat.consumers.user import UserConsumer
@@ -7,6 +7,19 @@ def format_user(user):
     return {"id": str(user.id), "username": user.username}
 
 
+def format_message(room_id, user, message_id, message):
+    """
+    Returns a chat message as sent to clients.
+    `user` is formatted by format_user.
+    """
+    return {
+        "room": str(room_id),
+        "user": user,
+        "id": str(message_id),
+        "message": message,
+    }
+
+
 def log_error(scope, message):
     user = (
         format_user(scope["user"])
@@ -1,20 +1,34 @@
 import json
+from urllib.parse import parse_qs
 
 from channels import exceptions
-from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 
 from project.chat import models
-from project.chat.consumers import common
+from project.chat.consumers import common, mixins
+from project.core.db import database_sync_to_async
 
 User = get_user_model()
 
 
-class ExistingRoomConsumer(AsyncWebsocketConsumer):
+class ExistingRoomConsumer(
+    mixins.PresenceMixin,
+    mixins.RoomMessagesMixin,
+    AsyncWebsocketConsumer,
+):
+    """
+    Clients reconnecting can pass the id of the last message they
+    received as `last_message_id` to be sent messages they missed.
+
+    Clients send `{"typing": true}` while their user is typing.
+    """
+
     def __init__(self, *args, **kwargs):
         self.room = None
         self.room_group_name = None
+        self.replayed_message_ids = set()
         super().__init__(*args, **kwargs)
 
     async def connect(self):
@@ -27,26 +41,45 @@ class ExistingRoomConsumer(AsyncWebsocketConsumer):
             raise exceptions.DenyConnection
 
         self.room = await self.get_room()
-        self.room_group_name = "room_%s" % self.room.id
+        self.room_group_name = mixins.get_room_group_name(self.room.id)
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name,
         )
         await self.accept()
 
+        query_string = parse_qs(self.scope["query_string"].decode())
+        last_message_id = query_string.get("last_message_id")
+        if last_message_id:
+            await self.send_missed_messages(self.room, last_message_id[0])
+        await self.mark_read(self.room.id)
+        await self.join_presence(self.room.id)
+
     @database_sync_to_async
     def get_room(self):
+        """
+        Returns the room if the user is a member of it.
+        """
         room_id = self.scope["url_route"]["kwargs"]["room_id"]
-        room_query = models.Room.objects.filter(id=room_id)
-        if not room_query.exists():
+        try:
+            room = models.Room.objects.filter(
+                id=room_id,
+                active=True,
+                members=self.scope["user"],
+            ).first()
+        except (ValidationError, ValueError):
+            room = None
+        if not room:
             common.log_error(
                 self.scope,
-                "Disconnecting, room_id not found in database",
+                "Disconnecting, room_id not found or user not a member",
             )
             raise exceptions.DenyConnection
-        return room_query.first()
+        return room
 
     async def disconnect(self, close_code):
+        await self.flush_messages()
+        await self.leave_all_presence()
         await self.channel_layer.group_discard(
             self.room_group_name, self.channel_name
         )
@@ -55,57 +88,13 @@ class ExistingRoomConsumer(AsyncWebsocketConsumer):
         """
         Receive message from websocket.
         """
-        message = json.loads(text_data)["message"]
-        if not message:
+        data = json.loads(text_data)
+        if data.get("typing"):
+            await self.send_typing(self.room.id)
             return
 
-        user = self.scope["user"]
-        message_id = await self.create_message(user, message)
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "chat_message",
-                "user": common.format_user(user),
-                "message_id": str(message_id),
-                "message": message,
-            },
-        )
-
-    @database_sync_to_async
-    def create_message(self, user, content):
-        message = models.Message.objects.create(
-            user=user,
-            room=models.Room.objects.get(id=self.room.id),
-            message=content,
-        )
-        return message.id
-
-    @database_sync_to_async
-    def update_room_ids_with_unread_messages(self, exclude_username):
-        """
-        Indicates to users that they have new messages for this room.
-        """
-        members = self.room.members.exclude(
-            username=exclude_username["username"]
-        )
-        for member in members:
-            member.add_room_id_with_unread_messages(str(self.room.id))
-            member.save()
+        message = data.get("message")
+        if not message:
+            return
 
-    async def chat_message(self, event):
-        """
-        Receives message from room group.
-        Broadcasts message via websocket.
-        """
-        user = event["user"]
-        await self.update_room_ids_with_unread_messages(user)
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "room": str(self.room.id),
-                    "user": user,
-                    "id": str(event["message_id"]),
-                    "message": event["message"],
-                }
-            )
-        )
+        await self.send_room_message(self.room, message)
@@ -0,0 +1,341 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import dateparse, timezone
+
+from project.chat import models, presence, streams, writer
+from project.chat.consumers import common
+from project.core.db import database_sync_to_async
+
+logger = logging.getLogger(__name__)
+
+
+def get_room_group_name(room_id):
+    return "room_%s" % room_id
+
+
+class RoomMessagesMixin:
+    """
+    Sending, receiving and replaying room messages,
+    for consumers connected to room groups.
+    """
+
+    def format_message(self, room_id, user, message_id, message):
+        return common.format_message(room_id, user, message_id, message)
+
+    async def create_message(self, user, room, content):
+        """
+        Returns the new message's id and date created. With
+        CHAT_MESSAGE_BATCHING_ENABLED the message is written later.
+        """
+        if not settings.CHAT_MESSAGE_BATCHING_ENABLED:
+            return await self.save_message(user, room, content)
+        message = models.Message(
+            id=uuid.uuid4(),
+            user=user,
+            room=room,
+            message=content,
+            date_created=timezone.now(),
+        )
+        await writer.get_writer().add(message)
+        return message.id, message.date_created
+
+    async def flush_messages(self):
+        """
+        Writes batched messages, so a client's messages are
+        written by the time it has disconnected.
+        """
+        if settings.CHAT_MESSAGE_BATCHING_ENABLED:
+            await writer.get_writer().flush()
+
+    @database_sync_to_async
+    def save_message(self, user, room, content):
+        message = models.Message.objects.create(
+            user=user,
+            room=room,
+            message=content,
+        )
+        return message.id, message.date_created
+
+    async def send_room_message(self, room, content):
+        """
+        Saves a message and sends it to the room group.
+        """
+        user = self.scope["user"]
+        message_id, date_created = await self.create_message(
+            user,
+            room,
+            content,
+        )
+        if settings.CHAT_STREAMS_ENABLED:
+            await streams.add_message(
+                room.id,
+                common.format_message(
+                    room.id,
+                    common.format_user(user),
+                    message_id,
+                    content,
+                ),
+            )
+        await self.channel_layer.group_send(
+            get_room_group_name(room.id),
+            {
+                "type": "chat_message",
+                "room_id": str(room.id),
+                "user": common.format_user(user),
+                "message_id": str(message_id),
+                "date_created": date_created.isoformat(),
+                "message": content,
+            },
+        )
+
+    @database_sync_to_async
+    def mark_read(self, room_id, message_id=None, last_read_date=None):
+        """
+        Moves this consumer's user's read cursor, as they're
+        connected to the room and receiving its messages.
+        """
+        if settings.CHAT_MESSAGE_BATCHING_ENABLED:
+            # The message may not have been written yet.
+            message_id = None
+        models.ReadCursor.mark_read(
+            self.scope["user"],
+            room_id,
+            message_id=message_id,
+            last_read_date=last_read_date,
+        )
+
+    async def send_missed_messages(self, room, last_message_id):
+        """
+        Sends messages after `last_message_id` from the room's stream,
+        or the database if the message isn't in the stream.
+        """
+        messages = None
+        if settings.CHAT_STREAMS_ENABLED:
+            messages = await streams.get_messages_after(
+                room.id,
+                last_message_id,
+            )
+        if messages is None:
+            messages = await self.get_messages_after(room, last_message_id)
+        for message in messages:
+            # Messages sent to the group while replaying are
+            # received afterwards, so aren't sent twice.
+            self.replayed_message_ids.add(message["id"])
+            await self.send(
+                text_data=json.dumps(
+                    self.format_message(
+                        message["room"],
+                        message["user"],
+                        message["id"],
+                        message["message"],
+                    )
+                )
+            )
+
+    @database_sync_to_async
+    def get_messages_after(self, room, message_id):
+        try:
+            message = models.Message.objects.filter(
+                room=room,
+                id=message_id,
+            ).first()
+        except ValidationError:
+            message = None
+        if not message:
+            return []
+        messages = (
+            models.Message.objects.filter(room=room, active=True)
+            .filter(
+                Q(date_created__gt=message.date_created)
+                | Q(date_created=message.date_created, id__gt=message.id)
+            )
+            .select_related("user")
+            .order_by("date_created", "id")[: settings.CHAT_STREAM_MAX_LENGTH]
+        )
+        return [
+            common.format_message(
+                room.id,
+                common.format_user(message.user),
+                message.id,
+                message.message,
+            )
+            for message in messages
+        ]
+
+    async def chat_message(self, event):
+        """
+        Receives message from room group.
+        Broadcasts message via websocket.
+        """
+        if event["message_id"] in self.replayed_message_ids:
+            self.replayed_message_ids.discard(event["message_id"])
+            return
+
+        await self.mark_read(
+            event["room_id"],
+            message_id=event["message_id"],
+            last_read_date=dateparse.parse_datetime(event["date_created"]),
+        )
+        await self.send(
+            text_data=json.dumps(
+                self.format_message(
+                    event["room_id"],
+                    event["user"],
+                    event["message_id"],
+                    event["message"],
+                )
+            )
+        )
+
+
+class PresenceMixin:
+    """
+    Presence and typing indicators for consumers connected to room
+    groups. With CHAT_PRESENCE_ENABLED, rooms are sent a `presence`
+    event when a member comes online or goes offline in the room,
+    including when their connections time out.
+    Typing is sent to rooms as a `typing` event, at most once every
+    CHAT_TYPING_DEBOUNCE_SECONDS per user.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.presence_room_ids = set()
+        self.heartbeat_task = None
+        self.typing_sent = {}
+        super().__init__(*args, **kwargs)
+
+    async def join_presence(self, room_id):
+        if not settings.CHAT_PRESENCE_ENABLED:
+            return
+        room_id = str(room_id)
+        self.presence_room_ids.add(room_id)
+        await self.refresh_presence(room_id)
+        if self.heartbeat_task is None:
+            self.heartbeat_task = asyncio.ensure_future(self.heartbeat())
+
+    async def refresh_presence(self, room_id):
+        user = self.scope["user"]
+        came_online, offline_users = await presence.add_connection(
+            room_id,
+            user,
+            self.channel_name,
+        )
+        if came_online:
+            await self.send_presence(
+                room_id,
+                common.format_user(user),
+                online=True,
+            )
+        for user_id, username in offline_users.items():
+            await self.send_presence(
+                room_id,
+                {"id": user_id, "username": username},
+                online=False,
+            )
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(settings.CHAT_PRESENCE_HEARTBEAT_SECONDS)
+            for room_id in list(self.presence_room_ids):
+                try:
+                    await self.refresh_presence(room_id)
+                except Exception:
+                    # Carrying on, as otherwise the user would
+                    # go offline once their connections time out.
+                    logger.exception(
+                        "Refreshing presence in room:%s failed.",
+                        room_id,
+                    )
+
+    async def leave_presence(self, room_id):
+        room_id = str(room_id)
+        if room_id not in self.presence_room_ids:
+            return
+        self.presence_room_ids.discard(room_id)
+        went_offline = await presence.remove_connection(
+            room_id,
+            self.scope["user"],
+            self.channel_name,
+        )
+        if went_offline:
+            await self.send_presence(
+                room_id,
+                common.format_user(self.scope["user"]),
+                online=False,
+            )
+
+    async def leave_all_presence(self):
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+            self.heartbeat_task = None
+        for room_id in list(self.presence_room_ids):
+            await self.leave_presence(room_id)
+
+    async def send_presence(self, room_id, user, online):
+        """
+        Sends the room that a user, formatted
+        by format_user, came online or went offline.
+        """
+        await self.channel_layer.group_send(
+            get_room_group_name(room_id),
+            {
+                "type": "presence_event",
+                "room_id": str(room_id),
+                "user": user,
+                "online": online,
+            },
+        )
+
+    async def send_typing(self, room_id):
+        """
+        Sends typing to the room, unless it was sent recently.
+        """
+        room_id = str(room_id)
+        now = time.monotonic()
+        last_sent = self.typing_sent.get(room_id)
+        if (
+            last_sent is not None
+            and now - last_sent < settings.CHAT_TYPING_DEBOUNCE_SECONDS
+        ):
+            return
+        self.typing_sent[room_id] = now
+        await self.channel_layer.group_send(
+            get_room_group_name(room_id),
+            {
+                "type": "typing_event",
+                "room_id": room_id,
+                "user": common.format_user(self.scope["user"]),
+            },
+        )
+
+    async def presence_event(self, event):
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "presence",
+                    "room": event["room_id"],
+                    "user": event["user"],
+                    "online": event["online"],
+                }
+            )
+        )
+
+    async def typing_event(self, event):
+        if event["user"]["id"] == str(self.scope["user"].id):
+            return
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "typing",
+                    "room": event["room_id"],
+                    "user": event["user"],
+                }
+            )
+        )
@@ -0,0 +1,234 @@
+import json
+
+from channels import exceptions
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+
+from project.chat import inbox, models, serializers
+from project.chat.consumers import common, mixins
+from project.core.db import database_sync_to_async
+from project.core.requests import SudoRequest
+from project.gig import models as gig_models
+
+User = get_user_model()
+
+
+class UserConsumer(
+    mixins.PresenceMixin,
+    mixins.RoomMessagesMixin,
+    AsyncWebsocketConsumer,
+):
+    """
+    A single websocket per user for all of their rooms.
+
+    Clients send JSON with a `type` of:
+        `subscribe` with `room_id` and optionally `last_message_id`
+            to receive a room's messages, and any they missed.
+        `unsubscribe` with `room_id`.
+        `send` with `room_id` and `message`.
+        `typing` with `room_id` while the user is typing.
+        `create_room` with `room_type` of `direct` and `to_user_id`,
+            or `gig` and `gig_id`. The room is subscribed to.
+
+    Clients are sent JSON with a `type` of:
+        `message` for messages in subscribed rooms.
+        `inbox` for the last message of any of the user's rooms.
+        `room` for a room created or found with `create_room`.
+        `presence` when a member comes online or goes offline in a
+            subscribed room, and `typing` when a member is typing.
+        `subscribed` and `unsubscribed` with `room_id`.
+        `error` with `error`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.user_group_name = None
+        self.rooms = {}
+        self.replayed_message_ids = set()
+        super().__init__(*args, **kwargs)
+
+    async def connect(self):
+        user = self.scope["user"]
+        if not user.is_authenticated:
+            common.log_error(
+                self.scope,
+                "Disconnecting, user not authenticated",
+            )
+            raise exceptions.DenyConnection
+
+        self.user_group_name = inbox.get_user_group_name(user.id)
+        await self.channel_layer.group_add(
+            self.user_group_name,
+            self.channel_name,
+        )
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.flush_messages()
+        await self.leave_all_presence()
+        if self.user_group_name:
+            await self.channel_layer.group_discard(
+                self.user_group_name,
+                self.channel_name,
+            )
+        for room_id in self.rooms:
+            await self.channel_layer.group_discard(
+                mixins.get_room_group_name(room_id),
+                self.channel_name,
+            )
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Receive message from websocket.
+        """
+        try:
+            data = json.loads(text_data)
+        except (TypeError, ValueError):
+            await self.send_error("Invalid JSON.")
+            return
+        if not isinstance(data, dict):
+            await self.send_error("Invalid JSON.")
+            return
+
+        handler = {
+            "subscribe": self.receive_subscribe,
+            "unsubscribe": self.receive_unsubscribe,
+            "send": self.receive_send,
+            "typing": self.receive_typing,
+            "create_room": self.receive_create_room,
+        }.get(data.get("type"))
+        if not handler:
+            await self.send_error("Unknown type.")
+            return
+        await handler(data)
+
+    async def receive_subscribe(self, data):
+        room = await self.get_member_room(data.get("room_id"))
+        if not room:
+            await self.send_error("Room not found.")
+            return
+        await self.subscribe(room, data.get("last_message_id"))
+
+    async def subscribe(self, room, last_message_id=None):
+        room_id = str(room.id)
+        if room_id not in self.rooms:
+            self.rooms[room_id] = room
+            await self.channel_layer.group_add(
+                mixins.get_room_group_name(room_id),
+                self.channel_name,
+            )
+        await self.send_json({"type": "subscribed", "room_id": room_id})
+        if last_message_id:
+            await self.send_missed_messages(room, last_message_id)
+        await self.mark_read(room.id)
+        await self.join_presence(room.id)
+
+    async def receive_unsubscribe(self, data):
+        room_id = str(data.get("room_id"))
+        if self.rooms.pop(room_id, None):
+            await self.leave_presence(room_id)
+            await self.channel_layer.group_discard(
+                mixins.get_room_group_name(room_id),
+                self.channel_name,
+            )
+        await self.send_json({"type": "unsubscribed", "room_id": room_id})
+
+    async def receive_send(self, data):
+        room = self.rooms.get(str(data.get("room_id")))
+        if not room:
+            await self.send_error("Not subscribed to room.")
+            return
+        message = data.get("message")
+        if not message:
+            return
+        await self.send_room_message(room, message)
+
+    async def receive_typing(self, data):
+        room_id = str(data.get("room_id"))
+        if room_id not in self.rooms:
+            await self.send_error("Not subscribed to room.")
+            return
+        await self.send_typing(room_id)
+
+    async def receive_create_room(self, data):
+        room = await self.get_or_create_room(data)
+        if not room:
+            await self.send_error("Room could not be created.")
+            return
+        room_serialized = await self.serialize_room(room)
+        await self.subscribe(room)
+        await self.send_json({"type": "room", "room": room_serialized})
+
+    @database_sync_to_async
+    def get_member_room(self, room_id):
+        try:
+            return models.Room.objects.filter(
+                id=room_id,
+                active=True,
+                members=self.scope["user"],
+            ).first()
+        except (ValidationError, ValueError):
+            return None
+
+    @database_sync_to_async
+    def get_or_create_room(self, data):
+        user = self.scope["user"]
+        room_type = str(data.get("room_type", "")).upper()
+        try:
+            if room_type == models.DIRECT:
+                to_user = User.objects.filter(
+                    id=data.get("to_user_id"),
+                ).first()
+                if not to_user or to_user == user:
+                    return None
+                room, _ = models.Room.get_or_create_direct_room(
+                    user,
+                    to_user,
+                )
+                return room
+            if room_type == models.GIG:
+                gig = gig_models.Gig.objects.filter(
+                    id=data.get("gig_id"),
+                ).first()
+                if not gig:
+                    return None
+                room, _ = models.Room.get_or_create_gig_room(user, gig)
+                return room
+        except (ValidationError, ValueError):
+            return None
+        return None
+
+    @database_sync_to_async
+    def serialize_room(self, room):
+        request = SudoRequest(user=self.scope["user"])
+        return serializers.RoomSerializer(
+            room,
+            context={"request": request},
+        ).data
+
+    def format_message(self, room_id, user, message_id, message):
+        return {
+            "type": "message",
+            **common.format_message(room_id, user, message_id, message),
+        }
+
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content))
+
+    async def send_error(self, error):
+        await self.send_json({"type": "error", "error": error})
+
+    async def inbox_message(self, event):
+        """
+        Receives a room's last message from the user group.
+        """
+        await self.send_json(
+            {
+                "type": "inbox",
+                "room": event["room_id"],
+                "user": event["user"],
+                "id": event["message_id"],
+                "message": event["message"],
+                "date_created": event["date_created"],
+            }
+        )
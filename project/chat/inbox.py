@@ -0,0 +1,31 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from project.chat.consumers import common
+
+
+def get_user_group_name(user_id):
+    return "user_%s" % user_id
+
+
+def send_inbox_message(message):
+    """
+    Sends a room's new last message to each of its members
+    connected to the user websocket, so their room
+    list can be updated without fetching it.
+    """
+    channel_layer = get_channel_layer()
+    event = {
+        "type": "inbox_message",
+        "room_id": str(message.room_id),
+        "user": common.format_user(message.user),
+        "message_id": str(message.id),
+        "date_created": message.date_created.isoformat(),
+        "message": message.message,
+    }
+    member_ids = message.room.members.values_list("id", flat=True)
+    for member_id in member_ids:
+        async_to_sync(channel_layer.group_send)(
+            get_user_group_name(member_id),
+            event,
+        )
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from project.chat import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves months of messages older than CHAT_MESSAGE_ARCHIVE_AFTER_DAYS "
+        "to gzipped archives in storage. See chat.archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.CHAT_MESSAGE_ARCHIVE_AFTER_DAYS,
+            help="Archive months of messages all older than this.",
+        )
+
+    def handle(self, *args, **options):
+        for month in archive.get_months_to_archive(options["days"]):
+            message_archive = archive.archive_month(month)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Archived {month:%Y-%m} to {message_archive.file.name}."
+                )
+            )
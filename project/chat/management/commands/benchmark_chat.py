@@ -0,0 +1,46 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from project.chat import benchmarks
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the chat consumers with simulated clients, reporting "
+        "latency percentiles, messages per second and queries per message. "
+        "Command can only be run on the local environment."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=10)
+        parser.add_argument("--messages", type=int, default=10)
+        parser.add_argument(
+            "--in-memory",
+            action="store_true",
+            help="Use the in memory channel layer instead of Redis.",
+        )
+
+    def handle(self, *args, **options):
+        if settings.ENV != "local":
+            self.stdout.write(
+                self.style.ERROR(
+                    "Failed. This command can only be "
+                    "executed on the local environment."
+                )
+            )
+            return
+        channel_layers = (
+            IN_MEMORY_CHANNEL_LAYERS
+            if options["in_memory"]
+            else settings.CHANNEL_LAYERS
+        )
+        with override_settings(CHANNEL_LAYERS=channel_layers):
+            results = benchmarks.run(options["clients"], options["messages"])
+        self.stdout.write(json.dumps(results, indent=4))
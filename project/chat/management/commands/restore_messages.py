@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from project.chat import archive, models
+
+
+class Command(BaseCommand):
+    help = (
+        "Restores a month of archived messages, "
+        "optionally only those of one room."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("month", help="The month to restore, YYYY-MM.")
+        parser.add_argument("--room", help="The id of a room to restore.")
+
+    def handle(self, *args, **options):
+        try:
+            month = archive.parse_month(options["month"])
+        except ValueError:
+            raise CommandError("month must be YYYY-MM.")
+        message_archive = models.MessageArchive.objects.filter(
+            month=month,
+        ).first()
+        if not message_archive:
+            raise CommandError(f"No archive for {options['month']}.")
+
+        restored_count = archive.restore_archive(
+            message_archive,
+            room_id=options["room"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Restored {restored_count} messages.")
+        )
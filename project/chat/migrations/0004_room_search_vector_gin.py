@@ -0,0 +1,24 @@
+# Generated by Django 4.1.2 on 2026-10-18 11:20
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "chat",
+            "0003_room_search_gig_country_room_search_gig_description_and_more",  # noqa
+        ),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="room",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"],
+                name="room_search_vector_gin",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.1.2 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0004_room_search_vector_gin"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["room", "date_created", "id"],
+                name="message_room_date_id_idx",
+            ),
+        ),
+    ]
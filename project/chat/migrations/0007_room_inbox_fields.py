@@ -0,0 +1,74 @@
+# Generated by Django 4.1.2 on 2026-10-18 13:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def set_inbox_fields(apps, schema_editor):
+    Room = apps.get_model("chat", "Room")  # noqa
+    Message = apps.get_model("chat", "Message")  # noqa
+    for room in Room.objects.all().iterator():
+        last_message = (
+            Message.objects.filter(room=room)
+            .order_by("date_created", "id")
+            .last()
+        )
+        if last_message:
+            room.last_message = last_message
+            room.last_message_text = last_message.message
+            room.last_message_date = last_message.date_created
+        room.members_summary = [
+            {
+                "id": str(member.id),
+                "username": member.username,
+                "is_active": member.is_active,
+                "image": member.image.name or None,
+                "thumbnail": member.thumbnail.name or None,
+            }
+            for member in room.members.order_by("date_joined")
+        ]
+        room.save(
+            update_fields=[
+                "last_message",
+                "last_message_text",
+                "last_message_date",
+                "members_summary",
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0006_readcursor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="room",
+            name="last_message",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="chat.message",
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="last_message_date",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="last_message_text",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="members_summary",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(set_inbox_fields, migrations.RunPython.noop),
+    ]
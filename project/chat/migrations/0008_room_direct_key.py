@@ -0,0 +1,53 @@
+# Generated by Django 4.1.2 on 2026-10-18 14:10
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def set_direct_keys(apps, schema_editor):
+    """
+    Keys active direct rooms by their members. Where several rooms
+    have the same members only the most recently used is keyed.
+    """
+    Room = apps.get_model("chat", "Room")  # noqa
+    used_keys = set()
+    rooms = Room.objects.filter(type="DIRECT", active=True).order_by(
+        models.F("last_message_date").desc(nulls_last=True),
+        "-date_created",
+    )
+    for room in rooms.iterator():
+        member_ids = room.members.values_list("id", flat=True)
+        joined_ids = ":".join(
+            sorted(str(member_id) for member_id in member_ids)
+        )
+        direct_key = hashlib.sha256(joined_ids.encode()).hexdigest()
+        if direct_key in used_keys:
+            continue
+        used_keys.add(direct_key)
+        room.direct_key = direct_key
+        room.save(update_fields=["direct_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0007_room_inbox_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="room",
+            name="direct_key",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(set_direct_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="room",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("active", True)),
+                fields=("direct_key",),
+                name="room_unique_active_direct_key",
+            ),
+        ),
+    ]
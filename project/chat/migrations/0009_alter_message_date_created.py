@@ -0,0 +1,22 @@
+# Generated by Django 4.1.2 on 2026-10-18 14:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0008_room_direct_key"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="message",
+            name="date_created",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                editable=False,
+            ),
+        ),
+    ]
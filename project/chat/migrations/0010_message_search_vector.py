@@ -0,0 +1,51 @@
+# Generated by Django 4.1.2 on 2026-10-18 15:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_TRIGGER = """
+CREATE FUNCTION chat_message_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := to_tsvector(coalesce(NEW.message, ''));
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER chat_message_search_vector_update
+BEFORE INSERT OR UPDATE OF message ON chat_message
+FOR EACH ROW EXECUTE PROCEDURE chat_message_search_vector_update();
+
+UPDATE chat_message SET search_vector = to_tsvector(coalesce(message, ''));
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS chat_message_search_vector_update ON chat_message;
+DROP FUNCTION IF EXISTS chat_message_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0009_alter_message_date_created"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False,
+                null=True,
+            ),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.AddIndex(
+            model_name="message",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"],
+                name="message_search_vector_gin",
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.1.2 on 2026-10-18 15:45
+
+import uuid
+
+from django.db import migrations, models
+
+import project.chat.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0010_message_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MessageArchive",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("date_created", models.DateTimeField(auto_now_add=True)),
+                ("date_updated", models.DateTimeField(auto_now=True)),
+                ("active", models.BooleanField(default=True)),
+                ("month", models.DateField(unique=True)),
+                (
+                    "file",
+                    models.FileField(
+                        storage=project.chat.models.get_archive_storage,
+                        upload_to="chat_archives",
+                    ),
+                ),
+                ("message_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
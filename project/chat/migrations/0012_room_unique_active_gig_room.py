@@ -0,0 +1,48 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:50
+
+from django.db import migrations, models
+
+
+def deactivate_duplicate_gig_rooms(apps, schema_editor):
+    """
+    Where a user has several active rooms in response to a gig,
+    keeps the most recently used active.
+    """
+    Room = apps.get_model("chat", "Room")  # noqa
+    seen = set()
+    rooms = (
+        Room.objects.filter(type="GIG", active=True)
+        .order_by(
+            models.F("last_message_date").desc(nulls_last=True),
+            "-date_created",
+        )
+        .values_list("id", "user_id", "gig_id")
+    )
+    duplicate_ids = []
+    for room_id, user_id, gig_id in rooms.iterator():
+        if (user_id, gig_id) in seen:
+            duplicate_ids.append(room_id)
+        seen.add((user_id, gig_id))
+    Room.objects.filter(id__in=duplicate_ids).update(active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0011_messagearchive"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            deactivate_duplicate_gig_rooms,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="room",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("active", True), ("type", "GIG")),
+                fields=("user", "gig"),
+                name="room_unique_active_gig_room",
+            ),
+        ),
+    ]
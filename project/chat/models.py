@@ -1,7 +1,13 @@
-from django.contrib.postgres import search
-from django.db import models
+import hashlib
 
-from project.core.models import BaseModel
+from django.apps import apps
+from django.conf import settings
+from django.contrib.postgres import indexes, search
+from django.core.files.storage import get_storage_class
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from project.core.models import BaseModel, SearchVectorMixin
 
 DIRECT = "DIRECT"
 GIG = "GIG"
@@ -11,7 +17,57 @@ TYPE_CHOICES = (
 )
 
 
-class Room(BaseModel):
+def get_direct_key(user_ids):
+    """
+    Returns a key unique to a set of users, regardless of order.
+    """
+    joined_ids = ":".join(sorted(str(user_id) for user_id in user_ids))
+    return hashlib.sha256(joined_ids.encode()).hexdigest()
+
+
+class RoomQuerySet(models.QuerySet):
+    def with_serializer_data(self, user):
+        """
+        Prefetches data used by RoomSerializer. The last message,
+        title and images are read from the room's inbox fields.
+        """
+        Gig = apps.get_model("gig", "Gig")  # noqa
+        User = apps.get_model("custom_user", "User")  # noqa
+        return self.prefetch_related(
+            models.Prefetch("user", User.objects.with_serializer_data(user)),
+            models.Prefetch(
+                "members",
+                User.objects.with_serializer_data(user),
+            ),
+            models.Prefetch("gig", Gig.objects.with_serializer_data(user)),
+        )
+
+    def with_unread_messages(self, user):
+        """
+        Filters rooms to those with messages from other
+        members sent after the user's read cursor.
+        """
+        last_read_date = ReadCursor.objects.filter(
+            user=user,
+            room=models.OuterRef("room"),
+        ).values("last_read_date")[:1]
+        unread_messages = (
+            Message.objects.filter(
+                room=models.OuterRef("pk"),
+                active=True,
+            )
+            .exclude(user=user)
+            .annotate(last_read_date=models.Subquery(last_read_date))
+            .filter(
+                models.Q(last_read_date__isnull=True)
+                | models.Q(date_created__gt=models.F("last_read_date"))
+            )
+        )
+        return self.filter(models.Exists(unread_messages))
+
+
+class Room(SearchVectorMixin, BaseModel):
+    objects = RoomQuerySet.as_manager()
 
     user = models.ForeignKey(
         "custom_user.User",
@@ -42,38 +98,176 @@ class Room(BaseModel):
     search_gig_genres = models.TextField(null=True)
     search_vector = search.SearchVectorField(null=True)
 
-    def save(self, *args, **kwargs):
-        super().save()
-        self.update_search_vector()
+    # Inbox fields, kept up to date when messages are
+    # created and members change. See chat.signals.
+    last_message = models.ForeignKey(
+        "chat.Message",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    last_message_text = models.TextField(null=True, blank=True)
+    last_message_date = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+    )
+    members_summary = models.JSONField(default=list, blank=True)
+
+    # Identifies an active direct room by its members. See get_direct_key.
+    direct_key = models.CharField(max_length=64, null=True, blank=True)
 
-    def update_search_vector(self):
-        self.search_username = self.user.username
-        self.search_members = " ".join(
-            member.username
-            for member in self.members.all().exclude(id=self.user.id)
-        )
+    class Meta:
+        indexes = [
+            indexes.GinIndex(
+                fields=["search_vector"],
+                name="room_search_vector_gin",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["direct_key"],
+                condition=models.Q(active=True),
+                name="room_unique_active_direct_key",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "gig"],
+                condition=models.Q(type=GIG, active=True),
+                name="room_unique_active_gig_room",
+            ),
+        ]
+
+    search_vector_fields = (
+        ("search_username", "A"),
+        ("search_members", "A"),
+        ("search_gig_title", "A"),
+        ("search_gig_genres", "B"),
+        ("search_gig_location", "C"),
+        ("search_gig_country", "C"),
+        ("search_gig_description", "D"),
+    )
+    search_vector_source_fields = ("user", "gig", "members")
+
+    def get_search_fields(self):
+        search_fields = {
+            "search_username": self.user.username,
+            "search_members": " ".join(
+                member.username
+                for member in self.members.all().exclude(id=self.user.id)
+            ),
+        }
         if self.gig:
-            self.search_gig_title = self.gig.title  # noqa
-            self.search_gig_description = self.gig.description  # noqa
-            self.search_gig_location = self.gig.location  # noqa
-            self.search_gig_country = (
-                f"{self.gig.country.country} {self.gig.country.code}"  # noqa
+            search_fields.update(
+                {
+                    "search_gig_title": self.gig.title,  # noqa
+                    "search_gig_description": self.gig.description,  # noqa
+                    "search_gig_location": self.gig.location,  # noqa
+                    "search_gig_country": (
+                        f"{self.gig.country.country} "  # noqa
+                        f"{self.gig.country.code}"  # noqa
+                    ),
+                    "search_gig_genres": " ".join(
+                        genre.genre for genre in self.gig.genres.all()  # noqa
+                    ),
+                }
             )
-            self.search_gig_genres = " ".join(
-                genre.genre for genre in self.gig.genres.all()  # noqa
+        return search_fields
+
+    @classmethod
+    def get_or_create_direct_room(cls, user, to_user):
+        """
+        Returns the active direct room for the two users and a boolean
+        indicating if it was created. The unique direct_key means
+        concurrent calls can't create duplicate rooms.
+        """
+        direct_key = get_direct_key([user.id, to_user.id])
+        try:
+            with transaction.atomic():
+                room, created = cls.objects.get_or_create(
+                    direct_key=direct_key,
+                    active=True,
+                    defaults={"user": user, "type": DIRECT},
+                )
+                if created:
+                    room.members.add(user, to_user)
+        except IntegrityError:
+            # Created by a concurrent call after get_or_create's retry.
+            room = cls.objects.get(direct_key=direct_key, active=True)
+            created = False
+        return room, created
+
+    @classmethod
+    def get_or_create_gig_room(cls, user, gig):
+        """
+        Returns the user's active room in response to the gig and
+        a boolean indicating if it was created. The unique constraint
+        on active gig rooms means concurrent calls can't create
+        duplicate rooms.
+        """
+        try:
+            with transaction.atomic():
+                room, created = cls.objects.get_or_create(
+                    user=user,
+                    gig=gig,
+                    type=GIG,
+                    active=True,
+                )
+                if created:
+                    room.members.add(user, gig.user)
+        except IntegrityError:
+            # Created by a concurrent call after get_or_create's retry.
+            room = cls.objects.get(user=user, gig=gig, type=GIG, active=True)
+            created = False
+        return room, created
+
+    def update_direct_key(self):
+        """
+        Keys a direct room by its current members.
+        Raises IntegrityError if an active room already has the key.
+        """
+        if self.type != DIRECT:
+            return
+        self.direct_key = get_direct_key(
+            self.members.values_list("id", flat=True)
+        )
+        with transaction.atomic():
+            type(self).objects.filter(id=self.id).update(
+                direct_key=self.direct_key
             )
-        # Saving here for fields to show up for SearchVector.
-        super().save()
-        self.search_vector = search.SearchVector(
-            "search_username",
-            "search_members",
-            "search_gig_title",
-            "search_gig_description",
-            "search_gig_location",
-            "search_gig_country",
-            "search_gig_genres",
+
+    @classmethod
+    def set_last_message(cls, message):
+        """
+        Sets the inbox fields of the message's room, unless
+        a later message has already been set.
+        """
+        cls.objects.filter(id=message.room_id).filter(
+            models.Q(last_message_date__isnull=True)
+            | models.Q(last_message_date__lt=message.date_created)
+        ).update(
+            last_message=message,
+            last_message_text=message.message,
+            last_message_date=message.date_created,
+        )
+
+    def get_members_summary(self):
+        return [
+            {
+                "id": str(member.id),
+                "username": member.username,
+                "is_active": member.is_active,
+                "image": member.image.name or None,
+                "thumbnail": member.thumbnail.name or None,
+            }
+            for member in self.members.order_by("date_joined")
+        ]
+
+    def update_members_summary(self):
+        self.members_summary = self.get_members_summary()
+        type(self).objects.filter(id=self.id).update(
+            members_summary=self.members_summary
         )
-        super().save()
 
 
 class Message(BaseModel):
@@ -94,9 +288,100 @@ class Message(BaseModel):
         related_name="messages",
     )
     message = models.TextField(default="")
+    # Not auto_now_add, so messages written in batches keep
+    # the date they were sent to clients with. See chat.writer.
+    date_created = models.DateTimeField(default=timezone.now, editable=False)
+    # Set from message by a database trigger, so it's also
+    # set for messages written with bulk_create.
+    search_vector = search.SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["room", "date_created", "id"],
+                name="message_room_date_id_idx",
+            ),
+            indexes.GinIndex(
+                fields=["search_vector"],
+                name="message_search_vector_gin",
+            ),
+        ]
+
+
+class ReadCursor(BaseModel):
+    """
+    The last message a user has read in a room.
+    Messages in the room after it are unread.
+    """
+
+    user = models.ForeignKey(
+        "custom_user.User",
+        on_delete=models.CASCADE,
+        related_name="read_cursors",
+    )
+    room = models.ForeignKey(
+        "chat.Room",
+        on_delete=models.CASCADE,
+        related_name="read_cursors",
+    )
+    last_read_message = models.ForeignKey(
+        "chat.Message",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    last_read_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "room"],
+                name="read_cursor_unique_user_room",
+            ),
+        ]
+
+    @classmethod
+    def mark_read(cls, user, room_id, message_id=None, last_read_date=None):
+        """
+        Moves the user's read cursor for a room to the message sent at
+        last_read_date, or to now if not given. Never moves it back.
+        """
+        last_read_date = last_read_date or timezone.now()
+        read_cursor, created = cls.objects.get_or_create(
+            user=user,
+            room_id=room_id,
+            defaults={
+                "last_read_message_id": message_id,
+                "last_read_date": last_read_date,
+            },
+        )
+        if created:
+            return read_cursor
+        cls.objects.filter(id=read_cursor.id).filter(
+            models.Q(last_read_date__isnull=True)
+            | models.Q(last_read_date__lt=last_read_date)
+        ).update(
+            last_read_message_id=message_id,
+            last_read_date=last_read_date,
+            date_updated=timezone.now(),
+        )
+        return read_cursor
 
-    def save(self, *args, **kwargs):
-        super().save()
-        self.room.update_search_vector()
-        if self.room.gig:
-            self.room.gig.update_search_vector()
+
+def get_archive_storage():
+    return get_storage_class(settings.CHAT_MESSAGE_ARCHIVE_STORAGE)()
+
+
+class MessageArchive(BaseModel):
+    """
+    A month of messages moved out of the message table into a gzipped
+    JSON lines file. See chat.archive.
+    """
+
+    month = models.DateField(unique=True)
+    file = models.FileField(
+        upload_to="chat_archives",
+        storage=get_archive_storage,
+    )
+    message_count = models.PositiveIntegerField(default=0)
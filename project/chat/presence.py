@@ -0,0 +1,108 @@
+"""
+Who is online in each room, kept in Redis.
+
+Each room has a sorted set of its connections, scored by when they
+expire. Consumers refresh their connections every
+CHAT_PRESENCE_HEARTBEAT_SECONDS, and connections not refreshed
+for CHAT_PRESENCE_TIMEOUT_SECONDS, e.g. from a server that
+stopped, are treated as offline. A user is online in a room while
+any of their connections to it are. Users whose connections timed out
+are found, and removed, by the next heartbeat of a connection to the room.
+"""
+import time
+
+from django.conf import settings
+
+import redis
+from project.core import async_redis
+
+_connection = None
+
+
+def get_presence_key(room_id):
+    return f"chat:presence:{room_id}"
+
+
+def get_connection_member(user, channel_name):
+    # Last as usernames can contain colons, unlike channel names.
+    return f"{user.id}:{channel_name}:{user.username}"
+
+
+def get_users(members):
+    """
+    Returns the users of connections as {id: username}.
+    """
+    users = {}
+    for member in members:
+        user_id, _, username = member.decode().split(":", 2)
+        users[user_id] = username
+    return users
+
+
+def get_user_ids(members):
+    return set(get_users(members))
+
+
+async def add_connection(room_id, user, channel_name):
+    """
+    Adds or refreshes a connection to a room. Returns True if the
+    user wasn't already online in the room, and the users who went
+    offline as their connections timed out, as {id: username}.
+    """
+    now = time.time()
+    timeout = settings.CHAT_PRESENCE_TIMEOUT_SECONDS
+    key = get_presence_key(room_id)
+    # A transaction so timed out connections are only returned once.
+    pipeline = async_redis.get_connection().pipeline(transaction=True)
+    pipeline.zrangebyscore(key, now, "+inf")
+    pipeline.zrangebyscore(key, "-inf", now)
+    pipeline.zremrangebyscore(key, "-inf", now)
+    pipeline.zadd(
+        key,
+        {get_connection_member(user, channel_name): now + timeout},
+    )
+    pipeline.expire(key, timeout)
+    members, timed_out_members, *_ = await pipeline.execute()
+    online_users = get_users(members)
+    offline_users = {
+        user_id: username
+        for user_id, username in get_users(timed_out_members).items()
+        if user_id not in online_users and user_id != str(user.id)
+    }
+    return str(user.id) not in online_users, offline_users
+
+
+async def remove_connection(room_id, user, channel_name):
+    """
+    Removes a connection to a room.
+    Returns True if the user is no longer online in the room.
+    """
+    key = get_presence_key(room_id)
+    pipeline = async_redis.get_connection().pipeline(transaction=False)
+    pipeline.zrem(key, get_connection_member(user, channel_name))
+    pipeline.zrangebyscore(key, time.time(), "+inf")
+    _, members = await pipeline.execute()
+    return str(user.id) not in get_user_ids(members)
+
+
+def get_sync_connection():
+    global _connection
+    if _connection is None:
+        _connection = redis.Redis.from_url(settings.CHAT_REDIS_URL)
+    return _connection
+
+
+def get_online_user_ids(room_ids):
+    """
+    Returns a dict of room id to the ids of users online in the room,
+    read in one round trip.
+    """
+    room_ids = [str(room_id) for room_id in room_ids]
+    now = time.time()
+    pipeline = get_sync_connection().pipeline(transaction=False)
+    for room_id in room_ids:
+        pipeline.zrangebyscore(get_presence_key(room_id), now, "+inf")
+    return {
+        room_id: sorted(get_user_ids(members))
+        for room_id, members in zip(room_ids, pipeline.execute())
+    }
@@ -3,6 +3,7 @@ from django.urls import re_path
 from project.chat import consumers
 
 websocket_urlpatterns = [
+    re_path(r"ws/user/", consumers.user.UserConsumer.as_asgi()),
     re_path(r"ws/new_chat/", consumers.new_room.NewRoomConsumer.as_asgi()),
     re_path(
         r"ws/chat/(?P<room_id>[^/.]+)/",
@@ -1,4 +1,8 @@
-from django.db import transaction
+from urllib.parse import urlencode
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.urls import reverse
 from rest_framework import serializers
 
 from project.chat import models
@@ -19,6 +23,38 @@ class MessageSerializer(serializers.ModelSerializer):
         )
 
 
+class MessageSearchSerializer(MessageSerializer):
+    """
+    A message found by search, with URLs of the messages
+    before and after it for showing it in context.
+    """
+
+    before = serializers.SerializerMethodField()
+    after = serializers.SerializerMethodField()
+
+    class Meta(MessageSerializer.Meta):
+        fields = MessageSerializer.Meta.fields + (
+            "date_created",
+            "before",
+            "after",
+        )
+
+    def get_messages_url(self, instance, cursor):
+        request = self.context["request"]
+        query_string = urlencode(
+            {"room_id": instance.room_id, cursor: instance.id}
+        )
+        return request.build_absolute_uri(
+            f"{reverse('message-api-list')}?{query_string}"
+        )
+
+    def get_before(self, instance):
+        return self.get_messages_url(instance, "before")
+
+    def get_after(self, instance):
+        return self.get_messages_url(instance, "after")
+
+
 class RoomSerializer(serializers.ModelSerializer):
     title = serializers.SerializerMethodField()
     timestamp = serializers.SerializerMethodField()
@@ -55,37 +91,46 @@ class RoomSerializer(serializers.ModelSerializer):
 
         # Assume room is type DIRECT
         return ", ".join(
-            member.username for member in room.members.filter(is_active=True)
+            member["username"]
+            for member in room.members_summary
+            if member["is_active"]
         )
 
     def get_timestamp(self, room):
         """
         Date of the last message posted.
         """
-        message = self.retrieve_last_message(room)
-        if not message:
+        if not room.last_message_date:
             return None
-        return message.date_created.isoformat()
-
-    def retrieve_last_message(self, room):
-        return room.messages.order_by("date_created").last()
+        return room.last_message_date.isoformat()
 
     def get_last_message(self, room):
         """
         Returns the last message posted.
         """
-        message = self.retrieve_last_message(room)
-        if not message:
-            return None
-        return message.message
+        return room.last_message_text
 
     def get_members(self, room):
         return user_serializers.UserSerializerIfNotOwner(
-            room.members,
+            room.members.all(),
             many=True,
             context=self.context,
         ).data
 
+    def get_other_member_summary(self, room):
+        """
+        Returns the first member excluding the requesting user.
+        """
+        requesting_user_id = str(self.context["request"].user.id)
+        # TODO - The first member might change if more members are
+        # added. This would result in the image changing which is
+        # not desirable. Check logic again when more members are
+        # added to a room.
+        for member in room.members_summary:
+            if member["id"] != requesting_user_id:
+                return member
+        return None
+
     def get_image(self, room):
         """
         Returns the image for the gig if the room is of that type.
@@ -98,20 +143,11 @@ class RoomSerializer(serializers.ModelSerializer):
                 if room.gig.image
                 else None
             )
-        else:
-            requesting_user = self.context["request"].user
-            # TODO - returning first member excluding requesting user.
-            # The order of the query might change if more members are
-            # added. This would result in the image changing which is
-            # not desirable. Check logic again when more members are
-            # added to a room.
-            member = room.members.exclude(id=requesting_user.id).first()
-            if member:
-                return (
-                    domain.build_absolute_uri(member.image.url)
-                    if member.image
-                    else None
-                )
+        member = self.get_other_member_summary(room)
+        if member and member["image"]:
+            return domain.build_absolute_uri(
+                default_storage.url(member["image"])
+            )
         return None
 
     def get_thumbnail(self, room):
@@ -126,20 +162,11 @@ class RoomSerializer(serializers.ModelSerializer):
                 if room.gig.thumbnail
                 else None
             )
-        else:
-            requesting_user = self.context["request"].user
-            # TODO - returning first member excluding requesting user.
-            # The order of the query might change if more members are
-            # added. This would result in the thumbnail changing which is
-            # not desirable. Check logic again when more members are
-            # added to a room.
-            member = room.members.exclude(id=requesting_user.id).first()
-            if member:
-                return (
-                    domain.build_absolute_uri(member.thumbnail.url)
-                    if member.thumbnail
-                    else None
-                )
+        member = self.get_other_member_summary(room)
+        if member and member["thumbnail"]:
+            return domain.build_absolute_uri(
+                default_storage.url(member["thumbnail"])
+            )
         return None
 
     def validate(self, data):
@@ -160,5 +187,11 @@ class RoomSerializer(serializers.ModelSerializer):
         if members:
             instance.members.clear()
             instance.members.add(self.context["request"].user, *members)
+            try:
+                instance.update_direct_key()
+            except IntegrityError:
+                raise serializers.ValidationError(
+                    {"members": "A room already exists for these members."}
+                )
 
         return instance
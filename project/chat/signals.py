@@ -1,30 +1,43 @@
-from django.conf import settings
-from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_save
 from django.dispatch import receiver
 
-from project.chat import models, serializers
-from project.core.requests import SudoRequest
-from project.custom_user import tasks as user_tasks
+from project.chat import models, writer
+
+User = get_user_model()
+
+MEMBERS_SUMMARY_FIELDS = {"username", "is_active", "image", "thumbnail"}
 
 
 @receiver(post_save, sender=models.Message)
-def create_chat_message(sender, instance, created, **kwargs):
-    if not created:
+def create_chat_message(sender, instance, created, raw, **kwargs):
+    if not created or raw:
         return
+    writer.messages_created([instance])
 
-    if not settings.PUSH_NOTIFICATIONS_ENABLED:
+
+@receiver(m2m_changed, sender=models.Room.members.through)
+def update_room_members_summary(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        instance.update_members_summary()
         return
+    if not pk_set:
+        return
+    for room in models.Room.objects.filter(id__in=pk_set):
+        room.update_members_summary()
+
 
-    # Send push notification to other members of the room.
-    for user in instance.room.members.exclude(id=instance.user.id):
-        request = SudoRequest(user=user)
-        room_serialized = serializers.RoomSerializer(
-            instance.room,
-            context={"request": request},
-        )
-        user_tasks.send_push_notification.delay(
-            user_id=user.id,
-            title=f"Message from {instance.user.username}",
-            message=instance.message,
-            data={"type": "room", "serialized_object": room_serialized.data},
-        )
+@receiver(post_save, sender=User)
+def update_user_rooms_members_summary(
+    sender, instance, created, raw, **kwargs
+):
+    if created or raw:
+        return
+    if not instance.get_dirty_fields() & MEMBERS_SUMMARY_FIELDS:
+        return
+    for room in instance.rooms_membership.all():
+        room.update_members_summary()
@@ -0,0 +1,58 @@
+"""
+Optional Redis Streams log of each room's recent messages, used to
+replay messages a client missed while disconnected. Enabled with
+CHAT_STREAMS_ENABLED and keeps around CHAT_STREAM_MAX_LENGTH messages
+per room.
+"""
+import json
+
+from django.conf import settings
+
+from project.core import async_redis
+
+# Number of entries read from a stream at a time.
+READ_COUNT = 100
+
+
+def get_stream_key(room_id):
+    return f"chat:room:{room_id}"
+
+
+async def add_message(room_id, message):
+    """
+    Adds a message, as sent to clients, to the room's stream.
+    """
+    await async_redis.get_connection().xadd(
+        get_stream_key(room_id),
+        {"id": message["id"], "message": json.dumps(message)},
+        maxlen=settings.CHAT_STREAM_MAX_LENGTH,
+        approximate=True,
+    )
+
+
+async def get_messages_after(room_id, message_id):
+    """
+    Returns messages added to the room's stream after the message,
+    oldest first. Returns None if the message isn't in the stream,
+    e.g. it has been trimmed.
+    """
+    connection = async_redis.get_connection()
+    stream_key = get_stream_key(room_id)
+    messages = []
+    maximum = "+"
+    while True:
+        entries = await connection.xrevrange(
+            stream_key,
+            max=maximum,
+            min="-",
+            count=READ_COUNT,
+        )
+        for entry_id, fields in entries:
+            if fields[b"id"].decode() == message_id:
+                messages.reverse()
+                return messages
+            messages.append(json.loads(fields[b"message"]))
+        if len(entries) < READ_COUNT:
+            return None
+        # Exclusive of the last entry read.
+        maximum = f"({entries[-1][0].decode()}"
@@ -0,0 +1,48 @@
+import logging
+
+from celery import shared_task
+
+from project.chat import models, serializers
+from project.core.requests import SudoRequest
+from project.custom_user import push_notifications
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(queue="push_notifications")
+def send_message_push_notifications(message_id):
+    """
+    Queues push notifications of a message for the
+    other members of the message's room.
+    """
+    message = (
+        models.Message.objects.filter(id=message_id)
+        .select_related("user", "room")
+        .first()
+    )
+    if not message:
+        logger.error("message with id:%s not found.", message_id)
+        return
+
+    recipients = list(
+        message.room.members.filter(is_active=True).exclude(id=message.user_id)
+    )
+    if not recipients:
+        return
+
+    for recipient in recipients:
+        # Serialized for each recipient as the title, image and
+        # members depend on who's viewing. The app uses it to open
+        # the room. Rooms only have a few members.
+        room_serialized = serializers.RoomSerializer(
+            models.Room.objects.with_serializer_data(recipient).get(
+                id=message.room_id
+            ),
+            context={"request": SudoRequest(user=recipient)},
+        ).data
+        push_notifications.queue_push_notification(
+            user_id=recipient.id,
+            title=f"Message from {message.user.username}",
+            message=message.message,
+            data={"type": "room", "serialized_object": room_serialized},
+        )
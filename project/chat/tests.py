@@ -1,17 +1,22 @@
 import json
+import time
+import uuid
 from datetime import timedelta
 
 from asgiref.sync import sync_to_async
 from channels.testing import WebsocketCommunicator
-from django.test import TestCase, TransactionTestCase
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from django_redis import get_redis_connection
 from rest_framework import status
 
-from project.chat import models
+from project.chat import archive, benchmarks, models, presence, tasks, writer
 from project.core import tests as core_tests
 from project.core.asgi import application
 from project.country import models as country_models
+from project.custom_user import auth_cache, push_notifications
 from project.gig import models as gig_models
 
 
@@ -56,6 +61,7 @@ class ChatTestCase(ChannelsTestCase):
             user=self.fred,
             type=models.GIG,
         )
+        self.room.members.add(self.fred, self.jiggy)
 
     async def test_send_message_when_unauthenticated(self):
         room = "99"
@@ -75,6 +81,40 @@ class ChatTestCase(ChannelsTestCase):
         connected, sub_protocol = await communicator.connect()
         self.assertFalse(connected)
 
+    async def test_connect_when_user_deactivated_after_connecting(self):
+        path = f"ws/chat/{self.room.id}/?token={self.jiggy_token}"
+        communicator = WebsocketCommunicator(application, path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+        self.jiggy.is_active = False
+        await sync_to_async(self.jiggy.save)()
+        communicator = WebsocketCommunicator(application, path)
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+    async def test_connect_after_password_changed(self):
+        path = f"ws/chat/{self.room.id}/?token={self.jiggy_token}"
+        self.jiggy.set_password("new_password")
+        await sync_to_async(self.jiggy.save)()
+        communicator = WebsocketCommunicator(application, path)
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+    async def test_connect_with_user_loaded_from_database(self):
+        await sync_to_async(auth_cache.delete_user)(self.jiggy.id)
+        path = f"ws/chat/{self.room.id}/?token={self.jiggy_token}"
+        # The user is loaded from the database and cached,
+        # then read from the cache.
+        for _ in range(2):
+            communicator = WebsocketCommunicator(application, path)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.disconnect()
+        user, _ = await sync_to_async(auth_cache.get_user)(self.jiggy.id)
+        self.assertIsNotNone(user)
+
     async def test_initiate_new_direct_chat(self):
         path = (
             f"ws/new_chat/?token={self.jiggy_token}"
@@ -215,6 +255,274 @@ class ChatTestCase(ChannelsTestCase):
         await communicator_1.disconnect()
         await communicator_2.disconnect()
 
+    async def test_typing_is_sent_to_other_clients_once(self):
+        path = f"ws/chat/{self.room.id}/"
+        communicator_1 = WebsocketCommunicator(
+            application=application,
+            path=path + "?token=" + self.jiggy_token,
+        )
+        communicator_2 = WebsocketCommunicator(
+            application=application,
+            path=path + "?token=" + self.fred_token,
+        )
+        connected_1, _ = await communicator_1.connect()
+        self.assertTrue(connected_1)
+        connected_2, _ = await communicator_2.connect()
+        self.assertTrue(connected_2)
+
+        await communicator_1.send_json_to(data={"typing": True})
+        await communicator_1.send_json_to(data={"typing": True})
+        response = await communicator_2.receive_json_from()
+        self.assertEqual(response["type"], "typing")
+        self.assertEqual(response["user"]["username"], "jiggy")
+        # Debounced, and not sent back to the typing client.
+        self.assertTrue(await communicator_2.receive_nothing())
+        self.assertTrue(await communicator_1.receive_nothing())
+
+        await communicator_1.disconnect()
+        await communicator_2.disconnect()
+
+    @override_settings(
+        CHAT_MESSAGE_BATCHING_ENABLED=True,
+        CHAT_MESSAGE_BATCH_SIZE=10,
+        CHAT_MESSAGE_BATCH_SECONDS=60,
+    )
+    async def test_batched_messages_are_written_on_disconnect(self):
+        communicator = WebsocketCommunicator(
+            application=application,
+            path=f"ws/chat/{self.room.id}/?token={self.jiggy_token}",
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        for text in ("first", "second"):
+            await communicator.send_json_to(data={"message": text})
+            response = await communicator.receive_json_from()
+            self.assertEqual(response["message"], text)
+        messages_count = await sync_to_async(
+            models.Message.objects.filter(room=self.room).count
+        )()
+        self.assertEqual(messages_count, 0)
+
+        await communicator.disconnect()
+        messages_count = await sync_to_async(
+            models.Message.objects.filter(room=self.room).count
+        )()
+        self.assertEqual(messages_count, 2)
+        room = await sync_to_async(models.Room.objects.get)(id=self.room.id)
+        self.assertEqual(room.last_message_text, "second")
+
+    def test_failing_message_does_not_lose_the_batch(self):
+        messages = [
+            models.Message(
+                id=uuid.uuid4(),
+                room=self.room,
+                user=self.fred,
+                message="first",
+                date_created=timezone.now(),
+            ),
+            # As if the room was deleted before the batch was written.
+            models.Message(
+                id=uuid.uuid4(),
+                room_id=uuid.uuid4(),
+                user=self.fred,
+                message="lost",
+                date_created=timezone.now(),
+            ),
+            models.Message(
+                id=uuid.uuid4(),
+                room=self.room,
+                user=self.jiggy,
+                message="second",
+                date_created=timezone.now(),
+            ),
+        ]
+        self.assertEqual(writer.write_messages(messages), [])
+        self.assertEqual(
+            list(
+                models.Message.objects.order_by("date_created").values_list(
+                    "message",
+                    flat=True,
+                )
+            ),
+            ["first", "second"],
+        )
+
+    async def test_missed_messages_are_sent_on_reconnect(self):
+        messages = []
+        for text in ("first", "second", "third"):
+            messages.append(
+                await sync_to_async(models.Message.objects.create)(
+                    room=self.room,
+                    user=self.fred,
+                    message=text,
+                )
+            )
+        path = (
+            f"ws/chat/{self.room.id}/?token={self.jiggy_token}"
+            f"&last_message_id={messages[0].id}"
+        )
+        communicator = WebsocketCommunicator(
+            application=application,
+            path=path,
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        response1 = json.loads(await communicator.receive_from())
+        self.assertEqual(response1["id"], str(messages[1].id))
+        response2 = json.loads(await communicator.receive_from())
+        self.assertEqual(response2["id"], str(messages[2].id))
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_connect_to_room_not_member_of(self):
+        message = await sync_to_async(models.Message.objects.create)(
+            room=self.room,
+            user=self.fred,
+            message="hello!",
+        )
+        _, bungle_token = await sync_to_async(create_user_and_token)("bungle")
+        path = (
+            f"ws/chat/{self.room.id}/?token={bungle_token}"
+            f"&last_message_id={message.id}"
+        )
+        communicator = WebsocketCommunicator(
+            application=application,
+            path=path,
+        )
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+    @override_settings(CHAT_PRESENCE_ENABLED=True)
+    async def test_presence(self):
+        fred = WebsocketCommunicator(
+            application,
+            f"ws/chat/{self.room.id}/?token={self.fred_token}",
+        )
+        connected, _ = await fred.connect()
+        self.assertTrue(connected)
+        response = await fred.receive_json_from()
+        self.assertEqual(
+            response,
+            {
+                "type": "presence",
+                "room": str(self.room.id),
+                "user": {"id": str(self.fred.id), "username": "fred"},
+                "online": True,
+            },
+        )
+
+        jiggy = WebsocketCommunicator(
+            application,
+            f"ws/chat/{self.room.id}/?token={self.jiggy_token}",
+        )
+        connected, _ = await jiggy.connect()
+        self.assertTrue(connected)
+        response = await fred.receive_json_from()
+        self.assertEqual(response["user"]["username"], "jiggy")
+        self.assertTrue(response["online"])
+
+        response = await sync_to_async(self.client.get)(
+            reverse("room-api-online"),
+            {"room_ids": str(self.room.id)},
+            **{
+                core_tests.AUTH_HEADER_NAME: (
+                    f"{core_tests.AUTH_HEADER_TYPE} {self.fred_token}"
+                )
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["rooms"],
+            {
+                str(self.room.id): sorted(
+                    [str(self.fred.id), str(self.jiggy.id)]
+                )
+            },
+        )
+
+        await jiggy.disconnect()
+        response = await fred.receive_json_from()
+        self.assertEqual(response["user"]["username"], "jiggy")
+        self.assertFalse(response["online"])
+        await fred.disconnect()
+
+    @override_settings(CHAT_PRESENCE_ENABLED=True)
+    async def test_timed_out_connection_goes_offline(self):
+        # As if jiggy was connected to a server which stopped.
+        member = presence.get_connection_member(self.jiggy, "specific.x!1")
+        await sync_to_async(presence.get_sync_connection().zadd)(
+            presence.get_presence_key(self.room.id),
+            {member: time.time() - 1},
+        )
+        fred = WebsocketCommunicator(
+            application,
+            f"ws/chat/{self.room.id}/?token={self.fred_token}",
+        )
+        connected, _ = await fred.connect()
+        self.assertTrue(connected)
+        responses = [await fred.receive_json_from() for _ in range(2)]
+        self.assertEqual(
+            [
+                (response["user"]["username"], response["online"])
+                for response in responses
+            ],
+            [("fred", True), ("jiggy", False)],
+        )
+        await fred.disconnect()
+
+    async def test_user_websocket_subscribe_and_send(self):
+        communicator = WebsocketCommunicator(
+            application=application,
+            path=f"ws/user/?token={self.jiggy_token}",
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_json_to(
+            {"type": "subscribe", "room_id": str(self.room.id)}
+        )
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "subscribed")
+        self.assertEqual(response["room_id"], str(self.room.id))
+
+        await communicator.send_json_to(
+            {
+                "type": "send",
+                "room_id": str(self.room.id),
+                "message": "hello",
+            }
+        )
+        responses = {}
+        for _ in range(2):
+            response = await communicator.receive_json_from()
+            responses[response["type"]] = response
+        self.assertEqual(responses["message"]["message"], "hello")
+        self.assertEqual(responses["message"]["room"], str(self.room.id))
+        self.assertEqual(responses["inbox"]["message"], "hello")
+        self.assertEqual(responses["inbox"]["user"]["username"], "jiggy")
+        await communicator.disconnect()
+
+    async def test_user_websocket_subscribe_to_room_not_member_of(self):
+        room = await sync_to_async(models.Room.objects.create)(
+            user=self.fred,
+            type=models.DIRECT,
+        )
+        communicator = WebsocketCommunicator(
+            application=application,
+            path=f"ws/user/?token={self.jiggy_token}",
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_json_to(
+            {"type": "subscribe", "room_id": str(room.id)}
+        )
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "error")
+        await communicator.disconnect()
+
 
 class TestMessageViewSet(TestCase):
     def setUp(self):
@@ -272,3 +580,302 @@ class TestMessageViewSet(TestCase):
                 result["message"],
                 messages_reversed[n]["message"],
             )
+
+    def test_get_messages_before_and_after_message(self):
+        messages = list(
+            models.Message.objects.filter(room=self.room).order_by(
+                "date_created"
+            )
+        )
+        path = reverse("message-api-list")
+
+        response = self.fred_client.get(
+            path=path,
+            data={"room_id": self.room.id, "before": messages[3].id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["message"] for result in response.data["results"]],
+            ["third_message", "second_message", "first_message"],
+        )
+        self.assertIsNone(response.data["next"])
+
+        response = self.fred_client.get(
+            path=path,
+            data={
+                "room_id": self.room.id,
+                "after": messages[1].id,
+                "page_size": 2,
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["message"] for result in response.data["results"]],
+            ["third_message", "forth_message"],
+        )
+
+        response = self.fred_client.get(path=response.data["next"])
+        self.assertEqual(
+            [result["message"] for result in response.data["results"]],
+            ["fifth_message"],
+        )
+
+    def test_get_messages_before_message_in_other_room(self):
+        response = self.fred_client.get(
+            path=reverse("message-api-list"),
+            data={"room_id": self.room.id, "before": uuid.uuid4()},
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_messages(self):
+        path = reverse("message-api-search")
+        response = self.fred_client.get(
+            path=path + f"?room_id={self.room.id}&q=third",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["message"], "third_message")
+        self.assertIn(f"before={results[0]['id']}", results[0]["before"])
+
+        response = self.fred_client.get(path=results[0]["after"])
+        self.assertEqual(
+            [message["message"] for message in response.data["results"]],
+            ["forth_message", "fifth_message"],
+        )
+
+    def test_search_messages_when_user_is_not_member_of_room(self):
+        user, drf_client = core_tests.setup_user_with_drf_client(
+            username="bungle",
+        )
+        response = drf_client.get(
+            path=reverse("message-api-search")
+            + f"?room_id={self.room.id}&q=third",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_rooms_with_unread_messages(self):
+        path = reverse("room-api-rooms-with-unread-messages")
+        response = self.fred_client.get(path=path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["rooms"], [str(self.room.id)])
+
+        # Fetching doesn't mark rooms as read.
+        response = self.fred_client.get(path=path)
+        self.assertEqual(response.data["rooms"], [str(self.room.id)])
+
+        response = self.fred_client.post(
+            path=reverse("room-api-read", kwargs={"pk": self.room.id}),
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.fred_client.get(path=path)
+        self.assertEqual(response.data["rooms"], [])
+
+        models.Message.objects.create(
+            room=self.room,
+            user=self.jiggy,
+            message="sixth_message",
+        )
+        response = self.fred_client.get(path=path)
+        self.assertEqual(response.data["rooms"], [str(self.room.id)])
+
+    @override_settings(CHAT_PRESENCE_ENABLED=True)
+    def test_online_members(self):
+        other_room = models.Room.objects.create(
+            user=self.jiggy,
+            type=models.DIRECT,
+        )
+        path = reverse("room-api-online")
+        response = self.fred_client.get(
+            path=path + f"?room_ids={self.room.id},{other_room.id}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Only rooms fred is a member of.
+        self.assertEqual(response.data["rooms"], {str(self.room.id): []})
+
+    def test_own_messages_are_not_unread(self):
+        models.ReadCursor.mark_read(self.fred, self.room.id)
+        models.Message.objects.create(
+            room=self.room,
+            user=self.fred,
+            message="sixth_message",
+        )
+        response = self.fred_client.get(
+            path=reverse("room-api-rooms-with-unread-messages"),
+        )
+        self.assertEqual(response.data["rooms"], [])
+
+    def test_room_inbox_fields(self):
+        response = self.fred_client.get(path=reverse("room-api-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.data["results"][0]
+        self.assertEqual(result["last_message"], "fifth_message")
+        self.assertEqual(result["title"], "fred, jiggy")
+
+        self.jiggy.username = "jiggy_stardust"
+        self.jiggy.save()
+        response = self.fred_client.get(path=reverse("room-api-list"))
+        self.assertEqual(
+            response.data["results"][0]["title"],
+            "fred, jiggy_stardust",
+        )
+
+
+class RoomModelTestCase(TestCase):
+    def setUp(self):
+        self.fred = core_tests.create_user(username="fred")
+        self.jiggy = core_tests.create_user(username="jiggy")
+
+    def test_get_or_create_direct_room(self):
+        room, created = models.Room.get_or_create_direct_room(
+            self.fred,
+            self.jiggy,
+        )
+        self.assertTrue(created)
+        self.assertEqual(room.members.count(), 2)
+
+        same_room, created = models.Room.get_or_create_direct_room(
+            self.jiggy,
+            self.fred,
+        )
+        self.assertFalse(created)
+        self.assertEqual(same_room.id, room.id)
+
+    def test_direct_key_is_unique_for_active_rooms(self):
+        room, _ = models.Room.get_or_create_direct_room(self.fred, self.jiggy)
+        room.active = False
+        room.save()
+
+        new_room, created = models.Room.get_or_create_direct_room(
+            self.fred,
+            self.jiggy,
+        )
+        self.assertTrue(created)
+        self.assertNotEqual(new_room.id, room.id)
+
+    def test_get_or_create_gig_room(self):
+        gig = gig_models.Gig.objects.create(
+            user=self.fred,
+            title="Man Feelings",
+            location="Brixton academy",
+            country=country_models.CountryCode.objects.create(
+                country="United Kingdom",
+                code="GB",
+            ),
+            start_date=timezone.now() + timedelta(days=1),
+        )
+        room, created = models.Room.get_or_create_gig_room(self.jiggy, gig)
+        self.assertTrue(created)
+        self.assertEqual(room.members.count(), 2)
+
+        same_room, created = models.Room.get_or_create_gig_room(
+            self.jiggy,
+            gig,
+        )
+        self.assertFalse(created)
+        self.assertEqual(same_room.id, room.id)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.Room.objects.create(
+                user=self.jiggy, type=models.GIG, gig=gig
+            )
+
+
+class MessagePushNotificationsTestCase(TestCase):
+    def test_room_is_serialized_for_each_recipient(self):
+        fred = core_tests.create_user(username="fred")
+        jiggy = core_tests.create_user(username="jiggy")
+        bungle = core_tests.create_user(username="bungle")
+        jiggy.favorite_users.add(fred)
+        room = models.Room.objects.create(user=fred, type=models.DIRECT)
+        room.members.add(fred, jiggy, bungle)
+        message = models.Message.objects.create(
+            user=fred,
+            room=room,
+            message="hello!",
+        )
+        push_notifications.pop_queued_push_notifications()
+        # As if a send is already scheduled, so none is sent to celery.
+        get_redis_connection("default").set(
+            push_notifications.SCHEDULED_KEY,
+            1,
+        )
+
+        tasks.send_message_push_notifications(message.id)
+        queued = push_notifications.pop_queued_push_notifications()
+
+        def is_fred_favorite(user):
+            room_serialized = queued[str(user.id)][0]["data"][
+                "serialized_object"
+            ]
+            return next(
+                member["is_favorite"]
+                for member in room_serialized["members"]
+                if member["id"] == str(fred.id)
+            )
+
+        self.assertTrue(is_fred_favorite(jiggy))
+        self.assertFalse(is_fred_favorite(bungle))
+
+
+class BenchmarksTestCase(TestCase):
+    def test_get_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmarks.get_percentile(values, 50), 50)
+        self.assertEqual(benchmarks.get_percentile(values, 99), 99)
+        self.assertEqual(benchmarks.get_percentile([3, 1, 2], 50), 2)
+        self.assertIsNone(benchmarks.get_percentile([], 50))
+
+    def test_get_latency_stats(self):
+        self.assertEqual(
+            benchmarks.get_latency_stats([0.001, 0.002]),
+            {"p50_ms": 1.0, "p95_ms": 2.0, "p99_ms": 2.0},
+        )
+        self.assertEqual(benchmarks.get_latency_stats([]), {})
+
+
+class MessageArchiveTestCase(TestCase):
+    def setUp(self):
+        self.fred = core_tests.create_user(username="fred")
+        self.room = models.Room.objects.create(
+            user=self.fred,
+            type=models.DIRECT,
+        )
+        self.room.members.add(self.fred)
+        self.old_message = models.Message.objects.create(
+            room=self.room,
+            user=self.fred,
+            message="old",
+            date_created=timezone.now() - timedelta(days=400),
+        )
+        self.new_message = models.Message.objects.create(
+            room=self.room,
+            user=self.fred,
+            message="new",
+        )
+
+    def test_archive_and_restore(self):
+        months = archive.get_months_to_archive(365)
+        self.assertEqual(
+            months, [self.old_message.date_created.date().replace(day=1)]
+        )
+
+        message_archive = archive.archive_month(months[0])
+        self.addCleanup(message_archive.file.delete, save=False)
+        self.assertEqual(message_archive.message_count, 1)
+        self.assertEqual(
+            list(models.Message.objects.values_list("message", flat=True)),
+            ["new"],
+        )
+
+        restored_count = archive.restore_archive(
+            message_archive,
+            room_id=self.room.id,
+        )
+        self.assertEqual(restored_count, 1)
+        restored = models.Message.objects.get(id=self.old_message.id)
+        self.assertEqual(restored.message, "old")
+        self.assertEqual(restored.date_created, self.old_message.date_created)
+
+        # Restoring again doesn't duplicate messages.
+        self.assertEqual(archive.restore_archive(message_archive), 0)
@@ -0,0 +1,173 @@
+import asyncio
+import atexit
+import logging
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+
+from project.chat import inbox, models
+from project.chat import tasks as chat_tasks
+from project.core.db import database_sync_to_async
+
+logger = logging.getLogger(__name__)
+
+_writers = {}
+
+WRITE_ATTEMPTS = 2
+
+
+def messages_created(messages):
+    """
+    Updates the rooms' inbox fields and queues inbox events and
+    push notifications for newly created messages. Called for each
+    message saved, and for each batch written by MessageWriter,
+    as bulk_create doesn't send post_save.
+    """
+    last_messages = {}
+    for message in sorted(messages, key=attrgetter("date_created")):
+        last_messages[message.room_id] = message
+    for message in last_messages.values():
+        models.Room.set_last_message(message)
+
+    transaction.on_commit(
+        lambda: [
+            inbox.send_inbox_message(message)
+            for message in last_messages.values()
+        ]
+    )
+
+    if not settings.PUSH_NOTIFICATIONS_ENABLED:
+        return
+
+    # Sending push notifications to other members of
+    # the room off the request and consumer path.
+    message_ids = [str(message.id) for message in messages]
+    transaction.on_commit(
+        lambda: [
+            chat_tasks.send_message_push_notifications.delay(message_id)
+            for message_id in message_ids
+        ]
+    )
+
+
+def create_messages(messages):
+    with transaction.atomic():
+        models.Message.objects.bulk_create(messages)
+        messages_created(messages)
+
+
+def write_messages(messages):
+    """
+    Writes messages, which have already been sent to clients.
+
+    The batch is tried WRITE_ATTEMPTS times, then messages are written
+    one by one so a message that can't be written, e.g. as its room has
+    been deleted, is the only one dropped. Returns the messages not
+    written because of other errors, e.g. the database being down,
+    to be tried again later.
+    """
+    for attempt in range(1, WRITE_ATTEMPTS + 1):
+        try:
+            create_messages(messages)
+            return []
+        except Exception:
+            logger.exception(
+                "Writing %s messages failed, attempt %s.",
+                len(messages),
+                attempt,
+            )
+
+    unwritten = []
+    for message in messages:
+        try:
+            create_messages([message])
+        except (DataError, IntegrityError):
+            logger.exception("Dropping message id:%s.", message.id)
+        except Exception:
+            unwritten.append(message)
+    return unwritten
+
+
+class MessageWriter:
+    """
+    Buffers messages sent to consumers and writes them in batches.
+
+    A batch is written once it has CHAT_MESSAGE_BATCH_SIZE messages,
+    or CHAT_MESSAGE_BATCH_SECONDS after its first message was added.
+    Messages have their id and date_created set before being added
+    so they can be sent to clients before they're written.
+    """
+
+    def __init__(self, batch_size, batch_seconds):
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.messages = []
+        self.flush_task = None
+
+    async def add(self, message):
+        self.messages.append(message)
+        if len(self.messages) >= self.batch_size:
+            await self.flush()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(self.batch_seconds)
+        self.flush_task = None
+        await self.flush()
+
+    def pop_messages(self):
+        messages, self.messages = self.messages, []
+        return messages
+
+    async def flush(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        messages = self.pop_messages()
+        if not messages:
+            return
+        unwritten = await database_sync_to_async(write_messages)(messages)
+        if unwritten:
+            # Put back to be written with the next batch.
+            logger.error("Retrying %s messages later.", len(unwritten))
+            self.messages = unwritten + self.messages
+            if self.flush_task is None:
+                self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    def flush_sync(self):
+        """
+        Writes buffered messages from outside the event loop,
+        e.g. when the process exits.
+        """
+        messages = self.pop_messages()
+        if not messages:
+            return
+        unwritten = write_messages(messages)
+        if unwritten:
+            logger.error("%s messages weren't written.", len(unwritten))
+
+
+def get_writer():
+    """
+    Returns the MessageWriter for the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    writer = _writers.get(loop)
+    if writer is None:
+        writer = MessageWriter(
+            settings.CHAT_MESSAGE_BATCH_SIZE,
+            settings.CHAT_MESSAGE_BATCH_SECONDS,
+        )
+        _writers[loop] = writer
+    return writer
+
+
+@atexit.register
+def flush_writers():
+    for writer in _writers.values():
+        try:
+            writer.flush_sync()
+        except Exception:
+            logger.exception("Writing messages on exit failed.")
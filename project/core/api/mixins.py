@@ -34,3 +34,27 @@ class ListModelMixinWithSerializerContext:
 
         serializer = self.get_serializer(queryset, many=True)  # noqa
         return Response(serializer.data)
+
+
+class CursorPaginationMixin:
+    """
+    Paginates with cursor_pagination_class instead of
+    pagination_class when requested with `pagination=cursor`.
+    """
+
+    cursor_pagination_class = None
+
+    def use_cursor_pagination(self):
+        return self.request.query_params.get("pagination") == "cursor"
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if (
+                self.cursor_pagination_class is not None
+                and self.use_cursor_pagination()  # noqa
+            ):
+                self._paginator = self.cursor_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
@@ -0,0 +1,22 @@
+import asyncio
+
+from django.conf import settings
+
+from redis import asyncio as aioredis
+
+_connections = {}
+
+
+def get_connection():
+    """
+    Returns an asyncio Redis client for CHAT_REDIS_URL.
+
+    Clients are cached per event loop, as their
+    connections can't be shared between loops.
+    """
+    loop = asyncio.get_running_loop()
+    connection = _connections.get(loop)
+    if connection is None:
+        connection = aioredis.from_url(settings.CHAT_REDIS_URL)
+        _connections[loop] = connection
+    return connection
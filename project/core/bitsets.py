@@ -0,0 +1,23 @@
+"""
+Sets of small integers stored as bitsets, e.g. a user's genres by
+their `bit`. Bitsets are ints in Python and bytes in the database.
+"""
+
+
+def from_bits(bits):
+    bitset = 0
+    for bit in bits:
+        bitset |= 1 << bit
+    return bitset
+
+
+def to_bytes(bitset):
+    return bitset.to_bytes((bitset.bit_length() + 7) // 8, "little")
+
+
+def from_bytes(value):
+    return int.from_bytes(bytes(value or b""), "little")
+
+
+def count(bitset):
+    return bin(bitset).count("1")
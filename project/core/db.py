@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from channels import db as channels_db
+from django.conf import settings
+
+_executor = None
+
+
+def get_executor():
+    """
+    Returns the thread pool database calls from async code run in.
+    Each thread holds its own database connection.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.DATABASE_THREAD_POOL_SIZE,
+            thread_name_prefix="database",
+        )
+    return _executor
+
+
+class DatabaseSyncToAsync(channels_db.DatabaseSyncToAsync):
+    """
+    Channels' database_sync_to_async only not thread sensitive.
+    Calls run concurrently in a bounded thread pool instead of
+    queueing behind each other in the single shared sync thread.
+    Functions wrapped with this mustn't depend on running in the
+    same thread as other sync code, e.g. by using transactions
+    opened elsewhere.
+    """
+
+    def __init__(self, func):
+        super().__init__(
+            func,
+            thread_sensitive=False,
+            executor=get_executor(),
+        )
+
+
+database_sync_to_async = DatabaseSyncToAsync
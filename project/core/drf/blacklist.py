@@ -2,10 +2,13 @@ import logging
 
 from rest_framework_simplejwt.token_blacklist import models
 
+from project.custom_user import auth_cache
+
 logger = logging.getLogger(__name__)
 
 
 def blacklist_user_tokens(user):
+    auth_cache.revoke_tokens(user.id)
     tokens = models.OutstandingToken.objects.filter(user=user)
     for token in tokens:
         _, created = models.BlacklistedToken.objects.get_or_create(token=token)
@@ -1,5 +1,243 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import datetime
+import json
+import uuid
+
+from django.contrib.gis.measure import Distance
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 
 class DefaultPageNumberPagination(PageNumberPagination):
     page_size_query_param = "page_size"
+
+
+def encode_cursor_value(value):
+    if isinstance(value, Distance):
+        return value.m
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        # isoformat keeps microseconds, unlike DjangoJSONEncoder.
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Cursor pagination keyed on the values of `ordering` of the
+    last result, e.g. WHERE (start_date, id) > (cursor values).
+    Unlike page number pagination there is no COUNT query and
+    the cost of a page doesn't grow with how deep it is.
+
+    `ordering` must end in a unique field.
+    Orderings on annotations set by the view, such as `search_rank`
+    or `distance`, are kept ahead of `ordering`.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    invalid_cursor_message = "Invalid cursor"
+    ordering = ("id",)
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+
+    def get_ordering(self, queryset):
+        ordering_names = {field.lstrip("-") for field in self.ordering}
+        leading_ordering = []
+        for field in queryset.query.order_by:
+            if not isinstance(field, str):
+                break
+            name = field.lstrip("-")
+            if name not in queryset.query.annotations:
+                break
+            if name not in ordering_names:
+                leading_ordering.append(field)
+        return tuple(leading_ordering) + tuple(self.ordering)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(values, list)
+            or len(values) != len(self.ordering_fields)
+            or not all(
+                value is None or isinstance(value, (str, int, float))
+                for value in values
+            )
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def encode_cursor(self, instance):
+        values = [
+            encode_cursor_value(getattr(instance, field.lstrip("-")))
+            for field in self.ordering_fields
+        ]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def get_after_condition(self, field, value):
+        """
+        Returns a condition for values of field after value. Nulls are
+        last in ascending and first in descending order, as in Postgres.
+        """
+        name = field.lstrip("-")
+        if field.startswith("-"):
+            if value is None:
+                return Q(**{f"{name}__isnull": False})
+            return Q(**{f"{name}__lt": value})
+        if value is None:
+            return Q(pk__in=[])
+        return Q(**{f"{name}__gt": value}) | Q(**{f"{name}__isnull": True})
+
+    def get_equal_condition(self, field, value):
+        name = field.lstrip("-")
+        if value is None:
+            return Q(**{f"{name}__isnull": True})
+        return Q(**{name: value})
+
+    def get_position_filter(self, values):
+        """
+        Returns a filter for rows after the cursor position in
+        the ordering. e.g. for ("start_date", "id") returns
+        start_date > x OR (start_date = x AND id > y).
+        Null values, e.g. the distance of gigs without a point,
+        are handled too.
+        """
+        position_filter = Q()
+        for index, field in enumerate(self.ordering_fields):
+            condition = self.get_after_condition(field, values[index])
+            for previous_index, previous_field in enumerate(
+                self.ordering_fields[:index]
+            ):
+                condition &= self.get_equal_condition(
+                    previous_field,
+                    values[previous_index],
+                )
+            position_filter |= condition
+        return position_filter
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering_fields = self.get_ordering(queryset)
+
+        queryset = queryset.order_by(*self.ordering_fields)
+        values = self.decode_cursor(request)
+        if values is not None:
+            try:
+                queryset = queryset.filter(self.get_position_filter(values))
+                # Fetching one more than the page size
+                # to know if there's a next page.
+                results = list(queryset[: self.page_size + 1])
+            except (DjangoValidationError, TypeError, ValueError):
+                # e.g. a malformed date.
+                raise NotFound(self.invalid_cursor_message)
+        else:
+            results = list(queryset[: self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1]),
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "results": data,
+            }
+        )
+
+
+class MessageCursorPagination(KeysetCursorPagination):
+    """
+    Paginates messages before or after the message with the id given
+    by `before` or `after`. `before` returns older messages, newest
+    first, for scrolling back. `after` returns newer messages, oldest
+    first, e.g. to fetch messages missed while disconnected.
+    """
+
+    before_query_param = "before"
+    after_query_param = "after"
+    ordering = ("-date_created", "-id")
+
+    def get_cursor_query_param(self, request):
+        if request.query_params.get(self.after_query_param):
+            if request.query_params.get(self.before_query_param):
+                raise ParseError("Use either before or after, not both.")
+            return self.after_query_param
+        return self.before_query_param
+
+    def get_ordering(self, queryset):
+        if self.cursor_query_param == self.after_query_param:
+            return ("date_created", "id")
+        return self.ordering
+
+    def decode_cursor(self, request):
+        message_id = request.query_params.get(self.cursor_query_param)
+        if not message_id:
+            return None
+        try:
+            values = (
+                self.queryset.filter(id=message_id)
+                .values_list("date_created", "id")
+                .first()
+            )
+        except (DjangoValidationError, ValueError):
+            values = None
+        if values is None:
+            raise NotFound(self.invalid_cursor_message)
+        return list(values)
+
+    def encode_cursor(self, instance):
+        return str(instance.id)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_query_param = self.get_cursor_query_param(request)
+        self.queryset = queryset
+        return super().paginate_queryset(queryset, request, view=view)
+
+
+class GigCursorPagination(KeysetCursorPagination):
+    ordering = ("start_date", "id")
+
+
+class UserCursorPagination(KeysetCursorPagination):
+    ordering = ("username", "id")
+
+
+class RoomCursorPagination(KeysetCursorPagination):
+    ordering = ("-last_message_date", "-id")
@@ -0,0 +1,114 @@
+from django.core import exceptions as django_exceptions
+from django.db.models import Q
+from rest_framework import serializers
+
+
+class ExistingListSerializer(serializers.ListSerializer):
+    """
+    List of ExistingModelSerializer. Every item's instance is
+    fetched in one query before the items are validated.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            # Keyed by id as items are validated one by one,
+            # skipping to_internal_value for empty values.
+            self.child.resolved = {
+                id(item): instance
+                for item, instance in zip(data, self.child.resolve(data))
+            }
+        try:
+            return super().to_internal_value(data)
+        finally:
+            self.child.resolved = None
+
+
+class ExistingModelSerializer(serializers.ModelSerializer):
+    """
+    Nested serializer whose input is an existing instance given by
+    the values of some of its fields, e.g. {"id": 1} or {"code": "GB"}.
+
+    Subclasses set `does_not_exist_message` and `invalid_message`, and
+    `list_serializer_class = ExistingListSerializer` in their Meta so
+    lists of them are fetched in one query.
+    """
+
+    does_not_exist_message = "Does not exist"
+    invalid_message = "Invalid data"
+
+    def __init__(self, *args, **kwargs):
+        self.resolved = None
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        if self.resolved is not None and id(data) in self.resolved:
+            instance = self.resolved[id(data)]
+        else:
+            instance = self.resolve([data])[0]
+        if isinstance(instance, serializers.ValidationError):
+            raise instance
+        return instance
+
+    def get_field_values(self, data):
+        """
+        Returns data as {attname: value} or raises ValidationError.
+        """
+        if not isinstance(data, dict) or not data:
+            raise serializers.ValidationError(self.invalid_message)
+        field_values = {}
+        for field_name, value in data.items():
+            try:
+                field = self.Meta.model._meta.get_field(field_name)
+                if not field.concrete or field.is_relation:
+                    raise serializers.ValidationError(self.invalid_message)
+                field_values[field.attname] = field.to_python(value)
+            except (
+                django_exceptions.FieldDoesNotExist,
+                django_exceptions.ValidationError,
+            ):
+                raise serializers.ValidationError(self.invalid_message)
+        return field_values
+
+    def resolve(self, items):
+        """
+        Returns the instance for each item, or the ValidationError
+        to raise for it, using one query for all the items.
+        """
+        field_values = []
+        for data in items:
+            try:
+                field_values.append(self.get_field_values(data))
+            except serializers.ValidationError as error:
+                field_values.append(error)
+        query = Q()
+        for values in field_values:
+            if isinstance(values, dict):
+                query |= Q(**values)
+        candidates = []
+        if query:
+            candidates = list(
+                self.Meta.model._default_manager.filter(query).order_by("pk")
+            )
+
+        resolved = []
+        for values in field_values:
+            if not isinstance(values, dict):
+                resolved.append(values)
+                continue
+            instance = next(
+                (
+                    candidate
+                    for candidate in candidates
+                    if all(
+                        getattr(candidate, attname) == value
+                        for attname, value in values.items()
+                    )
+                ),
+                None,
+            )
+            if instance is None:
+                instance = serializers.ValidationError(
+                    {self.does_not_exist_message}
+                )
+            resolved.append(instance)
+        return resolved
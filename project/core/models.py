@@ -1,9 +1,64 @@
+import copy
 import uuid
+from typing import Set, Tuple
 
 from django.db import models
+from django.db.models.fields.files import FieldFile
 
+from project.core import search
 
-class BaseModel(models.Model):
+
+def get_snapshot_value(value):
+    if isinstance(value, FieldFile):
+        # Compares equal to its name.
+        return value.name
+    if isinstance(value, (dict, list)):
+        # Copied as it may be changed in place.
+        return copy.deepcopy(value)
+    return value
+
+
+class DirtyFieldsMixin:
+    """
+    Tracks which concrete fields changed since the instance
+    was loaded from, or last saved to, the database.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.reset_dirty_fields()
+        return instance
+
+    def reset_dirty_fields(self):
+        # Deferred fields aren't loaded, so they're left out.
+        self._loaded_field_values = {
+            field.name: get_snapshot_value(self.__dict__[field.attname])
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def get_dirty_fields(self) -> Set[str]:
+        if self._state.adding or not hasattr(self, "_loaded_field_values"):
+            return {field.name for field in self._meta.concrete_fields}
+        return {
+            field.name
+            for field in self._meta.concrete_fields
+            if field.name in self._loaded_field_values
+            and self._loaded_field_values[field.name]
+            != self.__dict__.get(field.attname)
+        }
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.reset_dirty_fields()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.reset_dirty_fields()
+
+
+class BaseModel(DirtyFieldsMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
@@ -14,3 +69,80 @@ class BaseModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class BitMixin:
+    """
+    Gives each row a unique `bit`, its index in bitsets of rows,
+    e.g. the genres of a user. See core.bitsets.
+    """
+
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            max_bit = type(self)._default_manager.aggregate(
+                max_bit=models.Max("bit"),
+            )["max_bit"]
+            self.bit = 0 if max_bit is None else max_bit + 1
+        super().save(*args, **kwargs)
+
+
+class BitsetField(models.BinaryField):
+    """
+    A bitset as bytes, see core.bitsets. Loaded as bytes rather than
+    the memoryview psycopg2 returns, which can't be pickled.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return bytes(value)
+
+
+class SearchVectorMixin:
+    """
+    For models with a `search_vector` column built from
+    weighted `search_vector_fields`. Denormalised `search_*` columns
+    are returned by `get_search_fields`.
+
+    Search columns are only written by `update_search_vector`
+    (see the project.search app which keeps them up to date).
+    Saving an existing instance doesn't write them, so an instance
+    loaded before an index update can't overwrite newer values.
+    """
+
+    # (field name, weight) pairs, weight being one of A, B, C or D.
+    search_vector_fields: Tuple[Tuple[str, str], ...] = ()
+    # Fields (including m2m fields) whose changes require
+    # the search vector or its dependents to be updated.
+    search_vector_source_fields: Tuple[str, ...] = ()
+    search_vector_cascade_fields: Tuple[str, ...] = ()
+    # Other denormalised columns which, like the search
+    # columns, are only written by their own UPDATE.
+    update_only_fields: Tuple[str, ...] = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and not search.is_search_field(field.name)
+                and field.name not in self.update_only_fields
+            ]
+        super().save(*args, **kwargs)
+
+    def get_search_fields(self):
+        """
+        Returns values for the denormalised `search_*` columns.
+        """
+        return {}
+
+    def get_search_vector_dependents(self):
+        """
+        Returns querysets of instances whose search
+        vectors include data from this instance.
+        """
+        return []
+
+    def update_search_vector(self):
+        search.update_search_vector(self)
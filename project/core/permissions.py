@@ -1,11 +1,16 @@
 from django.contrib.auth import get_user_model
 from rest_framework import exceptions
+from rest_framework.permissions import SAFE_METHODS, BasePermission
 
 User = get_user_model()
 
 
 def is_authenticated(request):
-    if request.user not in User.objects.all():
+    """
+    The user is loaded once per request by authentication,
+    so this doesn't query the database.
+    """
+    if not (request.user.is_authenticated and request.user.is_active):
         raise exceptions.PermissionDenied
 
     return True
@@ -14,10 +19,11 @@ def is_authenticated(request):
 def is_owner(request, obj):
     is_authenticated(request)
     if isinstance(obj, User):
-        if not request.user == obj:
+        if not request.user.id == obj.id:
             raise exceptions.PermissionDenied
-    elif hasattr(obj, "user"):
-        if not request.user == obj.user:
+    elif hasattr(obj, "user_id"):
+        # Comparing ids so obj.user isn't fetched.
+        if not request.user.id == obj.user_id:
             raise exceptions.PermissionDenied
 
     return True
@@ -29,3 +35,24 @@ def is_member(request, obj):
         raise exceptions.PermissionDenied
 
     return True
+
+
+class IsOwnerOrReadOnly(BasePermission):
+    """
+    Allows anyone to read, authenticated users to create
+    and owners to update and delete.
+
+    Raises PermissionDenied rather than returning False,
+    so unauthenticated requests are 403 rather than 401
+    as with the functions above.
+    """
+
+    def has_permission(self, request, view):
+        if request.method in SAFE_METHODS:
+            return True
+        return is_authenticated(request)
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in SAFE_METHODS:
+            return True
+        return is_owner(request, obj)
@@ -1,18 +1,68 @@
-from django.conf import settings
-from django.contrib.postgres.search import SearchQuery
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
 
+SEARCH_FIELD_PREFIX = "search_"
 
-def update_params_with_search_vectors(query, params):
+
+def get_search_query(query):
+    """
+    Parses a search query as websearch_to_tsquery does, supporting
+    "quoted phrases", `or` and `-excluded` words.
+    """
+    return SearchQuery(query, search_type="websearch")
+
+
+def search_queryset(queryset, query):
+    """
+    Filters a queryset by its search vector and annotates
+    `search_rank` (ts_rank_cd) for ordering by relevance.
+
+    ts_rank_cd returns a real, which is cast to double precision so the
+    rank in a pagination cursor, a Python float, compares equal to it.
     """
-    Helper function to update query params
-    search vectors with words in search APIs.
+    search_query = get_search_query(query)
+    return queryset.filter(search_vector=search_query).annotate(
+        search_rank=Cast(
+            SearchRank(
+                F("search_vector"),
+                search_query,
+                cover_density=True,
+            ),
+            FloatField(),
+        )
+    )
+
+
+def is_search_field(field_name):
+    return field_name.startswith(SEARCH_FIELD_PREFIX)
+
+
+def update_search_vector(instance):
     """
-    query_parts = [
-        SearchQuery(word)
-        for word in query.split(" ")
-        if word.lower() not in settings.ENGLISH_STOP_WORDS
+    Updates an instance's search fields and search vector
+    using a single UPDATE. See core.models.SearchVectorMixin.
+
+    Values are passed to SearchVector rather than column names
+    as columns referenced in an UPDATE hold their old values.
+    `search_vector_fields` are (field name, weight) pairs.
+    """
+    search_fields = instance.get_search_fields()
+    for field_name, value in search_fields.items():
+        setattr(instance, field_name, value)
+
+    search_vectors = [
+        SearchVector(Value(getattr(instance, field_name) or ""), weight=weight)
+        for field_name, weight in instance.search_vector_fields
     ]
-    combined_query = query_parts[0]
-    for query_part in query_parts[1:]:
-        combined_query |= query_part
-    params.update({"search_vector": combined_query})
+    search_vector = search_vectors[0]
+    for vector in search_vectors[1:]:
+        search_vector += vector
+    type(instance)._default_manager.filter(pk=instance.pk).update(
+        search_vector=search_vector,
+        **search_fields,
+    )
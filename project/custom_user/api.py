@@ -10,20 +10,31 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from project.core import permissions, search
-from project.core.drf import blacklist
+from project.core.api import mixins as core_mixins
+from project.core.drf import blacklist, pagination
 from project.custom_email import send_reset_password_email
-from project.custom_user import models, serializers
+from project.custom_user import matching, models, serializers
 from project.gig import models as gig_models
+from project.location import functions as location_functions
+from project.location import helpers as location_helpers
 
 User = get_user_model()
 
+MATCHES_LIMIT = 20
+MAX_MATCHES_LIMIT = 100
+
+
+class UserViewSet(core_mixins.CursorPaginationMixin, viewsets.ModelViewSet):
+    """
+    Lists can be paginated by a cursor using `pagination=cursor`.
+    """
 
-class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.filter(is_active=True, is_staff=False).order_by(
         "username"
     )
     serializer_class = serializers.UserSerializer
     serializer_class_if_not_owner = serializers.UserSerializerIfNotOwner
+    cursor_pagination_class = pagination.UserCursorPagination
 
     def create(self, request, *args, **kwargs):
         kwargs.setdefault("context", self.get_serializer_context())
@@ -62,16 +73,29 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
     def get_queryset(self):
+        queryset = self.queryset.with_serializer_data(self.request.user)
         if (
             self.request.user.is_authenticated
             and self.request.method == "GET"
             and self.lookup_field not in self.kwargs.keys()
         ):
-            return self.queryset.exclude(id=self.request.user.id)
-        return self.queryset
+            return queryset.exclude(id=self.request.user.id)
+        return queryset
 
     @action(detail=False, methods=["GET"])
     def search(self, request):
+        """
+        Searches Users.
+
+        Users near a location can be found using the `lat`, `lng` and
+        `radius` params. `radius` is in the requesting user's units.
+        If `lat` and `lng` are not provided the requesting user's
+        point is used. Use `order_by=distance` for nearest first,
+        which leaves out users without a point.
+
+        `q` is parsed as a web search query and results
+        are ordered by relevance unless ordered by distance.
+        """
         params = {
             "is_active": True,
             "is_staff": False,
@@ -102,9 +126,20 @@ class UserViewSet(viewsets.ModelViewSet):
         if request.query_params.get("is_looking_for_band"):
             params.update({"is_looking_for_band": True})
 
-        query = request.query_params.get("q")
-        if query:
-            search.update_params_with_search_vectors(query, params)
+        point = location_helpers.get_point_from_query_params(
+            request.query_params,
+            request.user,
+        )
+        radius = location_helpers.get_radius_from_query_params(
+            request.query_params,
+            location_helpers.get_units_for_user(request.user),
+        )
+        if radius is not None:
+            if point is None:
+                raise exceptions.ParseError(
+                    "lat and lng are required when using radius."
+                )
+            params.update({"point__dwithin": (point, radius)})
 
         subquery = (
             User.objects.filter(**params)
@@ -113,9 +148,29 @@ class UserViewSet(viewsets.ModelViewSet):
         )
         queryset = (
             User.objects.filter(id__in=subquery)
-            .order_by("id")
             .exclude(username=request.user.username)
+            .with_serializer_data(request.user)
         )
+        query = request.query_params.get("q")
+        if query:
+            queryset = search.search_queryset(queryset, query)
+        if (
+            point is not None
+            and request.query_params.get("order_by") == "distance"
+        ):
+            # Users without a point have no distance.
+            queryset = (
+                queryset.filter(point__isnull=False)
+                .exclude(location_functions.IsEmpty("point"))
+                .annotate(
+                    distance=location_functions.KNNDistance("point", point),
+                )
+                .order_by("distance", "id")
+            )
+        elif query:
+            queryset = queryset.order_by("-search_rank", "id")
+        else:
+            queryset = queryset.order_by("id")
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -127,6 +182,59 @@ class UserViewSet(viewsets.ModelViewSet):
         )
         return Response(serialized.data)
 
+    @action(detail=False, methods=["GET"])
+    def matches(self, request):
+        """
+        Returns the requesting user's best matches, best first, each with
+        a `match_score` between 0 and 1. See custom_user.matching.
+
+        Takes the `lat`, `lng` and `radius` params as search does,
+        and `limit` (default MATCHES_LIMIT, at most MAX_MATCHES_LIMIT).
+        """
+        permissions.is_authenticated(request)
+        try:
+            limit = min(
+                int(request.query_params.get("limit", MATCHES_LIMIT)),
+                MAX_MATCHES_LIMIT,
+            )
+        except ValueError:
+            raise exceptions.ParseError("Invalid limit.")
+        if limit < 1:
+            raise exceptions.ParseError("Invalid limit.")
+
+        point = location_helpers.get_point_from_query_params(
+            request.query_params,
+            request.user,
+        )
+        radius = location_helpers.get_radius_from_query_params(
+            request.query_params,
+            location_helpers.get_units_for_user(request.user),
+        )
+        if radius is not None and point is None:
+            raise exceptions.ParseError(
+                "lat and lng are required when using radius."
+            )
+
+        matches = matching.get_matches(request.user, limit, point, radius)
+        users = User.objects.filter(
+            id__in=[user_id for _, user_id in matches],
+        ).with_serializer_data(request.user)
+        users_by_id = {user.id: user for user in users}
+        matches = [
+            (score, users_by_id[user_id])
+            for score, user_id in matches
+            if user_id in users_by_id
+        ]
+        serializer = self.get_serializer_if_not_owner(
+            [user for _, user in matches],
+            many=True,
+        )
+        data = [
+            {**user_data, "match_score": round(score, 4)}
+            for (score, _), user_data in zip(matches, serializer.data)
+        ]
+        return Response(data)
+
     @action(detail=False, methods=["GET"])
     def me(self, request):
         permissions.is_authenticated(request)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CustomUserConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "project.custom_user"
+
+    def ready(self):
+        import project.custom_user.signals  # noqa
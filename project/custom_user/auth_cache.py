@@ -0,0 +1,79 @@
+"""
+A short lived cache of active users for token authentication,
+so websocket reconnects read users from Redis, not the database.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.cache import cache
+
+User = get_user_model()
+
+USER_KEY = "auth_user_%s"
+TOKENS_NOT_BEFORE_KEY = "auth_tokens_not_before_%s"
+# Fields cached, those used by consumers and the serializers they use.
+# Other fields of cached users are loaded when accessed.
+FIELDS = ("id", "username", "is_active", "point", "units", "preferred_units")
+
+
+def to_cached(user):
+    values = {field_name: getattr(user, field_name) for field_name in FIELDS}
+    values["point"] = user.point.ewkt
+    return values
+
+
+def from_cached(values):
+    values = dict(values, point=GEOSGeometry(values["point"]))
+    # In the order of the model's fields, as from_db expects.
+    field_names = [
+        field.attname
+        for field in User._meta.concrete_fields
+        if field.attname in values
+    ]
+    return User.from_db(
+        "default",
+        field_names,
+        [values[field_name] for field_name in field_names],
+    )
+
+
+def get_user(user_id):
+    """
+    Returns the cached user and the time before which their tokens
+    are revoked, or None for either if not cached.
+    """
+    user_key = USER_KEY % user_id
+    not_before_key = TOKENS_NOT_BEFORE_KEY % user_id
+    values = cache.get_many([user_key, not_before_key])
+    user = values.get(user_key)
+    if user is not None:
+        user = from_cached(user)
+    return user, values.get(not_before_key)
+
+
+def set_user(user):
+    cache.set(
+        USER_KEY % user.id,
+        to_cached(user),
+        timeout=settings.AUTH_USER_CACHE_SECONDS,
+    )
+
+
+def delete_user(user_id):
+    cache.delete(USER_KEY % user_id)
+
+
+def revoke_tokens(user_id):
+    """
+    Revokes the user's access tokens issued until now. Kept for as long
+    as access tokens live, after which they've all expired anyway.
+    """
+    lifetime = settings.SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"]
+    cache.set(
+        TOKENS_NOT_BEFORE_KEY % user_id,
+        int(time.time()),
+        timeout=int(lifetime.total_seconds()),
+    )
+    delete_user(user_id)
@@ -0,0 +1,149 @@
+"""
+Matching of bands and musicians.
+
+Each user's genres, instruments and instruments needed are kept as
+bitsets on the user (see User.update_match_features), so candidates
+are scored from a single query of their bitsets without joining the
+many to many tables. Scores are between 0 and 1, weighting:
+
+- How many of the instruments needed by one user the other plays.
+- The Jaccard index of their genres.
+- How near they are.
+"""
+import heapq
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from project.core import bitsets
+from project.location import functions as location_functions
+
+User = get_user_model()
+
+INSTRUMENTS_WEIGHT = 0.5
+GENRES_WEIGHT = 0.3
+DISTANCE_WEIGHT = 0.2
+# Users this far apart have a distance score of 0.5.
+DISTANCE_SCALE_KM = 50
+# Nearest candidates scored for each match.
+MAX_CANDIDATES = 2000
+
+FIELDS = (
+    "id",
+    "genre_bits",
+    "instrument_bits",
+    "instruments_needed_bits",
+)
+
+
+def get_coverage(needed, instruments):
+    """
+    Returns the fraction of needed instruments in instruments.
+    """
+    number_needed = bitsets.count(needed)
+    if not number_needed:
+        return 0
+    return bitsets.count(needed & instruments) / number_needed
+
+
+def get_jaccard_index(a, b):
+    union = bitsets.count(a | b)
+    if not union:
+        return 0
+    return bitsets.count(a & b) / union
+
+
+def get_distance_score(distance):
+    if distance is None:
+        return 0
+    return 1 / (1 + distance.km / DISTANCE_SCALE_KM)
+
+
+def get_features(row):
+    return {
+        field_name: bitsets.from_bytes(row[field_name])
+        for field_name in FIELDS[1:]
+    }
+
+
+def get_score(features, candidate_features, distance):
+    instruments_score = max(
+        get_coverage(
+            features["instruments_needed_bits"],
+            candidate_features["instrument_bits"],
+        ),
+        get_coverage(
+            candidate_features["instruments_needed_bits"],
+            features["instrument_bits"],
+        ),
+    )
+    genres_score = get_jaccard_index(
+        features["genre_bits"],
+        candidate_features["genre_bits"],
+    )
+    return (
+        INSTRUMENTS_WEIGHT * instruments_score
+        + GENRES_WEIGHT * genres_score
+        + DISTANCE_WEIGHT * get_distance_score(distance)
+    )
+
+
+def get_role_filter(user):
+    """
+    Bands are matched with musicians and musicians with bands.
+    Users who are neither are matched with anyone.
+    """
+    role_filter = Q()
+    if user.is_band or user.is_looking_for_musicians:
+        role_filter |= Q(is_musician=True) | Q(is_looking_for_band=True)
+    if user.is_musician or user.is_looking_for_band:
+        role_filter |= Q(is_band=True) | Q(is_looking_for_musicians=True)
+    return role_filter
+
+
+def get_candidates(user, point=None, radius=None):
+    """
+    Returns values of FIELDS of up to MAX_CANDIDATES users who could
+    match user. If there's a point these are the nearest users, with
+    their `distance`, otherwise the most recently logged in.
+    """
+    candidates = (
+        User.objects.filter(get_role_filter(user), is_active=True)
+        .exclude(is_staff=True)
+        .exclude(id=user.id)
+    )
+    if point is None:
+        return candidates.order_by("-last_login", "id").values(*FIELDS)[
+            :MAX_CANDIDATES
+        ]
+
+    if radius is not None:
+        candidates = candidates.filter(point__dwithin=(point, radius))
+    return (
+        candidates.annotate(
+            distance=location_functions.KNNDistance("point", point),
+        )
+        .order_by("distance", "id")
+        .values(*FIELDS, "distance")[:MAX_CANDIDATES]
+    )
+
+
+def get_matches(user, limit, point=None, radius=None):
+    """
+    Returns (score, user id) pairs of user's best
+    `limit` matches, best first, using two queries.
+    """
+    # Not using request.user's fields as it may be cached.
+    features = get_features(User.objects.values(*FIELDS).get(id=user.id))
+    scores = (
+        (
+            get_score(
+                features,
+                get_features(candidate),
+                candidate.get("distance"),
+            ),
+            candidate["id"],
+        )
+        for candidate in get_candidates(user, point, radius)
+    )
+    return heapq.nlargest(limit, scores, key=lambda score: score[0])
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.2 on 2026-10-18 11:20
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("custom_user", "0013_user_instruments_needed_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"],
+                name="user_search_vector_gin",
+            ),
+        ),
+    ]
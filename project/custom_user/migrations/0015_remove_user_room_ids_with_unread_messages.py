@@ -0,0 +1,57 @@
+# Generated by Django 4.1.2 on 2026-10-18 12:40
+
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def create_read_cursors(apps, schema_editor):
+    """
+    Marks rooms as read up to now for each member, apart from the
+    rooms in their room_ids_with_unread_messages. Without a read
+    cursor every message in a room is unread.
+    """
+    User = apps.get_model("custom_user", "User")  # noqa
+    Room = apps.get_model("chat", "Room")  # noqa
+    ReadCursor = apps.get_model("chat", "ReadCursor")  # noqa
+
+    unread_room_ids = {
+        user_id: {str(room_id) for room_id in room_ids or []}
+        for user_id, room_ids in User.objects.values_list(
+            "id",
+            "room_ids_with_unread_messages",
+        ).iterator()
+    }
+    now = timezone.now()
+    read_cursors = []
+    memberships = Room.members.through.objects.values_list(
+        "user_id",
+        "room_id",
+    )
+    for user_id, room_id in memberships.iterator():
+        if str(room_id) in unread_room_ids.get(user_id, ()):
+            continue
+        read_cursors.append(
+            ReadCursor(user_id=user_id, room_id=room_id, last_read_date=now)
+        )
+        if len(read_cursors) >= BATCH_SIZE:
+            ReadCursor.objects.bulk_create(read_cursors, ignore_conflicts=True)
+            read_cursors = []
+    ReadCursor.objects.bulk_create(read_cursors, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0006_readcursor"),
+        ("custom_user", "0014_user_search_vector_gin"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_read_cursors, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="user",
+            name="room_ids_with_unread_messages",
+        ),
+    ]
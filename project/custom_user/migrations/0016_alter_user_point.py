@@ -0,0 +1,25 @@
+# Generated by Django 4.1.2 on 2026-10-18 16:05
+
+import django.contrib.gis.db.models.fields
+import django.contrib.gis.geos.point
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("custom_user", "0015_remove_user_room_ids_with_unread_messages"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="point",
+            field=django.contrib.gis.db.models.fields.PointField(
+                blank=True,
+                default=django.contrib.gis.geos.point.Point([]),
+                geography=True,
+                srid=4326,
+            ),
+        ),
+    ]
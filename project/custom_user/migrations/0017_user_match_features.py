@@ -0,0 +1,51 @@
+# Generated by Django 4.1.2 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+from project.core import bitsets
+
+
+def set_match_features(apps, schema_editor):
+    User = apps.get_model("custom_user", "User")  # noqa
+
+    def get_bits(related):
+        bits = related.filter(active=True, bit__isnull=False).values_list(
+            "bit",
+            flat=True,
+        )
+        return bitsets.to_bytes(bitsets.from_bits(bits))
+
+    for user in User.objects.iterator():
+        User.objects.filter(id=user.id).update(
+            genre_bits=get_bits(user.genres),
+            instrument_bits=get_bits(user.instruments),
+            instruments_needed_bits=get_bits(user.instruments_needed),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genre", "0002_genre_bit"),
+        ("instrument", "0002_instrument_bit"),
+        ("custom_user", "0016_alter_user_point"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="genre_bits",
+            field=models.BinaryField(default=bytes, editable=False),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="instrument_bits",
+            field=models.BinaryField(default=bytes, editable=False),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="instruments_needed_bits",
+            field=models.BinaryField(default=bytes, editable=False),
+        ),
+        migrations.RunPython(set_match_features, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.1.2 on 2026-10-18 18:20
+
+from django.db import migrations
+
+import project.core.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("custom_user", "0017_user_match_features"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="genre_bits",
+            field=project.core.models.BitsetField(
+                default=bytes,
+                editable=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="user",
+            name="instrument_bits",
+            field=project.core.models.BitsetField(
+                default=bytes,
+                editable=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="user",
+            name="instruments_needed_bits",
+            field=project.core.models.BitsetField(
+                default=bytes,
+                editable=False,
+            ),
+        ),
+    ]
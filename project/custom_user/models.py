@@ -2,17 +2,78 @@ import uuid
 
 from django.contrib.auth import models as auth_models
 from django.contrib.gis.db import models
+from django.contrib.gis.db.models import functions as gis_functions
 from django.contrib.gis.geos import Point
-from django.contrib.postgres import search
+from django.contrib.postgres import indexes, search
 from django.core.validators import EmailValidator
 from django.utils import timezone
 from django.utils.translation import gettext as _
 from rest_framework_simplejwt import tokens
 
-from project.core.models import BaseModel
+from project.core import bitsets
+from project.core.models import (
+    BaseModel,
+    BitsetField,
+    DirtyFieldsMixin,
+    SearchVectorMixin,
+)
+from project.genre import models as genre_models
+from project.instrument import models as instrument_models
 
 
-class UserManager(auth_models.BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    def with_serializer_data(self, user):
+        """
+        Prefetches and annotates data used by UserSerializerIfNotOwner
+        so serializing many users runs a fixed number of queries.
+        `user` is the requesting user, whose distance from each user
+        is annotated if they have a point.
+        """
+        if user.is_authenticated:
+            is_favorite = models.Exists(
+                self.model.objects.filter(
+                    id=user.id,
+                    favorite_users=models.OuterRef("pk"),
+                )
+            )
+        else:
+            is_favorite = models.Value(
+                False,
+                output_field=models.BooleanField(),
+            )
+        active_genres = genre_models.Genre.objects.filter(active=True)
+        active_instruments = instrument_models.Instrument.objects.filter(
+            active=True,
+        )
+        queryset = (
+            self.select_related("country")
+            .prefetch_related(
+                models.Prefetch("genres", queryset=active_genres),
+                models.Prefetch("instruments", queryset=active_instruments),
+                models.Prefetch(
+                    "instruments_needed",
+                    queryset=active_instruments,
+                ),
+            )
+            .annotate(
+                annotated_is_favorite=is_favorite,
+                annotated_number_of_active_gigs=models.Count(
+                    "gigs",
+                    filter=models.Q(
+                        gigs__active=True,
+                        gigs__start_date__gt=timezone.now(),
+                    ),
+                ),
+            )
+        )
+        if user.is_authenticated and user.point:
+            queryset = queryset.annotate(
+                annotated_distance=gis_functions.Distance("point", user.point),
+            )
+        return queryset
+
+
+class UserManager(auth_models.BaseUserManager.from_queryset(UserQuerySet)):
     def _create_user(
         self,
         username,
@@ -70,6 +131,8 @@ class UserManager(auth_models.BaseUserManager):
 
 
 class User(  # type: ignore
+    SearchVectorMixin,
+    DirtyFieldsMixin,
     auth_models.AbstractBaseUser,
     auth_models.PermissionsMixin,
 ):
@@ -103,7 +166,7 @@ class User(  # type: ignore
     last_login = models.DateTimeField(null=True, blank=True)
     date_joined = models.DateTimeField(auto_now_add=True)
     subscribed_to_emails = models.BooleanField(default=True)
-    point = models.PointField(default=Point([]), blank=True)
+    point = models.PointField(geography=True, default=Point([]), blank=True)
     location = models.CharField(
         max_length=254,
         help_text="Town or city",
@@ -185,7 +248,6 @@ class User(  # type: ignore
         blank=True,
         null=True,
     )
-    room_ids_with_unread_messages = models.JSONField(default=list)
 
     search_country = models.CharField(max_length=254, null=True)
     search_genres = models.TextField(null=True)
@@ -193,40 +255,102 @@ class User(  # type: ignore
     search_instruments_needed = models.TextField(null=True)
     search_vector = search.SearchVectorField(null=True)
 
-    def save(self, *args, **kwargs):
-        super().save()
-        self.update_search_vector()
-        for gig in self.gigs.filter(active=True):  # noqa
-            gig.update_search_vector()
+    # Bitsets of the `bit`s of active genres and instruments,
+    # used by matching. See custom_user.matching.
+    genre_bits = BitsetField(default=bytes, editable=False)
+    instrument_bits = BitsetField(default=bytes, editable=False)
+    instruments_needed_bits = BitsetField(default=bytes, editable=False)
+
+    class Meta:
+        indexes = [
+            indexes.GinIndex(
+                fields=["search_vector"],
+                name="user_search_vector_gin",
+            ),
+        ]
+
+    search_vector_fields = (
+        ("username", "A"),
+        ("search_genres", "B"),
+        ("search_instruments", "B"),
+        ("search_instruments_needed", "B"),
+        ("location", "C"),
+        ("search_country", "C"),
+    )
+    search_vector_source_fields = (
+        "username",
+        "location",
+        "country",
+        "is_musician",
+        "is_band",
+        "genres",
+        "instruments",
+        "instruments_needed",
+    )
+    # Gigs and rooms only include the username.
+    search_vector_cascade_fields = ("username",)
+    update_only_fields = (
+        "genre_bits",
+        "instrument_bits",
+        "instruments_needed_bits",
+    )
 
-    def update_search_vector(self):
+    def get_search_fields(self):
+        search_fields = {
+            "search_country": None,
+            "search_genres": " ".join(
+                genre.genre for genre in self.genres.all()
+            ),
+            "search_instruments": None,
+            "search_instruments_needed": None,
+        }
         if self.country:
-            self.search_country = (
-                f"{self.country.country} {self.country.code}"  # noqa
-            )
-        self.search_genres = " ".join(
-            genre.genre for genre in self.genres.all()
-        )
+            search_fields[
+                "search_country"
+            ] = f"{self.country.country} {self.country.code}"  # noqa
         if self.is_musician:
-            self.search_instruments = " ".join(
+            search_fields["search_instruments"] = " ".join(
                 instrument.instrument for instrument in self.instruments.all()
             )
         if self.is_band:
-            self.search_instruments_needed = " ".join(
+            search_fields["search_instruments_needed"] = " ".join(
                 instrument.instrument
                 for instrument in self.instruments_needed.all()
             )
-        # Saving here for fields to show up for SearchVector.
-        super().save()
-        self.search_vector = search.SearchVector(
-            "username",
-            "location",
-            "search_country",
-            "search_genres",
-            "search_instruments",
-            "search_instruments_needed",
-        )
-        super().save()
+        return search_fields
+
+    def get_search_vector_dependents(self):
+        return [
+            self.gigs.filter(active=True),  # noqa
+            self.rooms_membership.all(),  # noqa
+        ]
+
+    def get_match_features(self):
+        """
+        Returns the values of the match feature fields.
+        """
+
+        def get_bits(related):
+            bits = related.filter(active=True, bit__isnull=False).values_list(
+                "bit",
+                flat=True,
+            )
+            return bitsets.to_bytes(bitsets.from_bits(bits))
+
+        return {
+            "genre_bits": get_bits(self.genres),
+            "instrument_bits": get_bits(self.instruments),
+            "instruments_needed_bits": get_bits(self.instruments_needed),
+        }
+
+    def update_match_features(self):
+        """
+        Updates the match feature fields using a single UPDATE.
+        """
+        match_features = self.get_match_features()
+        type(self).objects.filter(id=self.id).update(**match_features)
+        for field_name, value in match_features.items():
+            setattr(self, field_name, value)
 
     def get_jwt(self):
         refresh = tokens.RefreshToken.for_user(self)
@@ -244,15 +368,6 @@ class User(  # type: ignore
             .count()
         )
 
-    def add_room_id_with_unread_messages(self, new_room_id):
-        room_ids = self.room_ids_with_unread_messages
-        if new_room_id in room_ids:
-            return
-
-        room_ids.append(new_room_id)
-        self.room_ids_with_unread_messages = room_ids
-        self.save()
-
 
 class NotificationToken(BaseModel):
     """
@@ -0,0 +1,98 @@
+"""
+Push notifications are queued per user in Redis and sent in batches.
+
+Notifications queued for a user within PUSH_NOTIFICATIONS_COALESCE_SECONDS
+of each other are coalesced into one notification per device. After the
+window, tasks.send_queued_push_notifications sends notifications for
+every queued user using Expo's batch API. Notifications not sent within
+PUSH_NOTIFICATIONS_QUEUE_SECONDS, e.g. as the send task was lost, expire.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "push_notifications"
+USERS_KEY = f"{KEY_PREFIX}:users"
+SCHEDULED_KEY = f"{KEY_PREFIX}:scheduled"
+
+
+def get_user_key(user_id):
+    return f"{KEY_PREFIX}:user:{user_id}"
+
+
+def queue_push_notification(user_id, title, message, data):
+    """
+    Queues a push notification for all of a user's active devices.
+    """
+    # Imported here as tasks imports this module.
+    from project.custom_user import tasks
+
+    window = settings.PUSH_NOTIFICATIONS_COALESCE_SECONDS
+    queue_seconds = settings.PUSH_NOTIFICATIONS_QUEUE_SECONDS
+    connection = get_redis_connection("default")
+    user_key = get_user_key(user_id)
+    notification = {"title": title, "message": message, "data": data}
+    pipeline = connection.pipeline()
+    pipeline.rpush(user_key, json.dumps(notification))
+    pipeline.expire(user_key, queue_seconds)
+    pipeline.sadd(USERS_KEY, str(user_id))
+    pipeline.expire(USERS_KEY, queue_seconds)
+    pipeline.execute()
+
+    # Expiring in case the send task is lost, so that
+    # a later notification schedules another one.
+    if connection.set(SCHEDULED_KEY, 1, nx=True, ex=window * 10):
+        tasks.send_queued_push_notifications.apply_async(countdown=window)
+
+
+def pop_queued_push_notifications():
+    """
+    Returns and removes queued notifications as {user_id: notifications}.
+    """
+    connection = get_redis_connection("default")
+    # Deleted first, so notifications queued from
+    # now on schedule another send task.
+    connection.delete(SCHEDULED_KEY)
+
+    pipeline = connection.pipeline()
+    pipeline.smembers(USERS_KEY)
+    pipeline.delete(USERS_KEY)
+    user_ids, _ = pipeline.execute()
+
+    pipeline = connection.pipeline()
+    for user_id in user_ids:
+        user_key = get_user_key(user_id.decode())
+        pipeline.lrange(user_key, 0, -1)
+        pipeline.delete(user_key)
+    results = pipeline.execute()
+
+    notifications = {}
+    for user_id, queued in zip(user_ids, results[::2]):
+        if queued:
+            notifications[user_id.decode()] = [
+                json.loads(notification) for notification in queued
+            ]
+        else:
+            logger.error(
+                "Queued push notifications for user:%s expired.",
+                user_id.decode(),
+            )
+    return notifications
+
+
+def coalesce(notifications):
+    """
+    Returns one notification summarising a user's notifications.
+    """
+    last_notification = notifications[-1]
+    if len(notifications) == 1:
+        return last_notification
+    return {
+        "title": f"{len(notifications)} new messages",
+        "message": last_notification["message"],
+        "data": last_notification["data"],
+    }
@@ -14,7 +14,7 @@ from project.genre import serializers as genre_serializers
 from project.image import tasks as image_tasks
 from project.instrument import serializers as instrument_serializers
 from project.location.fields import LocationField
-from project.location.helpers import get_distance_between_points
+from project.location.helpers import Units, get_distance_between_points
 from project.site import domain
 
 User = get_user_model()
@@ -76,15 +76,13 @@ class UserSerializer(serializers.ModelSerializer):
             "instruments_needed", None
         )
         user = super().update(instance, copy_of_validated_data)
+        # Setting only adds and removes what's changed.
         if genres is not None:
-            user.genres.clear()
-            user.genres.add(*genres)
+            user.genres.set(genres)
         if instruments is not None:
-            user.instruments.clear()
-            user.instruments.add(*instruments)
+            user.instruments.set(instruments)
         if instruments_needed is not None:
-            user.instruments_needed.clear()
-            user.instruments_needed.add(*instruments_needed)
+            user.instruments_needed.set(instruments_needed)
         if copy_of_validated_data.get("image", None) is not None:
             image_tasks.create_thumbnail.delay("custom_user", "user", user.id)
         return user
@@ -109,6 +107,8 @@ class UserSerializer(serializers.ModelSerializer):
         return data_copy
 
     def get_number_of_active_gigs(self, instance):
+        if hasattr(instance, "annotated_number_of_active_gigs"):
+            return instance.annotated_number_of_active_gigs
         return instance.number_of_active_gigs()
 
 
@@ -157,6 +157,17 @@ class CreateUserSerializer(serializers.ModelSerializer):
         }
 
 
+def get_active_related(instance, field_name):
+    """
+    Returns active related objects for a many-to-many field.
+    Prefetched objects are used if available, see
+    UserQuerySet.with_serializer_data.
+    """
+    if field_name in getattr(instance, "_prefetched_objects_cache", {}):
+        return getattr(instance, field_name).all()
+    return getattr(instance, field_name).filter(active=True)
+
+
 user_non_sensitive_fields = [
     field
     for field in UserSerializer.Meta.fields
@@ -172,12 +183,17 @@ user_non_sensitive_fields = [
 ]
 
 
+# Attributes of Distance objects for each of the units users can prefer.
+UNIT_ATTRIBUTES = {Units.KILOMETERS.value: "km", Units.MILES.value: "mi"}
+
+
 class UserSerializerIfNotOwner(serializers.ModelSerializer):
     genres = serializers.SerializerMethodField()
     instruments = serializers.SerializerMethodField()
     instruments_needed = serializers.SerializerMethodField()
     distance_from_user = serializers.SerializerMethodField()
     is_favorite = serializers.SerializerMethodField()
+    number_of_active_gigs = serializers.SerializerMethodField()
     country = country_serializers.CountrySerializer()
 
     class Meta:
@@ -188,15 +204,27 @@ class UserSerializerIfNotOwner(serializers.ModelSerializer):
         ] + user_non_sensitive_fields
 
     def get_distance_from_user(self, obj):
+        """
+        Uses the distance annotated by UserQuerySet.with_serializer_data
+        if available, otherwise calculates it.
+        """
         user = self.context["request"].user
         if user.is_authenticated:
             if user.point and obj.point:
                 units = user.preferred_units or user.units
-                distance = get_distance_between_points(
-                    point_1=user.point,
-                    point_2=obj.point,
-                    units=units,
-                )
+                if getattr(obj, "annotated_distance", None) is not None:
+                    distance = round(
+                        getattr(
+                            obj.annotated_distance, UNIT_ATTRIBUTES[units]
+                        ),
+                        2,
+                    )
+                else:
+                    distance = get_distance_between_points(
+                        point_1=user.point,
+                        point_2=obj.point,
+                        units=units,
+                    )
                 return f"{distance} {units}"
 
         return None
@@ -207,7 +235,7 @@ class UserSerializerIfNotOwner(serializers.ModelSerializer):
         so we can pass the context object.
         """
         return genre_serializers.GenreSerializer(
-            instance.genres.filter(active=True),
+            get_active_related(instance, "genres"),
             many=True,
             read_only=True,
             context=self.context["request"],
@@ -219,7 +247,7 @@ class UserSerializerIfNotOwner(serializers.ModelSerializer):
         so we can pass the context object.
         """
         return instrument_serializers.InstrumentSerializer(
-            instance.instruments.filter(active=True),
+            get_active_related(instance, "instruments"),
             many=True,
             read_only=True,
             context=self.context["request"],
@@ -231,18 +259,25 @@ class UserSerializerIfNotOwner(serializers.ModelSerializer):
         so we can pass the context object.
         """
         return instrument_serializers.InstrumentSerializer(
-            instance.instruments_needed.filter(active=True),
+            get_active_related(instance, "instruments_needed"),
             many=True,
             read_only=True,
             context=self.context["request"],
         ).data
 
     def get_is_favorite(self, instance):
+        if hasattr(instance, "annotated_is_favorite"):
+            return instance.annotated_is_favorite
         user = self.context["request"].user
         if not user.is_authenticated:
             return False
         return user.favorite_users.filter(id=instance.id).exists()
 
+    def get_number_of_active_gigs(self, instance):
+        if hasattr(instance, "annotated_number_of_active_gigs"):
+            return instance.annotated_number_of_active_gigs
+        return instance.number_of_active_gigs()
+
     def get_image(self, instance):
         """
         Created URLs this way as sometimes when called this
@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+
+from project.custom_user import auth_cache
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def update_auth_cache(sender, instance, created, raw, **kwargs):
+    if created or raw:
+        return
+    if "password" in instance.get_dirty_fields():
+        auth_cache.revoke_tokens(instance.id)
+        return
+    auth_cache.delete_user(instance.id)
+
+
+@receiver(m2m_changed, sender=User.genres.through)
+@receiver(m2m_changed, sender=User.instruments.through)
+@receiver(m2m_changed, sender=User.instruments_needed.through)
+def update_match_features(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        instance.update_match_features()
+        return
+    # Changed from the genre or instrument, e.g. genre.users.add(user).
+    # As with search vectors, clearing from that side isn't handled.
+    if not pk_set:
+        return
+    for user in User.objects.filter(pk__in=pk_set):
+        user.update_match_features()
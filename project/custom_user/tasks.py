@@ -2,9 +2,10 @@ import logging
 
 import exponent_server_sdk
 from celery import shared_task
+from django.conf import settings
 from requests.exceptions import ConnectionError, HTTPError
 
-from project.custom_user import models
+from project.custom_user import models, push_notifications
 
 logger = logging.getLogger(__name__)
 
@@ -14,79 +15,156 @@ retry = {
     "countdown": 5,  # retry after 5 seconds.
 }
 
+# Maximum number of messages Expo accepts in one request.
+PUSH_MESSAGES_PER_REQUEST = 100
 
-@shared_task(bind=True, queue="push_notifications")
-def send_push_notification(self, user_id, title, message, data):
+
+@shared_task(queue="push_notifications")
+def send_queued_push_notifications():
     """
-    Sends a push notification to all user's active devices.
+    Sends queued push notifications, one per device for each user,
+    in batches. See custom_user.push_notifications.
     """
-    user = models.User.objects.filter(id=user_id).first()
-    if not user:
-        logger.error("user with id:%s not found.", user_id)
+    queued = push_notifications.pop_queued_push_notifications()
+    if not queued:
+        return
+
+    push_messages = []
+    tokens = models.NotificationToken.objects.filter(
+        user_id__in=queued.keys(),
+        active=True,
+    ).values_list("id", "user_id", "token")
+    for token_id, user_id, token in tokens:
+        notification = push_notifications.coalesce(queued[str(user_id)])
+        push_messages.append(
+            {
+                "token_id": str(token_id),
+                "to": token,
+                "title": notification["title"],
+                "body": notification["message"],
+                "data": notification["data"],
+            }
+        )
+    logger.debug(
+        "sending %s push notifications to %s users.",
+        len(push_messages),
+        len(queued),
+    )
+    for start in range(0, len(push_messages), PUSH_MESSAGES_PER_REQUEST):
+        end = start + PUSH_MESSAGES_PER_REQUEST
+        publish_push_messages.delay(push_messages[start:end])
+
+
+def deactivate_tokens(token_ids):
+    if not token_ids:
         return
+    logger.debug(
+        "DeviceNotRegisteredError for tokens:%s. "
+        "setting tokens to not active.",
+        token_ids,
+    )
+    models.NotificationToken.objects.filter(id__in=token_ids).update(
+        active=False
+    )
+
 
-    for token in user.notification_tokens.filter(active=True):
-        variables = {
-            "to": token.token,
-            "title": title,
-            "body": message,
-            "data": data,
-        }
-        logger.debug(
-            "attempting to send push notification "
-            "to user with id:%s using:%s.",
-            user.id,
-            variables,
+@shared_task(bind=True, queue="push_notifications")
+def publish_push_messages(self, push_messages):
+    """
+    Sends up to 100 push messages in a single request.
+    Schedules a check of their receipts.
+    """
+    try:
+        push_tickets = exponent_server_sdk.PushClient().publish_multiple(
+            [
+                exponent_server_sdk.PushMessage(
+                    to=push_message["to"],
+                    title=push_message["title"],
+                    body=push_message["body"],
+                    data=push_message["data"],
+                )
+                for push_message in push_messages
+            ]
+        )
+    except exponent_server_sdk.PushServerError as exc:
+        logger.error(
+            "PushServerError for %s messages, errors:%s, response_data:%s.",
+            len(push_messages),
+            exc.errors,
+            exc.response_data,
         )
+        return
+    except (ConnectionError, HTTPError) as exc:
+        logger.error(
+            "ConnectionError or HTTPError for %s messages. Retrying ...",
+            len(push_messages),
+        )
+        raise self.retry(exc=exc, **retry)
+
+    unregistered_token_ids = []
+    receipt_token_ids = {}
+    for push_message, push_ticket in zip(push_messages, push_tickets):
         try:
-            response = exponent_server_sdk.PushClient().publish(
-                exponent_server_sdk.PushMessage(**variables)
-            )
-        except exponent_server_sdk.PushServerError as exc:
-            logger.error(
-                "PushServerError for user:%s, using:%s, "
-                "errors:%s, response_data:%s.",
-                user.id,
-                variables,
-                exc.errors,
-                exc.response_data,
-            )
-            return
-        except (ConnectionError, HTTPError) as exc:
+            push_ticket.validate_response()
+        except exponent_server_sdk.DeviceNotRegisteredError:
+            unregistered_token_ids.append(push_message["token_id"])
+        except exponent_server_sdk.PushTicketError:
             logger.error(
-                "ConnectionError or HTTPError for user:%s, using:%s. "
-                "Retrying ...",
-                user.id,
-                variables,
+                "PushTicketError for token:%s, push_ticket:%s.",
+                push_message["token_id"],
+                push_ticket._asdict(),  # noqa
             )
-            raise self.retry(exc=exc, **retry)
-
-        logger.debug(
-            "Push notification response received "
-            "for user:%s, using:%s, response:%s.",
-            user.id,
-            variables,
-            response.status,
+        else:
+            receipt_token_ids[push_ticket.id] = push_message["token_id"]
+    deactivate_tokens(unregistered_token_ids)
+
+    if receipt_token_ids:
+        check_push_receipts.apply_async(
+            (receipt_token_ids,),
+            countdown=settings.PUSH_NOTIFICATIONS_RECEIPTS_DELAY_SECONDS,
         )
+
+
+@shared_task(bind=True, queue="push_notifications")
+def check_push_receipts(self, receipt_token_ids):
+    """
+    Checks the receipts of sent push messages in a batch.
+    `receipt_token_ids` maps push ticket ids to token ids.
+    """
+    push_tickets = [
+        exponent_server_sdk.PushTicket(
+            push_message=None,
+            status=exponent_server_sdk.PushTicket.SUCCESS_STATUS,
+            message="",
+            details=None,
+            id=ticket_id,
+        )
+        for ticket_id in receipt_token_ids
+    ]
+    try:
+        receipts = exponent_server_sdk.PushClient().check_receipts_multiple(
+            push_tickets
+        )
+    except exponent_server_sdk.PushServerError as exc:
+        logger.error(
+            "PushServerError checking %s receipts, errors:%s.",
+            len(push_tickets),
+            exc.errors,
+        )
+        return
+    except (ConnectionError, HTTPError) as exc:
+        raise self.retry(exc=exc, **retry)
+
+    unregistered_token_ids = []
+    for receipt in receipts:
         try:
-            response.validate_response()
+            receipt.validate_response()
         except exponent_server_sdk.DeviceNotRegisteredError:
-            logger.debug(
-                "DeviceNotRegisteredError for user:%s, using:%s. "
-                "setting token to not active.",
-                user.id,
-                variables,
-            )
-            token.active = False
-            token.save()
-            return
-        except exponent_server_sdk.PushTicketError as exc:
-            # Encountered some other per-notification error.
+            unregistered_token_ids.append(receipt_token_ids[receipt.id])
+        except exponent_server_sdk.PushTicketError:
             logger.error(
-                "PushTicketError for user:%s, using:%s, push_response:%s. "
-                "Retrying ...",
-                user.id,
-                variables,
-                exc.push_response._asdict(),  # noqa
+                "Push receipt error for token:%s, receipt:%s.",
+                receipt_token_ids.get(receipt.id),
+                receipt._asdict(),  # noqa
             )
-            raise self.retry(exc=exc, **retry)
+    deactivate_tokens(unregistered_token_ids)
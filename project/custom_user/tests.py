@@ -1,17 +1,23 @@
 import json
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.gis.geos import Point
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django_redis import get_redis_connection
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from project.audio import models as audio_models
+from project.core import bitsets
 from project.core.tests import create_user, setup_user_with_drf_client
 from project.country import models as country_models
-from project.custom_user import serializers
+from project.custom_user import auth_cache, push_notifications, serializers
 from project.genre import models as genre_models
+from project.instrument import models as instrument_models
 
 User = get_user_model()
 
@@ -194,6 +200,25 @@ class AuthTestCase(TestCase):
         )
 
 
+class AuthCacheTestCase(TestCase):
+    def test_cached_user(self):
+        user = create_user(username="fred")
+        user.point = Point(-0.0779528, 51.5131749)
+        user.save()
+        auth_cache.set_user(User.objects.get(id=user.id))
+
+        cached_user, tokens_not_before = auth_cache.get_user(user.id)
+        self.assertIsNone(tokens_not_before)
+        self.assertEqual(cached_user.id, user.id)
+        self.assertEqual(cached_user.username, "fred")
+        self.assertEqual(cached_user.point.coords, user.point.coords)
+        # Fields which aren't cached are loaded when accessed.
+        self.assertEqual(cached_user.email, "fred@example.com")
+
+        user.save()
+        self.assertEqual(auth_cache.get_user(user.id), (None, None))
+
+
 class UserAPITestCase(TestCase):
     def setUp(self):
         self.user, self.drf_client = setup_user_with_drf_client(
@@ -243,6 +268,57 @@ class UserAPITestCase(TestCase):
             "0.02 kilometers",
         )
 
+    def test_search_within_radius_and_order_by_distance(self):
+        self.user.point = Point(-0.0779528, 51.5131749)
+        self.user.save()
+        near_user = create_user(username="near")
+        near_user.point = Point(-0.0780935, 51.5133267)
+        near_user.save()
+        far_user = create_user(username="far")
+        far_user.point = Point(-0.1, 51.6)
+        far_user.save()
+        manchester_user = create_user(username="manchester")
+        manchester_user.point = Point(-2.2426, 53.4808)
+        manchester_user.save()
+
+        response = self.drf_client.get(
+            path=reverse("user-search"),
+            data={"radius": 20, "order_by": "distance"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(
+            [result["username"] for result in results],
+            ["near", "far"],
+        )
+        self.assertEqual(results[0]["distance_from_user"], "0.02 kilometers")
+
+    def test_search_order_by_distance_with_cursor_pagination(self):
+        self.user.point = Point(-0.0779528, 51.5131749)
+        self.user.save()
+        near_user = create_user(username="near")
+        near_user.point = Point(-0.0780935, 51.5133267)
+        near_user.save()
+        far_user = create_user(username="far")
+        far_user.point = Point(-0.1, 51.6)
+        far_user.save()
+        # Has the default empty point.
+        create_user(username="nowhere")
+
+        path = reverse("user-search")
+        data = {"order_by": "distance", "pagination": "cursor", "page_size": 1}
+        usernames = []
+        response = self.drf_client.get(path=path, data=data)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            usernames.extend(
+                result["username"] for result in response.data["results"]
+            )
+            if response.data["next"] is None:
+                break
+            response = self.drf_client.get(path=response.data["next"])
+        self.assertEqual(usernames, ["near", "far"])
+
     def test_preferred_units(self):
         self.user.point = Point(-0.0779528, 51.5131749)
         self.user.preferred_units = User.MILES
@@ -328,6 +404,99 @@ class UserAPITestCase(TestCase):
         self.assertEqual(self.user.genres.count(), 0)
 
 
+class MatchesTestCase(TestCase):
+    def setUp(self):
+        self.band, self.drf_client = setup_user_with_drf_client(
+            username="band",
+        )
+        self.band.is_band = True
+        self.band.save()
+        self.rock = genre_models.Genre.objects.create(genre="rock")
+        self.jazz = genre_models.Genre.objects.create(genre="jazz")
+        self.guitar = instrument_models.Instrument.objects.create(
+            instrument="guitar",
+        )
+        self.drums = instrument_models.Instrument.objects.create(
+            instrument="drums",
+        )
+        self.band.genres.add(self.rock)
+        self.band.instruments_needed.add(self.guitar, self.drums)
+
+    def create_musician(self, username, genres, instruments):
+        musician = create_user(username)
+        musician.is_musician = True
+        musician.save()
+        musician.genres.add(*genres)
+        musician.instruments.add(*instruments)
+        return musician
+
+    def test_bits(self):
+        self.assertEqual(self.rock.bit + 1, self.jazz.bit)
+        self.assertEqual(self.guitar.bit + 1, self.drums.bit)
+
+    def test_match_features_are_updated(self):
+        self.band.refresh_from_db()
+        self.assertEqual(
+            bitsets.from_bytes(self.band.genre_bits),
+            bitsets.from_bits([self.rock.bit]),
+        )
+        self.assertEqual(
+            bitsets.from_bytes(self.band.instruments_needed_bits),
+            bitsets.from_bits([self.guitar.bit, self.drums.bit]),
+        )
+        self.band.instruments_needed.remove(self.drums)
+        self.band.refresh_from_db()
+        self.assertEqual(
+            bitsets.from_bytes(self.band.instruments_needed_bits),
+            bitsets.from_bits([self.guitar.bit]),
+        )
+
+        # Saving a user loaded before an update doesn't overwrite it.
+        band = User.objects.get(id=self.band.id)
+        self.guitar.instruments_needed_by_users.remove(self.band)
+        band.bio = "We're a band"
+        band.save()
+        band.refresh_from_db()
+        self.assertEqual(band.instruments_needed_bits, b"")
+
+    def test_matches(self):
+        drummer_and_guitarist = self.create_musician(
+            "drummer_and_guitarist",
+            [self.rock],
+            [self.guitar, self.drums],
+        )
+        guitarist = self.create_musician(
+            "guitarist",
+            [self.jazz],
+            [self.guitar],
+        )
+        # Only musicians are matched with bands.
+        other_band = create_user("other_band")
+        other_band.is_band = True
+        other_band.save()
+
+        response = self.drf_client.get(path=reverse("user-matches"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [user["id"] for user in response.data],
+            [str(drummer_and_guitarist.id), str(guitarist.id)],
+        )
+        # All instruments needed and the same genre.
+        self.assertEqual(response.data[0]["match_score"], 0.8)
+        # Half the instruments needed and a different genre.
+        self.assertEqual(response.data[1]["match_score"], 0.25)
+
+        response = self.drf_client.get(
+            path=reverse("user-matches"),
+            data={"limit": 1},
+        )
+        self.assertEqual(len(response.data), 1)
+
+    def test_matches_not_authenticated(self):
+        response = APIClient().get(path=reverse("user-matches"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
 class UserSerializerTestCase(TestCase):
     def setUp(self):
         self.user = create_user(username="fred")
@@ -387,3 +556,86 @@ class UserSerializerTestCase(TestCase):
         self.assertTrue(serializer.is_valid())
         user = serializer.save()
         self.assertEqual(user.units, User.KM)
+
+    def test_genres_are_fetched_in_one_query(self):
+        genres = [
+            genre_models.Genre.objects.create(genre=genre)
+            for genre in ["Doom", "Noise", "Drone", "Sludge"]
+        ]
+        data = {
+            "genres": [{"id": str(genre.id)} for genre in genres[:3]]
+            + [{"genre": genres[3].genre}],
+        }
+        serializer = serializers.UserSerializer(
+            self.user,
+            data=data,
+            partial=True,
+        )
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(serializer.validated_data["genres"], genres)
+
+    def test_genres_that_do_not_exist(self):
+        genre = genre_models.Genre.objects.create(genre="Doom")
+        for genres in (
+            [{"id": str(genre.id)}, {"genre": "Polka"}],
+            [{"id": "not a uuid"}],
+            [{"colour": "red"}],
+        ):
+            serializer = serializers.UserSerializer(
+                self.user,
+                data={"genres": genres},
+                partial=True,
+            )
+            self.assertFalse(serializer.is_valid())
+            self.assertIn("genres", serializer.errors)
+
+
+class CoalescePushNotificationsTestCase(TestCase):
+    def test_single_notification_is_unchanged(self):
+        notification = {"title": "Message from fred", "message": "hi"}
+        self.assertEqual(
+            push_notifications.coalesce([notification]),
+            notification,
+        )
+
+    def test_notifications_are_coalesced(self):
+        notifications = [
+            {"title": "Message from fred", "message": "hi", "data": 1},
+            {"title": "Message from jiggy", "message": "yo", "data": 2},
+        ]
+        self.assertEqual(
+            push_notifications.coalesce(notifications),
+            {"title": "2 new messages", "message": "yo", "data": 2},
+        )
+
+
+class QueuePushNotificationsTestCase(TestCase):
+    def setUp(self):
+        self.connection = get_redis_connection("default")
+        push_notifications.pop_queued_push_notifications()
+        # As if a send task was scheduled, so none is sent to celery.
+        self.connection.set(push_notifications.SCHEDULED_KEY, 1)
+
+    def tearDown(self):
+        self.connection.delete(push_notifications.SCHEDULED_KEY)
+
+    def test_queued_notifications_outlive_a_late_send_task(self):
+        push_notifications.queue_push_notification(1, "fred", "hi", {})
+        user_key = push_notifications.get_user_key(1)
+        self.assertGreater(
+            self.connection.ttl(user_key),
+            settings.PUSH_NOTIFICATIONS_COALESCE_SECONDS * 10,
+        )
+        self.assertEqual(
+            push_notifications.pop_queued_push_notifications(),
+            {"1": [{"title": "fred", "message": "hi", "data": {}}]},
+        )
+
+    def test_expired_notifications_are_dropped(self):
+        push_notifications.queue_push_notification(1, "fred", "hi", {})
+        self.connection.delete(push_notifications.get_user_key(1))
+        self.assertEqual(
+            push_notifications.pop_queued_push_notifications(), {}
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.2 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+def set_bits(apps, schema_editor):
+    Genre = apps.get_model("genre", "Genre")  # noqa
+    for bit, genre in enumerate(Genre.objects.order_by("date_created", "id")):
+        genre.bit = bit
+        genre.save(update_fields=["bit"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genre", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="genre",
+            name="bit",
+            field=models.PositiveIntegerField(
+                editable=False,
+                null=True,
+                unique=True,
+            ),
+        ),
+        migrations.RunPython(set_bits, migrations.RunPython.noop),
+    ]
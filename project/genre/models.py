@@ -1,8 +1,9 @@
 from django.db import models
 
-from project.core.models import BaseModel
+from project.core.models import BaseModel, BitMixin
 
 
-class Genre(BaseModel):
+class Genre(BitMixin, BaseModel):
     genre = models.CharField(max_length=254, unique=True)
     rank = models.IntegerField(default=1)
+    bit = models.PositiveIntegerField(unique=True, null=True, editable=False)
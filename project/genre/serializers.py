@@ -1,21 +1,15 @@
-from django.core import exceptions as django_exceptions
-from rest_framework import serializers
-
+from project.core.drf import serializers as core_serializers
 from project.genre import models
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(core_serializers.ExistingModelSerializer):
+    does_not_exist_message = "Genres do not exist"
+    invalid_message = "Invalid Genres"
+
     class Meta:
         model = models.Genre
         fields = (
             "id",
             "genre",
         )
-
-    def to_internal_value(self, data):
-        try:
-            return models.Genre.objects.get(**data)
-        except models.Genre.DoesNotExist:
-            raise serializers.ValidationError({"Genres do not exist"})
-        except django_exceptions.FieldError:
-            raise serializers.ValidationError("Invalid Genres")
+        list_serializer_class = core_serializers.ExistingListSerializer
@@ -1,21 +1,33 @@
+from django.conf import settings
 from django.http import Http404
 from django.utils import timezone
-from rest_framework import status
+from rest_framework import exceptions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from project.core import permissions, search
+from project.core.api import mixins as core_mixins
 from project.core.api import viewsets as core_viewsets
-from project.gig import models, serializers
+from project.core.drf import pagination
+from project.gig import models, recommendations, serializers, tasks
+from project.location import functions as location_functions
+from project.location import helpers as location_helpers
 
 
-class GigViewSet(core_viewsets.CustomModelViewSet):
+class GigViewSet(
+    core_mixins.CursorPaginationMixin,
+    core_viewsets.CustomModelViewSet,
+):
     """
     Gig API. List and retrieve are left open in regards to permissions.
+
+    Lists can be paginated by a cursor using `pagination=cursor`.
     """
 
     queryset = models.Gig.objects.filter(active=True).order_by("start_date")
     serializer_class = serializers.GigSerializer
+    cursor_pagination_class = pagination.GigCursorPagination
+    permission_classes = (permissions.IsOwnerOrReadOnly,)
 
     def retrieve(self, request, *args, **kwargs):
         """
@@ -33,18 +45,6 @@ class GigViewSet(core_viewsets.CustomModelViewSet):
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
-    def create(self, request, *args, **kwargs):
-        permissions.is_authenticated(request)
-        return super().create(request, *args, **kwargs)
-
-    def update(self, request, *args, **kwargs):
-        permissions.is_owner(request, self.get_object())
-        return super().update(request, *args, **kwargs)
-
-    def partial_update(self, request, *args, **kwargs):
-        permissions.is_owner(request, self.get_object())
-        return super().partial_update(request, *args, **kwargs)
-
     def destroy(self, request, *args, **kwargs):
         """
         Sets Gig to inactive.
@@ -60,22 +60,23 @@ class GigViewSet(core_viewsets.CustomModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_queryset(self):
+        queryset = self.queryset.with_serializer_data(self.request.user)
         if not self.request.user.is_authenticated:
             user_id = self.request.query_params.get("user_id")  # noqa
             if user_id:
-                return self.queryset.filter(user__id=user_id).exclude(
+                return queryset.filter(user__id=user_id).exclude(
                     start_date__lte=timezone.now(),
                 )
-            return self.queryset.exclude(start_date__lte=timezone.now())
+            return queryset.exclude(start_date__lte=timezone.now())
 
         user_id = self.request.query_params.get("user_id")  # noqa
         if user_id:
-            return self.queryset.filter(user__id=user_id).exclude(
+            return queryset.filter(user__id=user_id).exclude(
                 start_date__lte=timezone.now(),
             )
 
         if self.request.query_params.get("my_gigs"):  # noqa
-            return self.queryset.filter(user=self.request.user).exclude(
+            return queryset.filter(user=self.request.user).exclude(
                 start_date__lte=timezone.now(),
             )
 
@@ -84,14 +85,25 @@ class GigViewSet(core_viewsets.CustomModelViewSet):
             self.request.method in ["GET", "PUT", "PATCH"]
             and self.lookup_field in self.kwargs.keys()
         ):
-            return self.queryset
+            return queryset
 
-        return self.queryset.exclude(user=self.request.user).exclude(
+        return queryset.exclude(user=self.request.user).exclude(
             start_date__lte=timezone.now()
         )
 
     @action(detail=False, methods=["GET"])
     def search(self, request):
+        """
+        Searches Gigs.
+
+        Gigs near a location can be found using the `lat`, `lng` and
+        `radius` params. `radius` is in the requesting user's units.
+        If `lat` and `lng` are not provided the requesting user's
+        point is used. Use `order_by=distance` for nearest first.
+
+        `q` is parsed as a web search query and results
+        are ordered by relevance unless ordered by distance.
+        """
         params = {
             "active": True,
         }
@@ -128,18 +140,43 @@ class GigViewSet(core_viewsets.CustomModelViewSet):
         if my_gigs:
             params.update({"user": request.user})
 
-        query = request.query_params.get("q")
-        if query:
-            search.update_params_with_search_vectors(query, params)
+        point = location_helpers.get_point_from_query_params(
+            request.query_params,
+            request.user,
+        )
+        radius = location_helpers.get_radius_from_query_params(
+            request.query_params,
+            location_helpers.get_units_for_user(request.user),
+        )
+        if radius is not None:
+            if point is None:
+                raise exceptions.ParseError(
+                    "lat and lng are required when using radius."
+                )
+            params.update({"point__dwithin": (point, radius)})
 
         subquery = (
             models.Gig.objects.filter(**params)
             .distinct("id")
             .values_list("id", flat=True)
         )
-        queryset = models.Gig.objects.filter(id__in=subquery).order_by(
-            "start_date"
-        )
+        queryset = models.Gig.objects.filter(
+            id__in=subquery,
+        ).with_serializer_data(request.user)
+        query = request.query_params.get("q")
+        if query:
+            queryset = search.search_queryset(queryset, query)
+        if (
+            point is not None
+            and request.query_params.get("order_by") == "distance"
+        ):
+            queryset = queryset.annotate(
+                distance=location_functions.KNNDistance("point", point),
+            ).order_by("distance", "start_date")
+        elif query:
+            queryset = queryset.order_by("-search_rank", "start_date")
+        else:
+            queryset = queryset.order_by("start_date")
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -150,3 +187,41 @@ class GigViewSet(core_viewsets.CustomModelViewSet):
             many=True,
         )
         return Response(serialized.data)
+
+    @action(detail=False, methods=["GET"])
+    def recommended(self, request):
+        """
+        Returns upcoming gigs recommended for the requesting user, best
+        first, paginated by page number. See gig.recommendations.
+        Until a user's recommendations are computed in the background
+        the soonest upcoming gigs are returned.
+        """
+        permissions.is_authenticated(request)
+        gig_ids = recommendations.get_recommended_gig_ids(request.user)
+        if gig_ids is None:
+            user_id = str(request.user.id)
+            if settings.GIG_RECOMMENDATIONS_ENABLED:
+                if recommendations.set_refresh_queued(user_id):
+                    tasks.refresh_user_gig_recommendations.delay(user_id)
+                gig_ids = recommendations.get_fallback_gig_ids(request.user)
+            else:
+                recommendations.refresh_user(user_id)
+                gig_ids = recommendations.get_recommended_gig_ids(request.user)
+        paginator = pagination.DefaultPageNumberPagination()
+        gig_ids = paginator.paginate_queryset(gig_ids, request, view=self)
+        # Recommendations can include gigs since made inactive.
+        gigs = (
+            models.Gig.objects.filter(
+                id__in=gig_ids,
+                active=True,
+                start_date__gt=timezone.now(),
+            )
+            .exclude(user=request.user)
+            .with_serializer_data(request.user)
+        )
+        gigs_by_id = {gig.id: gig for gig in gigs}
+        serializer = self.get_serializer(
+            [gigs_by_id[gig_id] for gig_id in gig_ids if gig_id in gigs_by_id],
+            many=True,
+        )
+        return paginator.get_paginated_response(serializer.data)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GigConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "project.gig"
+
+    def ready(self):
+        import project.gig.signals  # noqa
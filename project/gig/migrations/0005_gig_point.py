@@ -0,0 +1,25 @@
+# Generated by Django 4.1.2 on 2026-10-18 10:02
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gig", "0004_gig_is_free_gig_gig_looking_for_gigpig"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gig",
+            name="point",
+            field=django.contrib.gis.db.models.fields.PointField(
+                blank=True,
+                geography=True,
+                help_text="Coordinates of the venue",
+                null=True,
+                srid=4326,
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.2 on 2026-10-18 11:20
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gig", "0005_gig_point"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="gig",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"],
+                name="gig_search_vector_gin",
+            ),
+        ),
+    ]
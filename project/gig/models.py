@@ -1,11 +1,70 @@
-from django.contrib.postgres import search
-from django.db import models
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.gis.db import models
+from django.contrib.postgres import indexes, search
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
-from project.core.models import BaseModel
+from project.core.models import BaseModel, SearchVectorMixin
 
 
-class Gig(BaseModel):
+class GigQuerySet(models.QuerySet):
+    def with_serializer_data(self, user):
+        """
+        Prefetches and annotates data used by GigSerializer so
+        serializing many gigs runs a fixed number of queries.
+        `user` is the requesting user.
+        """
+        User = get_user_model()  # noqa
+        Room = apps.get_model("chat", "Room")  # noqa
+        Message = apps.get_model("chat", "Message")  # noqa
+
+        if user.is_authenticated:
+            is_favorite = models.Exists(
+                User.objects.filter(
+                    id=user.id,
+                    favorite_gigs=models.OuterRef("pk"),
+                )
+            )
+        else:
+            is_favorite = models.Value(
+                False,
+                output_field=models.BooleanField(),
+            )
+        replies = (
+            Room.objects.filter(gig=models.OuterRef("pk"), active=True)
+            .filter(
+                models.Exists(
+                    Message.objects.filter(room=models.OuterRef("pk"))
+                )
+            )
+            .order_by()
+            .values("gig")
+            .annotate(count=models.Count("id"))
+            .values("count")
+        )
+        return (
+            self.select_related("country")
+            .prefetch_related(
+                "genres",
+                models.Prefetch(
+                    "user",
+                    queryset=User.objects.with_serializer_data(user),
+                ),
+            )
+            .annotate(
+                annotated_is_favorite=is_favorite,
+                annotated_replies=Coalesce(
+                    models.Subquery(replies),
+                    0,
+                ),
+            )
+        )
+
+
+class Gig(SearchVectorMixin, BaseModel):
+    objects = GigQuerySet.as_manager()
+
     user = models.ForeignKey(
         "custom_user.User",
         on_delete=models.CASCADE,
@@ -20,6 +79,12 @@ class Gig(BaseModel):
         max_length=254,
         help_text="Venue, pub, warehouse or location",
     )
+    point = models.PointField(
+        geography=True,
+        blank=True,
+        null=True,
+        help_text="Coordinates of the venue",
+    )
     country = models.ForeignKey(
         "country.CountryCode",
         on_delete=models.CASCADE,
@@ -54,28 +119,49 @@ class Gig(BaseModel):
     search_genres = models.TextField(null=True)
     search_vector = search.SearchVectorField(null=True)
 
-    def save(self, *args, **kwargs):
-        super().save()
-        self.update_search_vector()
-        self.user.update_search_vector()
+    class Meta:
+        indexes = [
+            indexes.GinIndex(
+                fields=["search_vector"],
+                name="gig_search_vector_gin",
+            ),
+        ]
 
-    def update_search_vector(self):
-        self.search_username = self.user.username
-        self.search_country = f"{self.country.country} {self.country.code}"
-        self.search_genres = " ".join(
-            genre.genre for genre in self.genres.all()
-        )
-        # Saving here for fields to show up for SearchVector.
-        super().save()
-        self.search_vector = search.SearchVector(
-            "search_username",
-            "title",
-            "description",
-            "location",
-            "search_country",
-            "search_genres",
-        )
-        super().save()
+    search_vector_fields = (
+        ("title", "A"),
+        ("search_username", "B"),
+        ("search_genres", "B"),
+        ("location", "B"),
+        ("search_country", "C"),
+        ("description", "C"),
+    )
+    search_vector_source_fields = (
+        "user",
+        "title",
+        "description",
+        "location",
+        "country",
+        "genres",
+    )
+    search_vector_cascade_fields = (
+        "title",
+        "description",
+        "location",
+        "country",
+        "genres",
+    )
+
+    def get_search_fields(self):
+        return {
+            "search_username": self.user.username,
+            "search_country": f"{self.country.country} {self.country.code}",
+            "search_genres": " ".join(
+                genre.genre for genre in self.genres.all()
+            ),
+        }
+
+    def get_search_vector_dependents(self):
+        return [self.rooms.all()]  # noqa
 
     def replies(self):
         return (
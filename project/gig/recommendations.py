@@ -0,0 +1,326 @@
+"""
+Recommended gigs, ranked for each user by genre affinity, distance
+and how recently the gig was posted.
+
+Each user's recommendations are kept in Redis as a sorted set of up to
+GIG_RECOMMENDATIONS_SIZE gig ids (as 16 bytes) scored between 0 and 1.
+tasks.refresh_gig_recommendations recomputes them for recently active
+users every GIG_RECOMMENDATIONS_REFRESH_SECONDS, and new gigs are
+added to them by tasks.add_gig_to_recommendations. Users without
+recommendations, e.g. as they haven't logged in for a while, are
+shown the soonest upcoming gigs while tasks.refresh_user_gig_recommendations
+computes theirs. Users with no gigs to recommend have just the EMPTY
+member, so they aren't computed again on every request.
+
+A user's genre affinity is their genres (see User.genre_bits) plus
+the genres of gigs they've favorited, weighted by how many.
+"""
+import heapq
+import math
+import operator
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from project.core import bitsets
+from project.gig import models
+
+User = get_user_model()
+
+KEY_PREFIX = "recommended_gigs"
+# Member of the sorted set of users with no gigs to recommend.
+EMPTY = b""
+# How long a user's refresh is considered queued.
+REFRESH_QUEUED_SECONDS = 60
+
+GENRES_WEIGHT = 0.5
+DISTANCE_WEIGHT = 0.3
+RECENCY_WEIGHT = 0.2
+# Weight of each favorited gig's genres, the user's own genres being 1.
+FAVORITE_GENRE_WEIGHT = 0.5
+# Gigs this far away have a distance score of 0.5.
+DISTANCE_SCALE_KM = 50
+# Gigs posted this long ago have a recency score of 0.5.
+RECENCY_SCALE_DAYS = 7
+EARTH_RADIUS_KM = 6371
+USERS_PER_BATCH = 500
+
+
+def get_user_key(user_id):
+    return f"{KEY_PREFIX}:user:{user_id}"
+
+
+def get_refresh_queued_key(user_id):
+    return f"{KEY_PREFIX}:refresh_queued:{user_id}"
+
+
+def get_distance_km(point_1, point_2):
+    """
+    Returns the great circle distance between points. Used rather than
+    location.helpers as it's run for every pair of user and gig.
+    """
+    lat_1, lat_2 = math.radians(point_1.y), math.radians(point_2.y)
+    a = (
+        math.sin((lat_2 - lat_1) / 2) ** 2
+        + math.cos(lat_1)
+        * math.cos(lat_2)
+        * math.sin(math.radians(point_2.x - point_1.x) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1)))
+
+
+def get_upcoming_gigs(gig_ids=None):
+    """
+    Returns values used for scoring of upcoming active gigs,
+    with the `bit`s of their genres as `genre_bits`.
+    """
+    gigs = models.Gig.objects.filter(
+        active=True,
+        start_date__gt=timezone.now(),
+    )
+    if gig_ids is not None:
+        gigs = gigs.filter(id__in=gig_ids)
+    gigs = {
+        gig["id"]: dict(gig, genre_bits=[])
+        for gig in gigs.values("id", "user_id", "point", "date_created")
+    }
+    gig_genre_bits = models.Gig.genres.through.objects.filter(
+        gig_id__in=gigs.keys(),
+        genre__active=True,
+        genre__bit__isnull=False,
+    ).values_list("gig_id", "genre__bit")
+    for gig_id, bit in gig_genre_bits:
+        gigs[gig_id]["genre_bits"].append(bit)
+    return list(gigs.values())
+
+
+def get_users_to_refresh():
+    """
+    Returns users who have logged in within
+    GIG_RECOMMENDATIONS_ACTIVE_USER_DAYS.
+    """
+    last_login = timezone.now() - timedelta(
+        days=settings.GIG_RECOMMENDATIONS_ACTIVE_USER_DAYS
+    )
+    return User.objects.filter(
+        is_active=True,
+        is_staff=False,
+        last_login__gte=last_login,
+    )
+
+
+def get_user_features(user_ids):
+    """
+    Returns each user's point and genre affinity, as {bit: weight}.
+    """
+    features = {}
+    users = User.objects.filter(id__in=user_ids).values(
+        "id",
+        "point",
+        "genre_bits",
+    )
+    for user in users:
+        genre_bits = bitsets.from_bytes(user["genre_bits"])
+        features[user["id"]] = {
+            "point": user["point"] or None,
+            "affinity": defaultdict(
+                float,
+                {
+                    bit: 1.0
+                    for bit in range(genre_bits.bit_length())
+                    if genre_bits >> bit & 1
+                },
+            ),
+        }
+    favorite_genre_bits = User.favorite_gigs.through.objects.filter(
+        user_id__in=features.keys(),
+        gig__genres__active=True,
+        gig__genres__bit__isnull=False,
+    ).values_list("user_id", "gig__genres__bit")
+    for user_id, bit in favorite_genre_bits:
+        features[user_id]["affinity"][bit] += FAVORITE_GENRE_WEIGHT
+    for user_features in features.values():
+        user_features["affinity_norm"] = math.sqrt(
+            sum(weight**2 for weight in user_features["affinity"].values())
+        )
+    return features
+
+
+def get_score(user_features, gig, now):
+    """
+    Returns the gig's score for the user, between 0 and 1.
+
+    The genre score is the cosine similarity of
+    the user's genre affinity and the gig's genres.
+    """
+    genres_score = 0
+    if user_features["affinity_norm"] and gig["genre_bits"]:
+        affinity = user_features["affinity"]
+        genres_score = sum(
+            affinity.get(bit, 0) for bit in gig["genre_bits"]
+        ) / (
+            user_features["affinity_norm"] * math.sqrt(len(gig["genre_bits"]))
+        )
+
+    distance_score = 0
+    if user_features["point"] and gig["point"]:
+        distance = get_distance_km(user_features["point"], gig["point"])
+        distance_score = 1 / (1 + distance / DISTANCE_SCALE_KM)
+
+    age = (now - gig["date_created"]).total_seconds() / 86400
+    recency_score = 1 / (1 + max(age, 0) / RECENCY_SCALE_DAYS)
+
+    return (
+        GENRES_WEIGHT * genres_score
+        + DISTANCE_WEIGHT * distance_score
+        + RECENCY_WEIGHT * recency_score
+    )
+
+
+def get_scores(user_id, user_features, gigs, now):
+    """
+    Returns {gig id as bytes: score} of gigs not posted by the user.
+    """
+    return {
+        gig["id"].bytes: get_score(user_features, gig, now)
+        for gig in gigs
+        if gig["user_id"] != user_id
+    }
+
+
+def refresh_user_recommendations(user_ids, gigs):
+    """
+    Replaces the recommendations of users with
+    the best scoring GIG_RECOMMENDATIONS_SIZE gigs.
+    """
+    size = settings.GIG_RECOMMENDATIONS_SIZE
+    timeout = settings.GIG_RECOMMENDATIONS_REFRESH_SECONDS * 2
+    now = timezone.now()
+    pipeline = get_redis_connection("default").pipeline()
+    for user_id, user_features in get_user_features(user_ids).items():
+        scores = get_scores(user_id, user_features, gigs, now)
+        key = get_user_key(user_id)
+        best = dict(
+            heapq.nlargest(size, scores.items(), key=operator.itemgetter(1))
+        )
+        pipeline.delete(key)
+        # EMPTY scores below any gig, so add_gig trims it first.
+        pipeline.zadd(key, best or {EMPTY: -1})
+        pipeline.expire(key, timeout)
+    pipeline.execute()
+
+
+def get_user_id_batches():
+    """
+    Yields lists of up to USERS_PER_BATCH ids of users to refresh.
+    """
+    batch = []
+    user_ids = get_users_to_refresh().values_list("id", flat=True)
+    for user_id in user_ids.iterator():
+        batch.append(user_id)
+        if len(batch) >= USERS_PER_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def refresh_recommendations():
+    """
+    Refreshes recommendations of recently active users.
+    """
+    gigs = get_upcoming_gigs()
+    for user_ids in get_user_id_batches():
+        refresh_user_recommendations(user_ids, gigs)
+
+
+def add_gig(gig_id):
+    """
+    Adds a gig to the recommendations of recently active users,
+    keeping their best scoring GIG_RECOMMENDATIONS_SIZE gigs.
+    Also used to rescore a gig whose genres have changed.
+
+    Users without recommendations are skipped, so their
+    recommendations are computed in full when requested.
+    """
+    gigs = get_upcoming_gigs([gig_id])
+    if not gigs:
+        return
+    size = settings.GIG_RECOMMENDATIONS_SIZE
+    timeout = settings.GIG_RECOMMENDATIONS_REFRESH_SECONDS * 2
+    now = timezone.now()
+    connection = get_redis_connection("default")
+    for user_ids in get_user_id_batches():
+        pipeline = connection.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipeline.exists(get_user_key(user_id))
+        user_ids = [
+            user_id
+            for user_id, exists in zip(user_ids, pipeline.execute())
+            if exists
+        ]
+        pipeline = connection.pipeline()
+        for user_id, user_features in get_user_features(user_ids).items():
+            scores = get_scores(user_id, user_features, gigs, now)
+            if not scores:
+                continue
+            key = get_user_key(user_id)
+            pipeline.zadd(key, scores)
+            # Removing the lowest scoring gigs over size.
+            pipeline.zremrangebyrank(key, 0, -size - 1)
+            # The key may have expired since checking it exists,
+            # in which case zadd created it without an expiry.
+            pipeline.expire(key, timeout)
+        pipeline.execute()
+
+
+def refresh_user(user_id):
+    refresh_user_recommendations([user_id], get_upcoming_gigs())
+
+
+def set_refresh_queued(user_id):
+    """
+    Returns True if a refresh of the user's recommendations
+    hasn't already been queued, marking it as queued.
+    """
+    return bool(
+        get_redis_connection("default").set(
+            get_refresh_queued_key(user_id),
+            1,
+            nx=True,
+            ex=REFRESH_QUEUED_SECONDS,
+        )
+    )
+
+
+def get_recommended_gig_ids(user):
+    """
+    Returns ids of the user's recommended gigs, best first,
+    or None if they haven't been computed.
+    """
+    gig_ids = get_redis_connection("default").zrevrange(
+        get_user_key(user.id),
+        0,
+        -1,
+    )
+    if not gig_ids:
+        return None
+    return [uuid.UUID(bytes=gig_id) for gig_id in gig_ids if gig_id != EMPTY]
+
+
+def get_fallback_gig_ids(user):
+    """
+    Returns ids of the soonest upcoming gigs, for users
+    whose recommendations haven't been computed.
+    """
+    return list(
+        models.Gig.objects.filter(active=True, start_date__gt=timezone.now())
+        .exclude(user=user)
+        .order_by("start_date", "id")
+        .values_list("id", flat=True)[: settings.GIG_RECOMMENDATIONS_SIZE]
+    )
@@ -9,6 +9,7 @@ from project.custom_user import serializers as user_serializers
 from project.genre import serializers as genre_serializers
 from project.gig import models
 from project.image import tasks as image_tasks
+from project.location.fields import LocationField
 
 User = get_user_model()
 
@@ -17,6 +18,7 @@ class GigSerializer(serializers.ModelSerializer):
     user = user_serializers.UserSerializerIfNotOwner(read_only=True)
     genres = genre_serializers.GenreSerializer(many=True, required=False)
     country = country_serializers.CountrySerializer()
+    point = LocationField(required=False, allow_null=True)
     image = serializers.ImageField(required=False, allow_null=True)
     thumbnail = serializers.ImageField(read_only=True)
     is_favorite = serializers.SerializerMethodField()
@@ -31,6 +33,7 @@ class GigSerializer(serializers.ModelSerializer):
             "user",
             "title",
             "location",
+            "point",
             "country",
             "description",
             "genres",
@@ -92,12 +95,16 @@ class GigSerializer(serializers.ModelSerializer):
         return data_copy
 
     def get_is_favorite(self, instance):
+        if hasattr(instance, "annotated_is_favorite"):
+            return instance.annotated_is_favorite
         user = self.context["request"].user
         if not user.is_authenticated:
             return False
         return user.favorite_gigs.filter(id=instance.id).exists()
 
     def get_replies(self, instance):
+        if hasattr(instance, "annotated_replies"):
+            return instance.annotated_replies
         return instance.replies()
 
     def get_is_past_gig(self, instance):
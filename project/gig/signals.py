@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+
+from project.gig import models, tasks
+
+
+def queue_add_gig_to_recommendations(gig):
+    if not settings.GIG_RECOMMENDATIONS_ENABLED:
+        return
+    gig_id = str(gig.id)
+    transaction.on_commit(
+        lambda: tasks.add_gig_to_recommendations.delay(gig_id)
+    )
+
+
+@receiver(post_save, sender=models.Gig)
+def add_new_gig_to_recommendations(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        queue_add_gig_to_recommendations(instance)
+
+
+@receiver(m2m_changed, sender=models.Gig.genres.through)
+def rescore_gig_in_recommendations(
+    sender, instance, action, reverse, **kwargs
+):
+    # Genres are set after a gig is created.
+    if action in ("post_add", "post_remove") and not reverse:
+        queue_add_gig_to_recommendations(instance)
@@ -0,0 +1,30 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from project.gig import recommendations
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(queue="recommendations")
+def refresh_gig_recommendations():
+    """
+    Recomputes recommended gigs of recently active users.
+    Run every GIG_RECOMMENDATIONS_REFRESH_SECONDS by celery beat.
+    """
+    if not settings.GIG_RECOMMENDATIONS_ENABLED:
+        return
+    logger.debug("refreshing gig recommendations.")
+    recommendations.refresh_recommendations()
+
+
+@shared_task(queue="recommendations")
+def refresh_user_gig_recommendations(user_id):
+    recommendations.refresh_user(user_id)
+
+
+@shared_task(queue="recommendations")
+def add_gig_to_recommendations(gig_id):
+    recommendations.add_gig(gig_id)
@@ -1,17 +1,24 @@
+import base64
 import json
 from datetime import timedelta
 
 from django.contrib.gis.geos import Point
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from django_redis import get_redis_connection
 from rest_framework import status
+from rest_framework.test import APIClient
 
 from project.audio import models as audio_models
+from project.chat import models as chat_models
 from project.core import tests as core_tests
 from project.country import models as country_models
 from project.genre import models as genre_models
-from project.gig import models
+from project.gig import models, recommendations
+from project.instrument import models as instrument_models
 
 
 class GigAPITestCase(TestCase):
@@ -194,3 +201,451 @@ class GigAPITestCase(TestCase):
 
         query = models.Gig.objects.filter(search_vector="blah blah blah")
         self.assertFalse(query.exists())
+
+
+class GigPermissionsQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.user, self.drf_client = core_tests.setup_user_with_drf_client(
+            username="fred",
+        )
+        self.gig = models.Gig.objects.create(
+            user=self.user,
+            title="Man Feelings",
+            location="Brixton academy",
+            country=country_models.CountryCode.objects.create(
+                country="United Kingdom",
+                code="GB",
+            ),
+            start_date=timezone.now() + timedelta(hours=1),
+        )
+
+    def get_number_of_queries_to_update(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.drf_client.patch(
+                path=reverse("gig-api-detail", args=(self.gig.id,)),
+                data=json.dumps({"title": "Man Feelings"}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_number_of_queries_does_not_grow_with_users(self):
+        number_of_queries = self.get_number_of_queries_to_update()
+        for n in range(20):
+            core_tests.create_user(username=f"user_{n}")
+        self.assertEqual(
+            self.get_number_of_queries_to_update(),
+            number_of_queries,
+        )
+
+    def test_update_when_not_owner(self):
+        _, drf_client = core_tests.setup_user_with_drf_client(
+            username="jiggy",
+        )
+        response = drf_client.patch(
+            path=reverse("gig-api-detail", args=(self.gig.id,)),
+            data=json.dumps({"title": "Cat Feelings"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_create_when_unauthenticated(self):
+        response = self.client.post(
+            path=reverse("gig-api-list"),
+            data=json.dumps({"title": "Cat Feelings"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class GigSearchAPITestCase(TestCase):
+    def setUp(self):
+        self.user, self.drf_client = core_tests.setup_user_with_drf_client(
+            username="fred",
+        )
+        self.country = country_models.CountryCode.objects.create(
+            country="United Kingdom",
+            code="GB",
+        )
+        other_user = core_tests.create_user(username="jiggy")
+        self.brixton_gig = self.create_gig(
+            other_user, "Brixton academy", Point(-0.1148, 51.4650)
+        )
+        self.shoreditch_gig = self.create_gig(
+            other_user, "Shoreditch", Point(-0.0780935, 51.5133267)
+        )
+        self.manchester_gig = self.create_gig(
+            other_user, "Manchester academy", Point(-2.2344, 53.4631)
+        )
+        self.create_gig(other_user, "Unknown venue", None)
+
+    def create_gig(self, user, location, point):
+        return models.Gig.objects.create(
+            user=user,
+            title="Man Feelings",
+            location=location,
+            point=point,
+            country=self.country,
+            start_date=timezone.now() + timedelta(hours=1),
+        )
+
+    def test_search_within_radius(self):
+        response = self.drf_client.get(
+            path=reverse("gig-api-search"),
+            data={"lat": 51.5131749, "lng": -0.0779528, "radius": 20},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(result["id"] for result in response.data["results"]),
+            sorted([str(self.brixton_gig.id), str(self.shoreditch_gig.id)]),
+        )
+
+    def test_search_within_radius_uses_user_point(self):
+        self.user.point = Point(-2.2426, 53.4808)
+        self.user.save()
+
+        response = self.drf_client.get(
+            path=reverse("gig-api-search"),
+            data={"radius": 20},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(
+            response.data["results"][0]["id"],
+            str(self.manchester_gig.id),
+        )
+
+    def test_search_order_by_distance(self):
+        response = self.drf_client.get(
+            path=reverse("gig-api-search"),
+            data={"lat": 53.4808, "lng": -2.2426, "order_by": "distance"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [result["id"] for result in response.data["results"]]
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(
+            ids[:3],
+            [
+                str(self.manchester_gig.id),
+                str(self.shoreditch_gig.id),
+                str(self.brixton_gig.id),
+            ],
+        )
+
+    def test_search_radius_without_location(self):
+        response = self.drf_client.get(
+            path=reverse("gig-api-search"),
+            data={"radius": 20},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_with_cursor_pagination(self):
+        response = self.drf_client.get(
+            path=reverse("gig-api-search"),
+            data={"pagination": "cursor", "page_size": 3},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        first_page_ids = [result["id"] for result in response.data["results"]]
+        self.assertEqual(len(first_page_ids), 3)
+
+        response = self.drf_client.get(path=response.data["next"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        second_page_ids = [result["id"] for result in response.data["results"]]
+        self.assertEqual(len(second_page_ids), 1)
+        self.assertNotIn(second_page_ids[0], first_page_ids)
+        self.assertIsNone(response.data["next"])
+
+    def test_search_order_by_distance_with_cursor_pagination(self):
+        # The gig without a point, and so without a distance, is last.
+        data = {
+            "lat": 53.4808,
+            "lng": -2.2426,
+            "order_by": "distance",
+            "pagination": "cursor",
+            "page_size": 1,
+        }
+        response = self.drf_client.get(
+            path=reverse("gig-api-search"),
+            data=data,
+        )
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [result["id"] for result in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.drf_client.get(path=response.data["next"])
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(
+            ids[:3],
+            [
+                str(self.manchester_gig.id),
+                str(self.shoreditch_gig.id),
+                str(self.brixton_gig.id),
+            ],
+        )
+
+    def test_search_with_invalid_cursor(self):
+        for values in (["not a date", "x"], [{}, "x"], ["x"]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(values).encode()
+            ).decode()
+            response = self.drf_client.get(
+                path=reverse("gig-api-search"),
+                data={"pagination": "cursor", "cursor": cursor},
+            )
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_ordered_by_rank(self):
+        title_gig = self.create_gig(self.user, "Camden", None)
+        title_gig.title = "Academy nights"
+        title_gig.save()
+
+        response = self.drf_client.get(
+            path=reverse("gig-api-search"),
+            data={"q": "academy"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [result["id"] for result in response.data["results"]]
+        self.assertEqual(len(ids), 3)
+        # Title matches are weighted higher than location matches.
+        self.assertEqual(ids[0], str(title_gig.id))
+
+    def test_search_ordered_by_rank_with_cursor_pagination(self):
+        # Every gig matches the title, with the same rank.
+        response = self.drf_client.get(
+            path=reverse("gig-api-search"),
+            data={"q": "feelings", "pagination": "cursor", "page_size": 1},
+        )
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [result["id"] for result in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.drf_client.get(path=response.data["next"])
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(set(ids)), 4)
+
+    def test_search_websearch_syntax(self):
+        response = self.drf_client.get(
+            path=reverse("gig-api-search"),
+            data={"q": "academy -brixton"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["id"] for result in response.data["results"]],
+            [str(self.manchester_gig.id)],
+        )
+
+
+class GigSerializerQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.user, self.drf_client = core_tests.setup_user_with_drf_client(
+            username="fred",
+        )
+        self.country = country_models.CountryCode.objects.create(
+            country="United Kingdom",
+            code="GB",
+        )
+        self.genre = genre_models.Genre.objects.create(genre="Doom")
+        self.instrument = instrument_models.Instrument.objects.create(
+            instrument="Drums",
+        )
+
+    def create_gig(self, username):
+        user = core_tests.create_user(username=username)
+        user.genres.add(self.genre)
+        user.instruments.add(self.instrument)
+        user.instruments_needed.add(self.instrument)
+        self.user.favorite_users.add(user)
+        gig = models.Gig.objects.create(
+            user=user,
+            title="Man Feelings",
+            location="Brixton academy",
+            country=self.country,
+            start_date=timezone.now() + timedelta(hours=1),
+        )
+        gig.genres.add(self.genre)
+        self.user.favorite_gigs.add(gig)
+        room = chat_models.Room.objects.create(
+            user=self.user,
+            type=chat_models.GIG,
+            gig=gig,
+        )
+        room.members.add(self.user, user)
+        chat_models.Message.objects.create(
+            user=self.user,
+            room=room,
+            message="hello!",
+        )
+        return gig
+
+    def get_search_results_and_number_of_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.drf_client.get(path=reverse("gig-api-search"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"], len(context.captured_queries)
+
+    def test_number_of_queries_does_not_grow_with_results(self):
+        self.create_gig("jiggy")
+        (
+            results,
+            number_of_queries,
+        ) = self.get_search_results_and_number_of_queries()
+        self.assertEqual(len(results), 1)
+
+        for username in ["bungle", "zippy", "george", "geoffrey"]:
+            self.create_gig(username)
+        (
+            results,
+            more_number_of_queries,
+        ) = self.get_search_results_and_number_of_queries()
+        self.assertEqual(len(results), 5)
+        self.assertEqual(number_of_queries, more_number_of_queries)
+
+    def test_annotated_data_matches_serializer_methods(self):
+        gig = self.create_gig("jiggy")
+        results, _ = self.get_search_results_and_number_of_queries()
+        result = results[0]
+        self.assertEqual(result["id"], str(gig.id))
+        self.assertTrue(result["is_favorite"])
+        self.assertEqual(result["replies"], gig.replies())
+        self.assertEqual(result["replies"], 1)
+        self.assertTrue(result["user"]["is_favorite"])
+        self.assertEqual(result["user"]["number_of_active_gigs"], 1)
+        self.assertEqual(len(result["user"]["genres"]), 1)
+        self.assertEqual(len(result["user"]["instruments"]), 1)
+        self.assertEqual(len(result["user"]["instruments_needed"]), 1)
+
+
+class GigRecommendationsTestCase(TestCase):
+    def setUp(self):
+        self.user, self.drf_client = core_tests.setup_user_with_drf_client(
+            username="fred",
+        )
+        self.user.last_login = timezone.now()
+        self.user.point = Point(-0.0779528, 51.5131749)
+        self.user.save()
+        self.country = country_models.CountryCode.objects.create(
+            country="United Kingdom",
+            code="GB",
+        )
+        self.doom = genre_models.Genre.objects.create(genre="Doom")
+        self.jazz = genre_models.Genre.objects.create(genre="Jazz")
+        self.user.genres.add(self.doom)
+        self.other_user = core_tests.create_user(username="jiggy")
+        get_redis_connection("default").delete(
+            recommendations.get_user_key(self.user.id),
+            recommendations.get_refresh_queued_key(self.user.id),
+        )
+
+    def create_gig(self, user, genre, point=None, start_date=None):
+        gig = models.Gig.objects.create(
+            user=user,
+            title="Man Feelings",
+            location="Brixton academy",
+            point=point,
+            country=self.country,
+            start_date=start_date or timezone.now() + timedelta(days=1),
+        )
+        gig.genres.add(genre)
+        return gig
+
+    def get_recommended_ids(self):
+        response = self.drf_client.get(path=reverse("gig-api-recommended"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [gig["id"] for gig in response.data["results"]]
+
+    def test_recommended(self):
+        near_jazz_gig = self.create_gig(
+            self.other_user,
+            self.jazz,
+            point=Point(-0.0780935, 51.5133267),
+        )
+        doom_gig = self.create_gig(self.other_user, self.doom)
+        # Not recommended.
+        self.create_gig(self.user, self.doom)
+        self.create_gig(
+            self.other_user,
+            self.doom,
+            start_date=timezone.now() - timedelta(days=1),
+        )
+
+        self.assertEqual(
+            self.get_recommended_ids(),
+            [str(doom_gig.id), str(near_jazz_gig.id)],
+        )
+
+        # Genres of favorited gigs count too.
+        self.user.favorite_gigs.add(near_jazz_gig)
+        get_redis_connection("default").delete(
+            recommendations.get_user_key(self.user.id)
+        )
+        recommendations.refresh_recommendations()
+        scores = dict(
+            get_redis_connection("default").zrange(
+                recommendations.get_user_key(self.user.id),
+                0,
+                -1,
+                withscores=True,
+            )
+        )
+        self.assertGreater(
+            scores[near_jazz_gig.id.bytes],
+            scores[doom_gig.id.bytes],
+        )
+
+    def test_new_gig_is_added(self):
+        doom_gig = self.create_gig(self.other_user, self.doom)
+        self.assertEqual(self.get_recommended_ids(), [str(doom_gig.id)])
+
+        # As if the key expired and was created again by add_gig.
+        key = recommendations.get_user_key(self.user.id)
+        get_redis_connection("default").persist(key)
+        new_gig = self.create_gig(self.other_user, self.jazz)
+        recommendations.add_gig(new_gig.id)
+        self.assertEqual(
+            self.get_recommended_ids(),
+            [str(doom_gig.id), str(new_gig.id)],
+        )
+        self.assertGreater(get_redis_connection("default").ttl(key), 0)
+
+    def test_inactive_gigs_are_not_returned(self):
+        doom_gig = self.create_gig(self.other_user, self.doom)
+        self.assertEqual(self.get_recommended_ids(), [str(doom_gig.id)])
+        doom_gig.active = False
+        doom_gig.save()
+        self.assertEqual(self.get_recommended_ids(), [])
+
+    def test_upcoming_gigs_until_computed(self):
+        later_gig = self.create_gig(
+            self.other_user,
+            self.jazz,
+            start_date=timezone.now() + timedelta(days=2),
+        )
+        soon_gig = self.create_gig(self.other_user, self.jazz)
+        # As if a refresh was queued, so no task is sent to celery.
+        self.assertTrue(recommendations.set_refresh_queued(self.user.id))
+
+        with self.settings(GIG_RECOMMENDATIONS_ENABLED=True):
+            self.assertEqual(
+                self.get_recommended_ids(),
+                [str(soon_gig.id), str(later_gig.id)],
+            )
+        self.assertIsNone(recommendations.get_recommended_gig_ids(self.user))
+
+    def test_no_recommendations_are_kept(self):
+        self.assertEqual(self.get_recommended_ids(), [])
+        self.assertEqual(
+            recommendations.get_recommended_gig_ids(self.user), []
+        )
+
+        doom_gig = self.create_gig(self.other_user, self.doom)
+        recommendations.add_gig(doom_gig.id)
+        self.assertEqual(self.get_recommended_ids(), [str(doom_gig.id)])
+
+    def test_not_authenticated(self):
+        response = APIClient().get(path=reverse("gig-api-recommended"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.2 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+def set_bits(apps, schema_editor):
+    Instrument = apps.get_model("instrument", "Instrument")  # noqa
+    for bit, instrument in enumerate(
+        Instrument.objects.order_by("date_created", "id")
+    ):
+        instrument.bit = bit
+        instrument.save(update_fields=["bit"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("instrument", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="instrument",
+            name="bit",
+            field=models.PositiveIntegerField(
+                editable=False,
+                null=True,
+                unique=True,
+            ),
+        ),
+        migrations.RunPython(set_bits, migrations.RunPython.noop),
+    ]
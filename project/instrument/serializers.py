@@ -1,21 +1,15 @@
-from django.core import exceptions as django_exceptions
-from rest_framework import serializers
-
+from project.core.drf import serializers as core_serializers
 from project.instrument import models
 
 
-class InstrumentSerializer(serializers.ModelSerializer):
+class InstrumentSerializer(core_serializers.ExistingModelSerializer):
+    does_not_exist_message = "Instruments do not exist"
+    invalid_message = "Invalid Instruments"
+
     class Meta:
         model = models.Instrument
         fields = (
             "id",
             "instrument",
         )
-
-    def to_internal_value(self, data):
-        try:
-            return models.Instrument.objects.get(**data)
-        except models.Instrument.DoesNotExist:
-            raise serializers.ValidationError({"Instruments do not exist"})
-        except django_exceptions.FieldError:
-            raise serializers.ValidationError("Invalid Instruments")
+        list_serializer_class = core_serializers.ExistingListSerializer
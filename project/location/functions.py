@@ -0,0 +1,33 @@
+from django.contrib.gis.db.models.functions import Distance
+from django.db.models import BooleanField, Func
+
+
+class KNNDistance(Distance):
+    """
+    Distance calculated using PostGIS's `<->` operator.
+
+    Ordering by this uses the GiST index on the geography
+    column (KNN search) rather than calculating ST_Distance
+    for every row. Results are in meters for geography fields.
+    """
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        extra_context.update(
+            {
+                "template": "(%(expressions)s)",
+                "arg_joiner": " <-> ",
+            }
+        )
+        return super().as_postgresql(compiler, connection, **extra_context)
+
+
+class IsEmpty(Func):
+    """
+    Whether a geometry or geography is empty,
+    e.g. the default Point([]) of User.point.
+    """
+
+    function = "ST_IsEmpty"
+    # ST_IsEmpty takes a geometry.
+    template = "%(function)s(%(expressions)s::geometry)"
+    output_field = BooleanField()
@@ -1,7 +1,10 @@
 from enum import Enum
+from typing import Optional
 
 from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
 from geopy.distance import distance as geopy_distance
+from rest_framework import exceptions
 
 
 class Units(Enum):
@@ -24,3 +27,53 @@ def get_distance_between_points(
         return round(distance.miles, round_to)
     else:
         return round(distance.kilometers, round_to)
+
+
+def get_point_from_query_params(query_params, user=None) -> Optional[Point]:
+    """
+    Returns a Point using the `lat` and `lng` query params.
+    If these are not provided the requesting user's point is
+    used instead. Returns None if neither are available.
+    """
+    lat = query_params.get("lat")
+    lng = query_params.get("lng")
+    if lat or lng:
+        try:
+            return Point(float(lng), float(lat), srid=4326)
+        except (TypeError, ValueError):
+            raise exceptions.ParseError("Invalid lat or lng.")
+
+    if user is not None and user.is_authenticated and user.point:
+        return user.point
+
+    return None
+
+
+def get_radius_from_query_params(query_params, units) -> Optional[D]:
+    """
+    Returns the `radius` query param as a Distance object.
+    Units specified should be `miles` or `kilometers`.
+    """
+    radius = query_params.get("radius")
+    if not radius:
+        return None
+
+    try:
+        radius = float(radius)
+    except ValueError:
+        raise exceptions.ParseError("Invalid radius.")
+
+    if units == Units.MILES.value:
+        return D(mi=radius)
+    else:
+        return D(km=radius)
+
+
+def get_units_for_user(user) -> str:
+    """
+    Returns units preferred by the user. Kilometers are
+    returned if the user is not authenticated.
+    """
+    if not user.is_authenticated:
+        return Units.KILOMETERS.value
+    return user.preferred_units or user.units
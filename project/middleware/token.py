@@ -1,13 +1,14 @@
 from urllib.parse import parse_qs
 
-from channels.auth import AuthMiddleware
-from channels.db import database_sync_to_async
-from channels.sessions import CookieMiddleware, SessionMiddleware
+from channels.middleware import BaseMiddleware
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt import exceptions
 from rest_framework_simplejwt.tokens import AccessToken
 
+from project.core.db import database_sync_to_async
+from project.custom_user import auth_cache
+
 User = get_user_model()
 
 
@@ -22,16 +23,33 @@ def get_user(scope):
         access_token = AccessToken(token[0])
     except exceptions.TokenError:
         return AnonymousUser()
-    user = User.objects.get(id=access_token["user_id"])
-    if not user.is_active:
+
+    user_id = access_token["user_id"]
+    user, tokens_not_before = auth_cache.get_user(user_id)
+    # Tokens issued in the same second as being revoked are revoked too.
+    issued_at = access_token.get("iat", 0)
+    if tokens_not_before and issued_at <= tokens_not_before:
         return AnonymousUser()
+    if user is None:
+        user = User.objects.filter(id=user_id, is_active=True).first()
+        if not user:
+            return AnonymousUser()
+        auth_cache.set_user(user)
     return user
 
 
-class TokenAuthMiddleware(AuthMiddleware):
-    async def resolve_scope(self, scope):
-        scope["user"]._wrapped = await get_user(scope)
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Sets scope["user"] from the JWT passed as the `token` query param.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope["user"] = await get_user(scope)
+        return await super().__call__(scope, receive, send)
 
 
 def TokenAuthMiddlewareStack(inner):
-    return CookieMiddleware(SessionMiddleware(TokenAuthMiddleware(inner)))
+    # Clients authenticate with tokens only,
+    # so no cookie or session middleware.
+    return TokenAuthMiddleware(inner)
@@ -0,0 +1 @@
+default_app_config = "project.search.apps.SearchConfig"
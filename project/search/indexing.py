@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.db import transaction
+
+from project.search import tasks
+
+
+def queue_search_vector_update(instance, changed_fields=None):
+    """
+    Queues an update of the instance's search vector. The update runs
+    in the search_vectors worker once the current transaction commits.
+    With SEARCH_VECTOR_TASKS_ENABLED set to False it runs straight away.
+
+    If changed_fields is given the update is skipped when none of them
+    are search_vector_source_fields, and dependents are only updated
+    when one of them is a search_vector_cascade_fields.
+    """
+    cascade = True
+    if changed_fields is not None:
+        changed_fields = set(changed_fields)
+        if not changed_fields & set(instance.search_vector_source_fields):
+            return
+        cascade = bool(
+            changed_fields & set(instance.search_vector_cascade_fields)
+        )
+
+    if not settings.SEARCH_VECTOR_TASKS_ENABLED:
+        tasks.update_search_vectors_for_instances([instance], cascade=cascade)
+        return
+
+    app_name = instance._meta.app_label
+    model_name = instance._meta.model_name
+    instance_ids = [str(instance.pk)]
+    transaction.on_commit(
+        lambda: tasks.update_search_vectors.delay(
+            app_name,
+            model_name,
+            instance_ids,
+            cascade=cascade,
+        )
+    )
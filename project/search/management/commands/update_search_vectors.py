@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from project.chat import models as chat_models
+from project.custom_user import models as user_models
+from project.gig import models as gig_models
+from project.search import tasks
+
+
+class Command(BaseCommand):
+    help = "Rebuilds search fields and search vectors of all rows."
+
+    def handle(self, *args, **options):
+        for Model in (  # noqa
+            user_models.User,
+            gig_models.Gig,
+            chat_models.Room,
+        ):
+            tasks.update_search_vectors_for_instances(
+                Model.objects.all().iterator(),
+                cascade=False,
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Updated search vectors for {Model._meta.label}."
+                )
+            )
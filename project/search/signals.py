@@ -0,0 +1,60 @@
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+
+from project.chat import models as chat_models
+from project.custom_user import models as user_models
+from project.gig import models as gig_models
+from project.search import indexing
+
+M2M_ACTIONS = ("post_add", "post_remove", "post_clear")
+
+
+def get_m2m_field_name(model, through):
+    for field in model._meta.many_to_many:
+        if field.remote_field.through is through:
+            return field.name
+    return None
+
+
+@receiver(post_save, sender=gig_models.Gig)
+@receiver(post_save, sender=user_models.User)
+@receiver(post_save, sender=chat_models.Room)
+def update_search_vector_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        # Nothing depends on the instance yet.
+        indexing.queue_search_vector_update(instance)
+        return
+    indexing.queue_search_vector_update(
+        instance,
+        changed_fields=instance.get_dirty_fields(),
+    )
+
+
+@receiver(m2m_changed, sender=gig_models.Gig.genres.through)
+@receiver(m2m_changed, sender=user_models.User.genres.through)
+@receiver(m2m_changed, sender=user_models.User.instruments.through)
+@receiver(m2m_changed, sender=user_models.User.instruments_needed.through)
+@receiver(m2m_changed, sender=chat_models.Room.members.through)
+def update_search_vector_on_m2m_changed(
+    sender, instance, action, reverse, model, pk_set, **kwargs
+):
+    if action not in M2M_ACTIONS:
+        return
+    if not reverse:
+        indexing.queue_search_vector_update(
+            instance,
+            changed_fields=[get_m2m_field_name(type(instance), sender)],
+        )
+        return
+    # Changed from the other side of the relation,
+    # e.g. room.members changed through user.rooms_membership.
+    if not hasattr(model, "search_vector_fields") or not pk_set:
+        return
+    changed_fields = [get_m2m_field_name(model, sender)]
+    for related_instance in model.objects.filter(pk__in=pk_set):
+        indexing.queue_search_vector_update(
+            related_instance,
+            changed_fields=changed_fields,
+        )
@@ -0,0 +1,35 @@
+import logging
+
+from celery import shared_task
+from django.apps import apps
+
+from project.core import search
+
+logger = logging.getLogger(__name__)
+
+
+def update_search_vectors_for_instances(instances, cascade=True):
+    for instance in instances:
+        search.update_search_vector(instance)
+        if not cascade:
+            continue
+        for dependents in instance.get_search_vector_dependents():
+            for dependent in dependents:
+                search.update_search_vector(dependent)
+
+
+@shared_task(queue="search_vectors")
+def update_search_vectors(app_name, model_name, instance_ids, cascade=True):
+    """
+    Updates search vectors of the given instances and,
+    if cascade is True, the instances depending on them.
+    """
+    Model = apps.get_model(app_name, model_name)  # noqa
+    instances = Model.objects.filter(id__in=instance_ids)  # noqa
+    logger.debug(
+        "task received to update search vectors for %s.%s ids:%s",
+        app_name,
+        model_name,
+        instance_ids,
+    )
+    update_search_vectors_for_instances(instances, cascade=cascade)
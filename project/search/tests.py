@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from project.chat import models as chat_models
+from project.core import tests as core_tests
+from project.country import models as country_models
+from project.genre import models as genre_models
+from project.gig import models as gig_models
+
+
+class SearchVectorTestCase(TestCase):
+    def setUp(self):
+        self.user = core_tests.create_user(username="fred")
+        self.genre = genre_models.Genre.objects.create(genre="Doom")
+        self.country = country_models.CountryCode.objects.create(
+            country="United Kingdom",
+            code="GB",
+        )
+        self.gig = gig_models.Gig.objects.create(
+            user=self.user,
+            title="Man Feelings",
+            location="Brixton academy",
+            country=self.country,
+            start_date=timezone.now() + timedelta(hours=1),
+        )
+        self.room = chat_models.Room.objects.create(
+            user=self.user,
+            gig=self.gig,
+            type=chat_models.GIG,
+        )
+        self.room.members.add(self.user)
+
+    def test_m2m_changes_update_search_vector(self):
+        self.gig.genres.add(self.genre)
+        self.assertTrue(
+            gig_models.Gig.objects.filter(search_vector="doom").exists()
+        )
+        self.assertTrue(
+            chat_models.Room.objects.filter(search_vector="doom").exists()
+        )
+
+    def test_username_change_updates_dependents(self):
+        self.user.username = "jiggy"
+        self.user.save()
+        self.assertTrue(
+            gig_models.Gig.objects.filter(search_vector="jiggy").exists()
+        )
+        self.assertTrue(
+            chat_models.Room.objects.filter(search_vector="jiggy").exists()
+        )
+
+    def test_save_doesnt_write_search_fields(self):
+        self.gig.title = "Lady Feelings"
+        self.gig.search_genres = "stale"
+        with CaptureQueriesContext(connection) as context:
+            self.gig.save()
+        update_queries = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        # One UPDATE for the gig, one for its search vector
+        # and one for the room depending on it.
+        self.assertEqual(len(update_queries), 3)
+        self.assertNotIn("stale", " ".join(update_queries))
+
+    def test_unrelated_change_doesnt_update_search_vectors(self):
+        self.user.is_looking_for_band = True
+        with CaptureQueriesContext(connection) as context:
+            self.user.save()
+        update_queries = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(len(update_queries), 1)
+
+    def test_get_dirty_fields(self):
+        gig = gig_models.Gig.objects.get(id=self.gig.id)
+        self.assertEqual(gig.get_dirty_fields(), set())
+        gig.title = "Lady Feelings"
+        gig.location = "Camden"
+        self.assertEqual(gig.get_dirty_fields(), {"title", "location"})
+        gig.refresh_from_db()
+        self.assertEqual(gig.get_dirty_fields(), set())
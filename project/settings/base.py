@@ -40,6 +40,7 @@ LOCAL_APPS = [
     "project.genre",
     "project.gig",
     "project.instrument",
+    "project.search",
     # HTTP, HTTP2 and WebSocket protocol server.
     # Takes over from WSGI for development server.
     "daphne",
@@ -162,6 +163,10 @@ CACHES = {
     }
 }
 
+# Seconds users authenticated by token are cached for.
+# See custom_user.auth_cache.
+AUTH_USER_CACHE_SECONDS = 60
+
 # Channels
 CHANNEL_LAYERS = {
     "default": {
@@ -171,6 +176,35 @@ CHANNEL_LAYERS = {
         },
     },
 }
+# Redis used by chat, e.g. for room streams.
+CHAT_REDIS_URL = os.environ.get("CHAT_REDIS_URL", "redis://redis:6379/3")
+# Keep a Redis stream of each room's recent messages so reconnecting
+# clients can be sent messages they missed. See chat.streams.
+CHAT_STREAMS_ENABLED = False
+CHAT_STREAM_MAX_LENGTH = 500
+# Messages are archived in months all older than this. See chat.archive.
+CHAT_MESSAGE_ARCHIVE_AFTER_DAYS = 365
+# Storage class for message archives, the default storage if None.
+CHAT_MESSAGE_ARCHIVE_STORAGE = None
+# Track who is online in each room. See chat.presence.
+CHAT_PRESENCE_ENABLED = False
+CHAT_PRESENCE_HEARTBEAT_SECONDS = 30
+CHAT_PRESENCE_TIMEOUT_SECONDS = 90
+# Typing is sent to a room at most once per user this often.
+CHAT_TYPING_DEBOUNCE_SECONDS = 3
+# Write messages sent to consumers in batches rather than one by one.
+# Best used with CHAT_STREAMS_ENABLED, as batched messages aren't in
+# the database until written. See chat.writer.
+CHAT_MESSAGE_BATCHING_ENABLED = False
+CHAT_MESSAGE_BATCH_SIZE = int(os.environ.get("CHAT_MESSAGE_BATCH_SIZE", 100))
+CHAT_MESSAGE_BATCH_SECONDS = float(
+    os.environ.get("CHAT_MESSAGE_BATCH_SECONDS", 0.5)
+)
+# Number of threads (and so database connections) per process
+# used by consumers for database queries. See core.db.
+DATABASE_THREAD_POOL_SIZE = int(
+    os.environ.get("DATABASE_THREAD_POOL_SIZE", 10)
+)
 
 
 # User
@@ -221,12 +255,44 @@ CELERY_BROKER_URL = os.environ["CELERY_BROKER_URL"]
 
 # Push notifications
 PUSH_NOTIFICATIONS_ENABLED = False
+# Notifications to a user within this many seconds are sent as one.
+PUSH_NOTIFICATIONS_COALESCE_SECONDS = 5
+# Queued notifications not sent within this many seconds are dropped.
+# Well above how far behind the worker may be.
+PUSH_NOTIFICATIONS_QUEUE_SECONDS = 60 * 60
+# Expo recommends checking receipts around 15 minutes after sending.
+PUSH_NOTIFICATIONS_RECEIPTS_DELAY_SECONDS = 15 * 60
 
 
 # Thumbnails
 CREATE_THUMBNAILS_ENABLED = False
 
 
+# Search vectors
+# Updated by the search_vectors worker when True,
+# otherwise updated straight away in the saving process.
+SEARCH_VECTOR_TASKS_ENABLED = True
+
+
+# Gig recommendations
+# Recommendations are refreshed, and new gigs added to them, when True.
+# Otherwise they're only computed, straight away, when a user without
+# them requests them.
+GIG_RECOMMENDATIONS_ENABLED = False
+# Recommended gigs kept per user.
+GIG_RECOMMENDATIONS_SIZE = 200
+GIG_RECOMMENDATIONS_REFRESH_SECONDS = 60 * 60
+# Users who've logged in within this many days have
+# their recommendations refreshed, see gig.recommendations.
+GIG_RECOMMENDATIONS_ACTIVE_USER_DAYS = 30
+CELERY_BEAT_SCHEDULE = {
+    "refresh_gig_recommendations": {
+        "task": "project.gig.tasks.refresh_gig_recommendations",
+        "schedule": GIG_RECOMMENDATIONS_REFRESH_SECONDS,
+    },
+}
+
+
 # Media
 MEDIA_ROOT = os.path.join(BASE_DIR, "project/media")
 MEDIA_URL = "/media/"
@@ -253,40 +319,3 @@ EMAIL_USER = os.environ.get("EMAIL_USER")
 EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD")
 EMAIL_DEFAULT_FROM = os.environ.get("EMAIL_DEFAULT_FROM")
 EMAIL_DEFAULT_SUBJECT = os.environ.get("EMAIL_DEFAULT_SUBJECT")
-
-# Search stop words for use in Postgres free text search.
-ENGLISH_STOP_WORDS = [
-    "a",
-    "an",
-    "and",
-    "are",
-    "as",
-    "at",
-    "be",
-    "but",
-    "by",
-    "for",
-    "if",
-    "in",
-    "into",
-    "is",
-    "it",
-    "no",
-    "not",
-    "of",
-    "on",
-    "or",
-    "such",
-    "that",
-    "the",
-    "their",
-    "then",
-    "there",
-    "these",
-    "they",
-    "this",
-    "to",
-    "was",
-    "will",
-    "with",
-]
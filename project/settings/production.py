@@ -11,6 +11,7 @@ from .base import *  # noqa
 ENV = "production"
 DEBUG = False
 CREATE_THUMBNAILS_ENABLED = True
+GIG_RECOMMENDATIONS_ENABLED = True
 
 
 # Optional: To filter out certain types of errors, you can use before_send
@@ -83,6 +84,7 @@ MEDIA_ROOT = "media/"
 # Use custom storage classes
 STATICFILES_STORAGE = "project.storage.StaticStorage"
 DEFAULT_FILE_STORAGE = "project.storage.MediaStorage"
+CHAT_MESSAGE_ARCHIVE_STORAGE = "project.storage.ArchiveStorage"
 
 FRONTEND_DOMAIN = os.environ["FRONTEND_DOMAIN"]
 DO_APP_PLATFORM_DOMAIN = os.environ["DO_APP_PLATFORM_DOMAIN"]
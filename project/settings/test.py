@@ -1,9 +1,20 @@
 import logging
+import uuid
 
 from .local import *  # noqa
 
 ENV = "test"
 
+# Cache
+# Prefixed for each run, as test users' ids restart in each test database
+# and would share cached users and revoked tokens with dev users.
+CACHES = {
+    "default": dict(
+        CACHES["default"],  # noqa: F405
+        KEY_PREFIX=f"test_{uuid.uuid4().hex}",
+    ),
+}
+
 # Channels configuration
 CHANNEL_LAYERS = {
     "default": {
@@ -20,3 +31,5 @@ logging.disable(logging.CRITICAL)
 
 PUSH_NOTIFICATIONS_ENABLED = False
 CREATE_THUMBNAILS_ENABLED = False
+SEARCH_VECTOR_TASKS_ENABLED = False
+GIG_RECOMMENDATIONS_ENABLED = False
@@ -14,3 +14,14 @@ class MediaStorage(S3Boto3Storage):
     default_acl = "public-read"
     file_overwrite = False
     custom_domain = settings.AWS_S3_CUSTOM_DOMAIN
+
+
+class ArchiveStorage(S3Boto3Storage):
+    """
+    Private storage for archives, e.g. of chat messages.
+    """
+
+    location = "archives"
+    default_acl = "private"
+    file_overwrite = False
+    custom_domain = None
@@ -3,12 +3,33 @@ from celery import Celery
 app = Celery("project")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.conf.task_routes = {
-    "project.custom_user.tasks.send_push_notification": {
+    "project.custom_user.tasks.send_queued_push_notifications": {
+        "queue": "push_notifications",
+    },
+    "project.custom_user.tasks.publish_push_messages": {
+        "queue": "push_notifications",
+    },
+    "project.custom_user.tasks.check_push_receipts": {
+        "queue": "push_notifications",
+    },
+    "project.chat.tasks.send_message_push_notifications": {
         "queue": "push_notifications",
     },
     "project.image.tasks.create_thumbnail": {
         "queue": "thumbnails",
     },
+    "project.search.tasks.update_search_vectors": {
+        "queue": "search_vectors",
+    },
+    "project.gig.tasks.refresh_gig_recommendations": {
+        "queue": "recommendations",
+    },
+    "project.gig.tasks.refresh_user_gig_recommendations": {
+        "queue": "recommendations",
+    },
+    "project.gig.tasks.add_gig_to_recommendations": {
+        "queue": "recommendations",
+    },
 }
 app.autodiscover_tasks()
 